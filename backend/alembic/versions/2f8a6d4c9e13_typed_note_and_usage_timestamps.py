@@ -0,0 +1,181 @@
+"""Store note and usage timestamps as timezone-aware datetimes
+
+Revision ID: 2f8a6d4c9e13
+Revises: 7c3e5f9a1b08
+Create Date: 2026-10-18 20:03:41.518204
+
+"""
+from collections import defaultdict
+from datetime import date, datetime, timezone
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2f8a6d4c9e13'
+down_revision: Union[str, Sequence[str], None] = '7c3e5f9a1b08'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 5000
+
+NOTE_INDEXES = {'ix_notes_user_id_created_at': ['user_id', 'created_at'],
+                'ix_notes_user_id_updated_at': ['user_id', 'updated_at']}
+USAGE_INDEXES = {'ix_api_usage_user_id_usage_date': ['user_id', 'usage_date']}
+
+# Recreated after SQLite rebuilds the notes table, which drops the triggers defined on it
+SQLITE_FTS_TRIGGERS = [
+    """CREATE TRIGGER IF NOT EXISTS notes_fts_insert AFTER INSERT ON notes BEGIN
+        INSERT INTO notes_fts(rowid, name, summary, action_items, content)
+        VALUES (new.id, new.name, new.summary, new.action_items, new.content);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS notes_fts_delete AFTER DELETE ON notes BEGIN
+        INSERT INTO notes_fts(notes_fts, rowid, name, summary, action_items, content)
+        VALUES ('delete', old.id, old.name, old.summary, old.action_items, old.content);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS notes_fts_update AFTER UPDATE ON notes BEGIN
+        INSERT INTO notes_fts(notes_fts, rowid, name, summary, action_items, content)
+        VALUES ('delete', old.id, old.name, old.summary, old.action_items, old.content);
+        INSERT INTO notes_fts(rowid, name, summary, action_items, content)
+        VALUES (new.id, new.name, new.summary, new.action_items, new.content);
+    END""",
+]
+
+
+def parse_timestamp(value) -> datetime | None:
+    """Aware UTC datetime from a datetime or a free-form string (ISO 8601 or a leading date)."""
+    if value is None:
+        return None
+    if not isinstance(value, datetime):
+        text = str(value).strip()
+        if not text:
+            return None
+        try:
+            value = datetime.fromisoformat(text.replace('Z', '+00:00'))
+        except ValueError:
+            try:
+                return datetime.combine(date.fromisoformat(text[:10]), datetime.min.time(), timezone.utc)
+            except ValueError:
+                return None
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def _restore_fts_triggers():
+    bind = op.get_bind()
+    if bind.dialect.name == 'sqlite' and sa.inspect(bind).has_table('notes_fts'):
+        for statement in SQLITE_FTS_TRIGGERS:
+            op.execute(sa.text(statement))
+
+
+def _rebuild_rollup(now: datetime):
+    bind = op.get_bind()
+    usage = sa.table('api_usage', *(sa.column(name) for name in (
+        'user_id', 'usage_date', 'input_tokens', 'output_tokens', 'cache_hit'
+    )))
+    daily = sa.table('api_usage_daily', sa.column('user_id'), sa.column('day', sa.Date()), *(
+        sa.column(name) for name in ('requests', 'input_tokens', 'output_tokens', 'cache_hits')
+    ))
+    bind.execute(daily.delete())
+    totals = defaultdict(lambda: {'requests': 0, 'input_tokens': 0, 'output_tokens': 0, 'cache_hits': 0})
+    result = bind.execution_options(yield_per=BATCH_SIZE).execute(sa.select(usage))
+    for user_id, usage_date, input_tokens, output_tokens, cache_hit in result:
+        row = totals[(user_id, (parse_timestamp(usage_date) or now).date())]
+        row['requests'] += 1
+        row['input_tokens'] += input_tokens or 0
+        row['output_tokens'] += output_tokens or 0
+        row['cache_hits'] += 1 if cache_hit else 0
+    rows = [{'user_id': user_id, 'day': day, **row} for (user_id, day), row in totals.items()]
+    for i in range(0, len(rows), BATCH_SIZE):
+        bind.execute(daily.insert(), rows[i:i + BATCH_SIZE])
+
+
+def _retype(table, columns, new_type, value_type, convert, nullable, drop_indexes, create_indexes):
+    """Rewrite columns through a temporary column of new_type, filled row by row with convert(row)
+    and bound as value_type."""
+    bind = op.get_bind()
+    with op.batch_alter_table(table) as batch:
+        for name in columns:
+            batch.add_column(sa.Column(f'{name}_new', new_type))
+
+    source = sa.table(table, sa.column('id'), *(sa.column(name) for name in columns))
+    target = sa.table(table, sa.column('id'), *(sa.column(f'{name}_new', value_type) for name in columns))
+    update = (
+        target.update()
+        .where(target.c.id == sa.bindparam('row_id'))
+        .values({f'{name}_new': sa.bindparam(f'v_{name}') for name in columns})
+    )
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(source).where(source.c.id > last_id).order_by(source.c.id).limit(BATCH_SIZE)
+        ).mappings().all()
+        if not rows:
+            break
+        bind.execute(update, [
+            {'row_id': row['id'], **{f'v_{name}': value for name, value in convert(row).items()}} for row in rows
+        ])
+        last_id = rows[-1]['id']
+
+    existing = {index['name'] for index in sa.inspect(bind).get_indexes(table)}
+    with op.batch_alter_table(table) as batch:
+        for index in drop_indexes:
+            if index in existing:
+                batch.drop_index(index)
+        for name in columns:
+            batch.drop_column(name)
+        for name in columns:
+            batch.alter_column(f'{name}_new', new_column_name=name, existing_type=new_type, nullable=nullable)
+    for index, index_columns in create_indexes.items():
+        op.create_index(index, table, index_columns)
+
+
+def _is_datetime(table, name) -> bool:
+    columns = {c['name']: c['type'] for c in sa.inspect(op.get_bind()).get_columns(table)}
+    return isinstance(columns[name], sa.DateTime)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    now = datetime.now(timezone.utc)
+
+    def note_times(row):
+        created = parse_timestamp(row['created_at']) or parse_timestamp(row['updated_at']) or now
+        return {'created_at': created, 'updated_at': parse_timestamp(row['updated_at']) or created}
+
+    # init_db() may already have created typed columns on a fresh database
+    if not _is_datetime('notes', 'created_at'):
+        _retype(
+            'notes', ['created_at', 'updated_at'], sa.DateTime(timezone=True), sa.DateTime(timezone=True), note_times, False,
+            ['ix_notes_created_at', 'ix_notes_updated_at'], NOTE_INDEXES,
+        )
+        _restore_fts_triggers()
+    if not _is_datetime('api_usage', 'usage_date'):
+        _retype(
+            'api_usage', ['usage_date'], sa.DateTime(timezone=True), sa.DateTime(timezone=True),
+            lambda row: {'usage_date': parse_timestamp(row['usage_date']) or now}, False,
+            ['ix_api_usage_usage_date'], USAGE_INDEXES,
+        )
+        # Unparseable dates used to be counted as the day of the rollup; count them as the day stored now
+        _rebuild_rollup(now)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    def as_strings(*names):
+        return lambda row: {
+            name: parse_timestamp(row[name]).isoformat() if row[name] is not None else None for name in names
+        }
+
+    _retype(
+        'notes', ['created_at', 'updated_at'], sa.String(), sa.String(), as_strings('created_at', 'updated_at'), True,
+        list(NOTE_INDEXES), {'ix_notes_created_at': ['created_at'], 'ix_notes_updated_at': ['updated_at']},
+    )
+    _restore_fts_triggers()
+    _retype(
+        'api_usage', ['usage_date'], sa.String(), sa.String(), as_strings('usage_date'), True,
+        list(USAGE_INDEXES), {'ix_api_usage_usage_date': ['usage_date']},
+    )
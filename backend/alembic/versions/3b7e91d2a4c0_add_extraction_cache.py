@@ -0,0 +1,45 @@
+"""Add extraction_cache table
+
+Revision ID: 3b7e91d2a4c0
+Revises: c617e38a52fa
+Create Date: 2026-10-18 10:12:40.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3b7e91d2a4c0'
+down_revision: Union[str, Sequence[str], None] = 'c617e38a52fa'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # init_db() may already have created the table on a fresh database
+    if sa.inspect(op.get_bind()).has_table('extraction_cache'):
+        return
+    op.create_table(
+        'extraction_cache',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('content_hash', sa.String(length=64), nullable=False),
+        sa.Column('extractor_version', sa.String(), nullable=False),
+        sa.Column('text', sa.Text(), nullable=False),
+        sa.Column('size', sa.Integer(), nullable=False),
+        sa.Column('hits', sa.Integer(), nullable=True),
+        sa.Column('last_used_at', sa.Float(), nullable=True),
+        sa.UniqueConstraint('content_hash', 'extractor_version'),
+    )
+    op.create_index(op.f('ix_extraction_cache_id'), 'extraction_cache', ['id'])
+    op.create_index(op.f('ix_extraction_cache_last_used_at'), 'extraction_cache', ['last_used_at'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_extraction_cache_last_used_at'), table_name='extraction_cache')
+    op.drop_index(op.f('ix_extraction_cache_id'), table_name='extraction_cache')
+    op.drop_table('extraction_cache')
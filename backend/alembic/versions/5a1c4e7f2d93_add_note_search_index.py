@@ -0,0 +1,81 @@
+"""Add full-text search index on notes
+
+Revision ID: 5a1c4e7f2d93
+Revises: 8d2f6c1e9b57
+Create Date: 2026-10-18 18:20:41.118204
+
+"""
+import os
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5a1c4e7f2d93'
+down_revision: Union[str, Sequence[str], None] = '8d2f6c1e9b57'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+LANGUAGE = os.getenv('SEARCH_LANGUAGE', 'english')
+
+PG_SEARCH_VECTOR = (
+    f"setweight(to_tsvector('{LANGUAGE}', coalesce(name, '')), 'A') || "
+    f"setweight(to_tsvector('{LANGUAGE}', coalesce(summary, '')), 'B') || "
+    f"setweight(to_tsvector('{LANGUAGE}', coalesce(action_items, '')), 'B') || "
+    f"setweight(to_tsvector('{LANGUAGE}', coalesce(content, '')), 'C')"
+)
+
+SQLITE_FTS_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS notes_fts USING fts5(
+        name, summary, action_items, content, content='notes', content_rowid='id', tokenize='porter unicode61'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS notes_fts_insert AFTER INSERT ON notes BEGIN
+        INSERT INTO notes_fts(rowid, name, summary, action_items, content)
+        VALUES (new.id, new.name, new.summary, new.action_items, new.content);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS notes_fts_delete AFTER DELETE ON notes BEGIN
+        INSERT INTO notes_fts(notes_fts, rowid, name, summary, action_items, content)
+        VALUES ('delete', old.id, old.name, old.summary, old.action_items, old.content);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS notes_fts_update AFTER UPDATE ON notes BEGIN
+        INSERT INTO notes_fts(notes_fts, rowid, name, summary, action_items, content)
+        VALUES ('delete', old.id, old.name, old.summary, old.action_items, old.content);
+        INSERT INTO notes_fts(rowid, name, summary, action_items, content)
+        VALUES (new.id, new.name, new.summary, new.action_items, new.content);
+    END""",
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Postgres: generated tsvector column + GIN index. SQLite: FTS5 table + sync triggers.
+    # Both are idempotent because init_db() also creates them.
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if bind.dialect.name == 'postgresql':
+        if 'search_vector' not in {c['name'] for c in inspector.get_columns('notes')}:
+            op.execute(sa.text(
+                f'ALTER TABLE notes ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ({PG_SEARCH_VECTOR}) STORED'
+            ))
+        op.execute(sa.text('CREATE INDEX IF NOT EXISTS ix_notes_search_vector ON notes USING gin (search_vector)'))
+    elif bind.dialect.name == 'sqlite':
+        created = not inspector.has_table('notes_fts')
+        for statement in SQLITE_FTS_DDL:
+            op.execute(sa.text(statement))
+        if created:
+            # Index notes that existed before the FTS table
+            op.execute(sa.text("INSERT INTO notes_fts(notes_fts) VALUES ('rebuild')"))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        op.execute(sa.text('DROP INDEX IF EXISTS ix_notes_search_vector'))
+        op.execute(sa.text('ALTER TABLE notes DROP COLUMN IF EXISTS search_vector'))
+    elif bind.dialect.name == 'sqlite':
+        for trigger in ('notes_fts_insert', 'notes_fts_delete', 'notes_fts_update'):
+            op.execute(sa.text(f'DROP TRIGGER IF EXISTS {trigger}'))
+        op.execute(sa.text('DROP TABLE IF EXISTS notes_fts'))
@@ -0,0 +1,84 @@
+"""Add api_usage_daily rollup table
+
+Revision ID: 7c3e5f9a1b08
+Revises: e4b9d0a7c215
+Create Date: 2026-10-18 19:14:52.207316
+
+"""
+from collections import defaultdict
+from datetime import date, datetime, timezone
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c3e5f9a1b08'
+down_revision: Union[str, Sequence[str], None] = 'e4b9d0a7c215'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 5000
+
+
+def _usage_day(value) -> date:
+    """UTC day of a usage_date, which at this revision may be a free-form string; today if unparseable."""
+    if isinstance(value, datetime):
+        parsed = value
+    else:
+        text = str(value or '').strip()
+        try:
+            parsed = datetime.fromisoformat(text.replace('Z', '+00:00'))
+        except ValueError:
+            try:
+                return date.fromisoformat(text[:10])
+            except ValueError:
+                return datetime.now(timezone.utc).date()
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc)
+    return parsed.date()
+
+
+def _rebuild_rollup(bind):
+    usage = sa.table('api_usage', *(sa.column(name) for name in (
+        'user_id', 'usage_date', 'input_tokens', 'output_tokens', 'cache_hit'
+    )))
+    daily = sa.table('api_usage_daily', sa.column('user_id'), sa.column('day', sa.Date()), *(
+        sa.column(name) for name in ('requests', 'input_tokens', 'output_tokens', 'cache_hits')
+    ))
+    bind.execute(daily.delete())
+    totals = defaultdict(lambda: {'requests': 0, 'input_tokens': 0, 'output_tokens': 0, 'cache_hits': 0})
+    result = bind.execution_options(yield_per=BATCH_SIZE).execute(sa.select(usage))
+    for user_id, usage_date, input_tokens, output_tokens, cache_hit in result:
+        row = totals[(user_id, _usage_day(usage_date))]
+        row['requests'] += 1
+        row['input_tokens'] += input_tokens or 0
+        row['output_tokens'] += output_tokens or 0
+        row['cache_hits'] += 1 if cache_hit else 0
+    rows = [{'user_id': user_id, 'day': day, **row} for (user_id, day), row in totals.items()]
+    for i in range(0, len(rows), BATCH_SIZE):
+        bind.execute(daily.insert(), rows[i:i + BATCH_SIZE])
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    # init_db() may already have created the table on a fresh database
+    if not sa.inspect(bind).has_table('api_usage_daily'):
+        op.create_table(
+            'api_usage_daily',
+            sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id'), primary_key=True),
+            sa.Column('day', sa.Date(), primary_key=True),
+            sa.Column('requests', sa.Integer(), nullable=False),
+            sa.Column('input_tokens', sa.Integer(), nullable=False),
+            sa.Column('output_tokens', sa.Integer(), nullable=False),
+            sa.Column('cache_hits', sa.Integer(), nullable=False),
+        )
+    # Recompute from scratch so rows logged before this migration are counted exactly once
+    _rebuild_rollup(bind)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('api_usage_daily')
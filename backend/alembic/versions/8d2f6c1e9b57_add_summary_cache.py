@@ -0,0 +1,56 @@
+"""Add summary_cache table and api_usage.cache_hit
+
+Revision ID: 8d2f6c1e9b57
+Revises: 3b7e91d2a4c0
+Create Date: 2026-10-18 11:03:15.402771
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d2f6c1e9b57'
+down_revision: Union[str, Sequence[str], None] = '3b7e91d2a4c0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    inspector = sa.inspect(op.get_bind())
+    if 'cache_hit' not in {c['name'] for c in inspector.get_columns('api_usage')}:
+        op.add_column(
+            'api_usage',
+            sa.Column('cache_hit', sa.Boolean(), server_default=sa.false(), nullable=False),
+        )
+    # init_db() may already have created the table on a fresh database
+    if inspector.has_table('summary_cache'):
+        return
+    op.create_table(
+        'summary_cache',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('content_hash', sa.String(length=64), nullable=False),
+        sa.Column('include_action_items', sa.Boolean(), nullable=False),
+        sa.Column('model', sa.String(), nullable=False),
+        sa.Column('prompt_version', sa.String(), nullable=False),
+        sa.Column('summary', sa.Text(), nullable=False),
+        sa.Column('action_items', sa.Text(), nullable=False),
+        sa.Column('input_tokens', sa.Integer(), nullable=True),
+        sa.Column('output_tokens', sa.Integer(), nullable=True),
+        sa.Column('hits', sa.Integer(), nullable=True),
+        sa.Column('last_used_at', sa.Float(), nullable=True),
+        sa.UniqueConstraint('content_hash', 'include_action_items', 'model', 'prompt_version'),
+    )
+    op.create_index(op.f('ix_summary_cache_id'), 'summary_cache', ['id'])
+    op.create_index(op.f('ix_summary_cache_last_used_at'), 'summary_cache', ['last_used_at'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_summary_cache_last_used_at'), table_name='summary_cache')
+    op.drop_index(op.f('ix_summary_cache_id'), table_name='summary_cache')
+    op.drop_table('summary_cache')
+    op.drop_column('api_usage', 'cache_hit')
@@ -0,0 +1,68 @@
+"""Scope summary_cache entries per user and size them for eviction
+
+Revision ID: 9e4d2b7a6f31
+Revises: 2f8a6d4c9e13
+Create Date: 2026-10-19 10:12:47.305118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9e4d2b7a6f31'
+down_revision: Union[str, Sequence[str], None] = '2f8a6d4c9e13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _create(per_user: bool) -> None:
+    user_columns = [
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id', ondelete='CASCADE'), nullable=False),
+    ] if per_user else []
+    size_columns = [sa.Column('size', sa.Integer(), nullable=False)] if per_user else [
+        sa.Column('input_tokens', sa.Integer(), nullable=True),
+        sa.Column('output_tokens', sa.Integer(), nullable=True),
+    ]
+    unique = ['user_id'] if per_user else []
+    op.create_table(
+        'summary_cache',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        *user_columns,
+        sa.Column('content_hash', sa.String(length=64), nullable=False),
+        sa.Column('include_action_items', sa.Boolean(), nullable=False),
+        sa.Column('model', sa.String(), nullable=False),
+        sa.Column('prompt_version', sa.String(), nullable=False),
+        sa.Column('summary', sa.Text(), nullable=False),
+        sa.Column('action_items', sa.Text(), nullable=False),
+        *size_columns,
+        sa.Column('hits', sa.Integer(), nullable=True),
+        sa.Column('last_used_at', sa.Float(), nullable=True),
+        sa.UniqueConstraint(*unique, 'content_hash', 'include_action_items', 'model', 'prompt_version'),
+    )
+    op.create_index(op.f('ix_summary_cache_id'), 'summary_cache', ['id'])
+    op.create_index(op.f('ix_summary_cache_last_used_at'), 'summary_cache', ['last_used_at'])
+
+
+def _drop() -> None:
+    op.drop_index(op.f('ix_summary_cache_last_used_at'), table_name='summary_cache')
+    op.drop_index(op.f('ix_summary_cache_id'), table_name='summary_cache')
+    op.drop_table('summary_cache')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Existing entries were shared between users and cannot be attributed, so the cache starts empty
+    inspector = sa.inspect(op.get_bind())
+    if 'user_id' in {c['name'] for c in inspector.get_columns('summary_cache')}:
+        return
+    _drop()
+    _create(per_user=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    _drop()
+    _create(per_user=False)
@@ -0,0 +1,52 @@
+"""Index at most 250,000 characters of note content for full-text search
+
+Revision ID: a3f7c2e8d410
+Revises: 9e4d2b7a6f31
+Create Date: 2026-10-19 11:40:05.662913
+
+"""
+import os
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3f7c2e8d410'
+down_revision: Union[str, Sequence[str], None] = '9e4d2b7a6f31'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+LANGUAGE = os.getenv('SEARCH_LANGUAGE', 'english')
+
+
+def _vector(content: str) -> str:
+    return (
+        f"setweight(to_tsvector('{LANGUAGE}', coalesce(name, '')), 'A') || "
+        f"setweight(to_tsvector('{LANGUAGE}', coalesce(summary, '')), 'B') || "
+        f"setweight(to_tsvector('{LANGUAGE}', coalesce(action_items, '')), 'B') || "
+        f"setweight(to_tsvector('{LANGUAGE}', {content}), 'C')"
+    )
+
+
+def _recreate(expression: str) -> None:
+    # Only Postgres has the generated column; a tsvector over 1 MB makes the note's INSERT/UPDATE fail
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute(sa.text('DROP INDEX IF EXISTS ix_notes_search_vector'))
+    op.execute(sa.text('ALTER TABLE notes DROP COLUMN IF EXISTS search_vector'))
+    op.execute(sa.text(
+        f'ALTER TABLE notes ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ({expression}) STORED'
+    ))
+    op.execute(sa.text('CREATE INDEX ix_notes_search_vector ON notes USING gin (search_vector)'))
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    _recreate(_vector("left(coalesce(content, ''), 250000)"))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    _recreate(_vector("coalesce(content, '')"))
@@ -0,0 +1,58 @@
+"""Index note_tags and make tag names unique per user
+
+Revision ID: e4b9d0a7c215
+Revises: 5a1c4e7f2d93
+Create Date: 2026-10-18 18:52:07.635190
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4b9d0a7c215'
+down_revision: Union[str, Sequence[str], None] = '5a1c4e7f2d93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    # init_db() may already have created the new layout on a fresh database
+    if not inspector.get_pk_constraint('note_tags').get('constrained_columns'):
+        op.execute("DELETE FROM note_tags WHERE note_id IS NULL OR tag_id IS NULL")
+        # Keep one row of each duplicated (note_id, tag_id) pair
+        row_id = 'ctid' if bind.dialect.name == 'postgresql' else 'rowid'
+        op.execute(
+            f"DELETE FROM note_tags WHERE {row_id} NOT IN "
+            f"(SELECT min({row_id}) FROM note_tags GROUP BY note_id, tag_id)"
+        )
+        with op.batch_alter_table('note_tags') as batch:
+            batch.alter_column('note_id', existing_type=sa.Integer(), nullable=False)
+            batch.alter_column('tag_id', existing_type=sa.Integer(), nullable=False)
+            batch.create_primary_key('pk_note_tags', ['note_id', 'tag_id'])
+    if 'ix_note_tags_tag_id_note_id' not in {i['name'] for i in inspector.get_indexes('note_tags')}:
+        op.create_index('ix_note_tags_tag_id_note_id', 'note_tags', ['tag_id', 'note_id'])
+
+    if 'uq_tags_user_id_name' not in {c['name'] for c in inspector.get_unique_constraints('tags')}:
+        with op.batch_alter_table('tags') as batch:
+            batch.drop_index('ix_tags_name')
+            batch.create_index('ix_tags_name', ['name'])
+            batch.create_unique_constraint('uq_tags_user_id_name', ['user_id', 'name'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('tags') as batch:
+        batch.drop_constraint('uq_tags_user_id_name', type_='unique')
+        batch.drop_index('ix_tags_name')
+        batch.create_index('ix_tags_name', ['name'], unique=True)
+    op.drop_index('ix_note_tags_tag_id_note_id', table_name='note_tags')
+    with op.batch_alter_table('note_tags') as batch:
+        batch.drop_constraint('pk_note_tags', type_='primary')
+        batch.alter_column('note_id', existing_type=sa.Integer(), nullable=True)
+        batch.alter_column('tag_id', existing_type=sa.Integer(), nullable=True)
@@ -0,0 +1,114 @@
+# app/async_crud.py
+import asyncio
+from datetime import datetime
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
+from app import crud, models
+
+# --- Async versions of the read paths in app.crud, for endpoints that should not hold a threadpool slot ---
+# Each takes the session from database.get_read_db: with an AsyncSession (DB_ASYNC=1) the query is awaited
+# on the async engine; with a sync Session it runs in a worker thread only for as long as the query takes.
+# Statements are built by the same helpers app.crud uses, so both paths return the same rows.
+
+
+async def _run(db: AsyncSession | Session, stmt, fetch):
+    """Execute stmt and return fetch(result), fetching inside the worker thread for sync sessions."""
+    if isinstance(db, AsyncSession):
+        return fetch(await db.execute(stmt))
+    return await asyncio.to_thread(lambda: fetch(db.execute(stmt)))
+
+
+def _all(result):
+    return result.scalars().all()
+
+
+def _first(result):
+    return result.scalars().first()
+
+
+def _scalar(result):
+    return result.scalar()
+
+
+async def release(db: AsyncSession | Session):
+    """Return the session's connection to the pool; objects already loaded stay readable."""
+    if isinstance(db, AsyncSession):
+        await db.close()
+    else:
+        await asyncio.to_thread(db.close)
+
+
+async def get_user(db, user_id: int) -> models.User | None:
+    return await _run(db, select(models.User).where(models.User.id == user_id), _first)
+
+
+async def get_openai_api_key(db, user_id: int) -> str | None:
+    return await _run(db, select(models.User.openai_api_key).where(models.User.id == user_id), _scalar)
+
+
+async def get_notes(
+    db,
+    tags: list[str] | None,
+    user_id: int,
+    fields: tuple[str, ...] | None = None,
+    match: str = "any",
+    since: datetime | None = None,
+    until: datetime | None = None,
+    order_by: str = "created_at",
+    sort: str | None = None,
+) -> list[models.Note]:
+    return await _run(db, crud.notes_select(tags, user_id, fields, match, since, until, order_by, sort), _all)
+
+
+async def get_notes_page(
+    db,
+    tags: list[str] | None,
+    user_id: int,
+    limit: int,
+    cursor: str | None = None,
+    order_by: str = "created_at",
+    fields: tuple[str, ...] | None = None,
+    match: str = "any",
+    since: datetime | None = None,
+    until: datetime | None = None,
+    sort: str = "desc",
+) -> tuple[list[models.Note], str | None]:
+    stmt = crud.notes_page_select(tags, user_id, limit, cursor, order_by, fields, match, since, until, sort)
+    return crud.page_result(await _run(db, stmt, _all), limit, order_by)
+
+
+async def get_note_by_id(db, note_id: int, user_id: int) -> models.Note | None:
+    # Tags are loaded up front; an AsyncSession cannot lazy load them during serialization
+    stmt = (
+        select(models.Note)
+        .where(models.Note.id == note_id, models.Note.user_id == user_id)
+        .options(selectinload(models.Note.tags))
+    )
+    return await _run(db, stmt, _first)
+
+
+async def get_notes_by_tags(db, tags: list[str], user_id: int, match: str = "all") -> list[models.Note]:
+    return await _run(db, crud.notes_select(tags, user_id, match=match), _all)
+
+
+async def get_tags(db, user_id: int) -> list[models.Tag]:
+    return await _run(db, select(models.Tag).where(models.Tag.user_id == user_id), _all)
+
+
+async def get_tag_for_note(db, note_id: int, user_id: int) -> list[models.Tag]:
+    note = await get_note_by_id(db, note_id, user_id)
+    return note.tags if note else []
+
+
+async def get_tags_for_notes(db, note_ids: list[int], user_id: int) -> dict[int, list[models.Tag]]:
+    stmt = crud.tags_for_notes_select(note_ids, user_id)
+    return await _run(db, stmt, lambda result: crud.group_tags(note_ids, result))
+
+
+async def get_tag_facets(db, user_id: int, tags: list[str] | None = None, match: str = "all") -> list[dict]:
+    return await _run(db, crud.tag_facets_select(user_id, tags, match), crud.facet_rows)
+
+
+async def get_api_usage(db, user_id: int) -> list[models.ApiUsage]:
+    return await _run(db, select(models.ApiUsage).where(models.ApiUsage.user_id == user_id), _all)
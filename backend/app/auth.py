@@ -1,31 +1,20 @@
-from passlib.context import CryptContext
 from jose import JWTError, jwt
 from datetime import datetime, timedelta, timezone
 from typing import Optional
 from fastapi import Depends, HTTPException
-from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from app.database import get_db
+from fastapi.security import OAuth2PasswordBearer
+from app.database import get_read_db
 from app.models import User
-from sqlalchemy.orm import Session
+from app.user_cache import USER_FIELDS, user_cache
+from app import async_crud
 import os
+import time
 
 # Configuration from environment (with sensible defaults)
 SECRET_KEY = os.getenv("SECRET_KEY", "super-secret")
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "60"))
 
-# Password hashing context
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-
-# Password hashing and verification
-def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
-
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
-
-
 # JWT token creation
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     to_encode = data.copy()
@@ -44,7 +33,7 @@ def decode_access_token(token: str) -> Optional[str]:
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/token")
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> str:
+async def get_current_user(token: str = Depends(oauth2_scheme), db=Depends(get_read_db)) -> str:
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         user_id: str = payload.get("sub")
@@ -53,7 +42,23 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
     except JWTError:
         raise HTTPException(status_code=401, detail="Could not validate credentials")
 
-    user = db.query(User).filter(User.id == int(user_id)).first()
+    cached = await user_cache.get(user_id)
+    if cached is not None:
+        return User(**cached)
+    looked_up_at = time.monotonic()
+    user = await async_crud.get_user(db, int(user_id))
+    # Don't hold a pooled connection for the rest of the request; read endpoints reopen it on their next query
+    await async_crud.release(db)
     if user is None:
         raise HTTPException(status_code=404, detail="User not found")
-    return user
\ No newline at end of file
+    record = {name: getattr(user, name) for name in USER_FIELDS}
+    await user_cache.set(user_id, record, looked_up_at)
+    # Detached copy without the password hash, the same whether or not the cache answered
+    return User(**record)
+
+
+async def get_openai_api_key(current_user: User = Depends(get_current_user), db=Depends(get_read_db)) -> Optional[str]:
+    """The current user's OpenAI key, read from the database for the endpoints that call OpenAI."""
+    api_key = await async_crud.get_openai_api_key(db, current_user.id)
+    await async_crud.release(db)
+    return api_key
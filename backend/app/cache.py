@@ -0,0 +1,112 @@
+# app/cache.py
+import asyncio
+import hashlib
+import os
+import threading
+from dataclasses import dataclass, field
+from sqlalchemy.orm import Session
+from app import crud
+from app.metrics import timed
+from typing import AsyncIterator
+from app.summarizer import MODEL, PROMPT_VERSION, require_api_key, stream_summary, summarize_text
+
+EXTRACTION_CACHE_MAX_BYTES = int(os.getenv("EXTRACTION_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+SUMMARY_CACHE_MAX_BYTES = int(os.getenv("SUMMARY_CACHE_MAX_BYTES", str(128 * 1024 * 1024)))
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def record(self, hit: bool):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def evicted(self, count: int):
+        with self._lock:
+            self.evictions += count
+
+    def snapshot(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+        }
+
+
+extraction_stats = CacheStats()
+summary_stats = CacheStats()
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def lookup_extraction(db: Session, content_hash: str, extractor_version: str) -> str | None:
+    text = crud.get_extraction_cache(db, content_hash, extractor_version)
+    extraction_stats.record(text is not None)
+    return text
+
+
+def store_extraction(db: Session, content_hash: str, extractor_version: str, text: str):
+    if crud.create_extraction_cache(db, content_hash, extractor_version, text):
+        extraction_stats.evicted(crud.evict_extraction_cache(db, EXTRACTION_CACHE_MAX_BYTES))
+
+
+def store_summary(db: Session, key: tuple, summary: str, action_items: str):
+    if crud.create_summary_cache(db, *key, summary, action_items):
+        summary_stats.evicted(crud.evict_summary_cache(db, SUMMARY_CACHE_MAX_BYTES))
+
+
+async def summarize_cached(
+    db: Session, user_id: int, text: str, user_openai_api_key: str, include_action_items: bool = True
+) -> tuple[str, str, int, int, bool]:
+    """summarize_text backed by the summary cache.
+
+    Entries are per user, since each summary is paid for with the user's own key.
+    Returns (summary, action_items, input_tokens, output_tokens, cache_hit); a hit
+    spends no tokens, so both token counts are 0.
+    """
+    require_api_key(user_openai_api_key)
+    key = (user_id, content_hash(text), include_action_items, MODEL, PROMPT_VERSION)
+    cached = await asyncio.to_thread(crud.get_summary_cache, db, *key)
+    summary_stats.record(cached is not None)
+    if cached:
+        return *cached, 0, 0, True
+    with timed("summarize"):
+        summary, action_items, input_tokens, output_tokens = await summarize_text(
+            text, user_openai_api_key, include_action_items
+        )
+    await asyncio.to_thread(store_summary, db, key, summary, action_items)
+    return summary, action_items, input_tokens, output_tokens, False
+
+
+async def stream_summary_cached(
+    db: Session, user_id: int, text: str, user_openai_api_key: str, include_action_items: bool = True
+) -> AsyncIterator[tuple[str, object]]:
+    """stream_summary backed by the summary cache; the final "result" event also carries cache_hit."""
+    require_api_key(user_openai_api_key)
+    key = (user_id, content_hash(text), include_action_items, MODEL, PROMPT_VERSION)
+    cached = await asyncio.to_thread(crud.get_summary_cache, db, *key)
+    summary_stats.record(cached is not None)
+    if cached:
+        summary, action_items = cached
+        yield "summary", summary
+        for item in action_items.splitlines():
+            yield "action_item", item
+        yield "result", (summary, action_items, 0, 0, True)
+        return
+    with timed("summarize"):
+        async for event, data in stream_summary(text, user_openai_api_key, include_action_items):
+            if event == "result":
+                await asyncio.to_thread(store_summary, db, key, *data[:2])
+                data = (*data, False)
+            yield event, data
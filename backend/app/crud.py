@@ -1,12 +1,38 @@
 # app/crud.py
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy.orm import Session, load_only, selectinload
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.exc import IntegrityError
 from app import models, schemas
 from fastapi import HTTPException
-from app import auth
+from app.related import related_index
+from app.user_cache import user_cache
+from app.usage import UsageEvent, add_to_rollup, insert_usage
+import base64
+import binascii
+import json
+import os
+import time
+from datetime import datetime
 
-def create_note(db: Session, title: str, content: str, summary: str, action_items: str, created_at: str, tags: list[str], user_id: int) -> models.Note:
+# Largest page GET /notes/ will return in one request
+NOTES_PAGE_MAX_LIMIT = int(os.getenv("NOTES_PAGE_MAX_LIMIT", "200"))
+NOTE_LIST_FIELDS = ("id", "user_id", "name", "content", "summary", "action_items", "created_at", "updated_at", "tags")
+NOTE_SORT_FIELDS = ("created_at", "updated_at")
+
+def create_note(
+    db: Session,
+    title: str,
+    content: str,
+    summary: str,
+    action_items: str,
+    created_at: datetime | None,
+    tags: list[str],
+    user_id: int,
+    usage: UsageEvent | None = None
+) -> models.Note:
+    """Create a note; when usage is given its api_usage row is written in the same transaction."""
     tag_objs = db.query(models.Tag).filter(models.Tag.name.in_(tags), models.Tag.user_id == user_id).all()
+    created_at = created_at or models.utcnow()
     note = models.Note(
         name=title,
         content=content,
@@ -18,49 +44,211 @@ def create_note(db: Session, title: str, content: str, summary: str, action_item
         user_id=user_id
     )
     db.add(note)
+    if usage is not None:
+        db.flush()
+        usage.note_id = note.id
+        insert_usage(db, [usage])
     db.commit()
     db.refresh(note)
+    related_index.note_saved(note)
     return note
 
-def get_notes(db: Session, tags: list[str] | None, user_id: int) -> list[models.Note]:
-    query = db.query(models.Note).filter(models.Note.user_id == user_id)
-    if tags:
-        query = query.join(models.Note.tags).filter(models.Tag.name.in_(tags)).distinct()
-    return query.all()
+def create_notes_bulk(db: Session, items: list[dict], user_id: int) -> list[models.Note]:
+    """Insert several summarized notes, their tag links and usage rows in one transaction.
 
-def search_notes(db: Session, query: str, user_id: int) -> list[models.Note]:
-    if not query:
-        return db.query(models.Note).filter(models.Note.user_id == user_id).all()
-    
-    return (
-        db.query(models.Note)
-        .filter(
-            models.Note.user_id == user_id,
-            (models.Note.name.ilike(f"%{query}%") | models.Note.content.ilike(f"%{query}%"))
+    Each item holds title, content, summary, action_items, created_at, tags,
+    input_tokens, output_tokens and cache_hit.
+    """
+    names = {name for item in items for name in item["tags"]}
+    tags_by_name = {}
+    if names:
+        tags_by_name = {
+            tag.name: tag
+            for tag in db.query(models.Tag).filter(models.Tag.name.in_(names), models.Tag.user_id == user_id)
+        }
+    created_at = models.utcnow()
+    notes = [
+        models.Note(
+            name=item["title"],
+            content=item["content"],
+            summary=item["summary"],
+            action_items=item["action_items"],
+            created_at=item["created_at"] or created_at,
+            updated_at=item["created_at"] or created_at,
+            tags=[tags_by_name[name] for name in item["tags"] if name in tags_by_name],
+            user_id=user_id
         )
-        .all()
-    )
+        for item in items
+    ]
+    try:
+        db.add_all(notes)
+        db.flush()
+        note_ids = [note.id for note in notes]
+        insert_usage(db, [
+            UsageEvent(
+                user_id, note_id, item["created_at"] or created_at, item["input_tokens"], item["output_tokens"], item["cache_hit"]
+            )
+            for note_id, item in zip(note_ids, items)
+        ])
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    # Reload every note in one query instead of a refresh per row
+    if note_ids:
+        db.query(models.Note).options(selectinload(models.Note.tags)).filter(models.Note.id.in_(note_ids)).all()
+    for note in notes:
+        related_index.note_saved(note)
+    return notes
+
+def tagged_note_ids(tags: list[str], user_id: int, match: str = "all"):
+    """SELECT of the ids of notes carrying all (or any) of the named tags.
+
+    Resolves names through the (user_id, name) unique index, then reads
+    note_tags through its (tag_id, note_id) index without touching notes.
+    """
+    names = set(tags)
+    tag_ids = select(models.Tag.id).where(models.Tag.user_id == user_id, models.Tag.name.in_(names))
+    note_ids = select(models.note_tags.c.note_id).where(models.note_tags.c.tag_id.in_(tag_ids))
+    if match == "all":
+        note_ids = note_ids.group_by(models.note_tags.c.note_id).having(func.count() == len(names))
+    return note_ids
+
+def notes_select(
+    tags: list[str] | None,
+    user_id: int,
+    fields: tuple[str, ...] | None = None,
+    match: str = "any",
+    since: datetime | None = None,
+    until: datetime | None = None,
+    order_by: str = "created_at",
+    sort: str | None = None,
+):
+    """SELECT of a user's notes; shared by the sync reads here and the async ones in app.async_crud.
+
+    since (inclusive) and until (exclusive) bound the order_by timestamp, which the
+    (user_id, created_at/updated_at) indexes serve together with the sort.
+    """
+    stmt = select(models.Note).where(models.Note.user_id == user_id)
+    if tags:
+        stmt = stmt.where(models.Note.id.in_(tagged_note_ids(tags, user_id, match)))
+    sort_column = getattr(models.Note, order_by)
+    if since is not None:
+        stmt = stmt.where(sort_column >= since)
+    if until is not None:
+        stmt = stmt.where(sort_column < until)
+    if sort == "asc":
+        stmt = stmt.order_by(sort_column.asc(), models.Note.id.asc())
+    elif sort == "desc":
+        stmt = stmt.order_by(sort_column.desc(), models.Note.id.desc())
+    if fields:
+        if sort and order_by not in fields:
+            fields = (*fields, order_by)
+        stmt = stmt.options(load_only(*(getattr(models.Note, name) for name in fields if name != "tags")))
+    if not fields or "tags" in fields:
+        # One extra SELECT ... WHERE note_id IN (...) for the whole page instead of one per note
+        stmt = stmt.options(selectinload(models.Note.tags))
+    return stmt
+
+def get_notes(
+    db: Session,
+    tags: list[str] | None,
+    user_id: int,
+    fields: tuple[str, ...] | None = None,
+    match: str = "any",
+    since: datetime | None = None,
+    until: datetime | None = None,
+    order_by: str = "created_at",
+    sort: str | None = None,
+) -> list[models.Note]:
+    return db.scalars(notes_select(tags, user_id, fields, match, since, until, order_by, sort)).all()
+
+def encode_cursor(value: datetime, note_id: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps([value.isoformat(), note_id]).encode()).decode()
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        value, note_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if not isinstance(value, str) or not isinstance(note_id, int):
+            raise ValueError
+        return models.as_utc(datetime.fromisoformat(value)), note_id
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+
+def notes_page_select(
+    tags: list[str] | None,
+    user_id: int,
+    limit: int,
+    cursor: str | None = None,
+    order_by: str = "created_at",
+    fields: tuple[str, ...] | None = None,
+    match: str = "any",
+    since: datetime | None = None,
+    until: datetime | None = None,
+    sort: str = "desc",
+):
+    """SELECT of one page of notes plus one extra row, which tells page_result whether there is a next page."""
+    stmt = notes_select(tags, user_id, fields, match, since, until, order_by, sort)
+    if cursor:
+        value, last_id = decode_cursor(cursor)
+        sort_column = getattr(models.Note, order_by)
+        if sort == "asc":
+            after = or_(sort_column > value, and_(sort_column == value, models.Note.id > last_id))
+        else:
+            after = or_(sort_column < value, and_(sort_column == value, models.Note.id < last_id))
+        stmt = stmt.where(after)
+    return stmt.limit(limit + 1)
+
+def page_result(notes: list[models.Note], limit: int, order_by: str) -> tuple[list[models.Note], str | None]:
+    if len(notes) <= limit:
+        return notes, None
+    notes = notes[:limit]
+    last = notes[-1]
+    return notes, encode_cursor(getattr(last, order_by), last.id)
+
+def get_notes_page(
+    db: Session,
+    tags: list[str] | None,
+    user_id: int,
+    limit: int,
+    cursor: str | None = None,
+    order_by: str = "created_at",
+    fields: tuple[str, ...] | None = None,
+    match: str = "any",
+    since: datetime | None = None,
+    until: datetime | None = None,
+    sort: str = "desc",
+) -> tuple[list[models.Note], str | None]:
+    """Return one page of notes sorted by order_by (newest first unless sort is "asc")
+    and the cursor for the next page (None on the last)."""
+    stmt = notes_page_select(tags, user_id, limit, cursor, order_by, fields, match, since, until, sort)
+    return page_result(db.scalars(stmt).all(), limit, order_by)
 
 def delete_note(db: Session, note_id: int, user_id: int) -> None:
     note = db.query(models.Note).filter(models.Note.id == note_id, models.Note.user_id == user_id).first()
     if note:
         db.delete(note)
         db.commit()
+        related_index.note_deleted(user_id, note_id)
     else:
         raise ValueError("Note not found")
     
 def get_note_by_id(db: Session, note_id: int, user_id: int) -> models.Note | None:
     return db.query(models.Note).filter(models.Note.id == note_id, models.Note.user_id == user_id).first()
 
+def get_notes_by_ids(db: Session, note_ids: list[int], user_id: int) -> list[models.Note]:
+    return db.query(models.Note).filter(models.Note.id.in_(note_ids), models.Note.user_id == user_id).all()
+
 def update_note(
     db: Session,
     note_id: int,
     title: str | None = None,
     content: str | None = None,
     summary: str | None = None,
-    updated_at: str | None = None,
+    updated_at: datetime | None = None,
     action_items: str | None = None,
-    user_id: int = None
+    user_id: int = None,
+    usage: UsageEvent | None = None
 ) -> models.Note | None:
     note = db.query(models.Note).filter(models.Note.id == note_id, models.Note.user_id == user_id).first()
     if not note:
@@ -76,9 +264,16 @@ def update_note(
         note.action_items = action_items
     if updated_at is not None:
         note.updated_at = updated_at
+    elif db.is_modified(note):
+        note.updated_at = models.utcnow()
+    if usage is not None:
+        usage.note_id = note.id
+        insert_usage(db, [usage])
 
     db.commit()
     db.refresh(note)
+    if title is not None or content is not None or summary is not None:
+        related_index.note_saved(note)
     return note
 
 def create_tag(db: Session, tag: schemas.TagCreate, user_id: int):
@@ -97,18 +292,48 @@ def get_tag_for_note(db: Session, note_id: int, user_id: int) -> list[models.Tag
         return []
     return note.tags
 
-def get_notes_by_tags(db: Session, tags: list[str], user_id: int) -> list[models.Note]:
-    if not tags:
-        return db.query(models.Note).filter(models.Note.user_id == user_id).all()
+def tags_for_notes_select(note_ids: list[int], user_id: int):
     return (
-        db.query(models.Note)
-        .join(models.Note.tags)
-        .filter(models.Tag.name.in_(tags), models.Note.user_id == user_id)
-        .group_by(models.Note.id)
-        .having(func.count(models.Tag.id) == len(tags))
-        .all()
+        select(models.note_tags.c.note_id, models.Tag)
+        .join(models.Tag, models.Tag.id == models.note_tags.c.tag_id)
+        .join(models.Note, models.Note.id == models.note_tags.c.note_id)
+        .where(models.note_tags.c.note_id.in_(note_ids), models.Note.user_id == user_id)
+        .order_by(models.Tag.name)
+    )
+
+def group_tags(note_ids: list[int], rows) -> dict[int, list[models.Tag]]:
+    result = {note_id: [] for note_id in note_ids}
+    for note_id, tag in rows:
+        result[note_id].append(tag)
+    return result
+
+def get_tags_for_notes(db: Session, note_ids: list[int], user_id: int) -> dict[int, list[models.Tag]]:
+    """Tags for many notes in one query, keyed by note id."""
+    return group_tags(note_ids, db.execute(tags_for_notes_select(note_ids, user_id)))
+
+def get_notes_by_tags(db: Session, tags: list[str], user_id: int, match: str = "all") -> list[models.Note]:
+    return db.scalars(notes_select(tags, user_id, match=match)).all()
+
+def tag_facets_select(user_id: int, tags: list[str] | None = None, match: str = "all"):
+    counted = models.note_tags.c.note_id
+    join_on = models.note_tags.c.tag_id == models.Tag.id
+    if tags:
+        join_on = and_(join_on, counted.in_(tagged_note_ids(tags, user_id, match)))
+    return (
+        select(models.Tag, func.count(counted))
+        .outerjoin(models.note_tags, join_on)
+        .where(models.Tag.user_id == user_id)
+        .group_by(models.Tag.id)
+        .order_by(func.count(counted).desc(), models.Tag.name)
     )
 
+def facet_rows(rows) -> list[dict]:
+    return [{"id": tag.id, "name": tag.name, "color": tag.color, "note_count": count} for tag, count in rows]
+
+def get_tag_facets(db: Session, user_id: int, tags: list[str] | None = None, match: str = "all") -> list[dict]:
+    """Every tag of the user with its note count, restricted to notes matching tags when given."""
+    return facet_rows(db.execute(tag_facets_select(user_id, tags, match)))
+
 def delete_tag(db: Session, tag_id: int, user_id: int):
     tag = db.query(models.Tag).filter(models.Tag.id == tag_id, models.Tag.user_id == user_id).first()
     if tag:
@@ -144,17 +369,17 @@ def remove_tag_from_note(db: Session, note_id: int, tag_id: int, user_id: int) -
 
     return note
 
-def register_user(db: Session, user: schemas.UserCreate):
+def register_user(db: Session, user: schemas.UserCreate, hashed_password: str):
+    """Create a user; the caller hashes the password (see app.passwords)."""
     if db.query(models.User).filter(models.User.email == user.email).first():
         raise HTTPException(status_code=400, detail="Email already registered")
     if db.query(models.User).filter(models.User.username == user.username).first():
         raise HTTPException(status_code=400, detail="Username already taken")
 
-    hashed = auth.hash_password(user.password)
     db_user = models.User(
         email=user.email,
         username=user.username,
-        hashed_password=hashed,
+        hashed_password=hashed_password,
         openai_api_key=user.openai_api_key
     )
     db.add(db_user)
@@ -162,14 +387,14 @@ def register_user(db: Session, user: schemas.UserCreate):
     db.refresh(db_user)
     return db_user
 
-def authenticate_user(db: Session, identifier: str, password: str):
-    user = db.query(models.User).filter(
+def get_user_by_login(db: Session, identifier: str) -> models.User | None:
+    """The user whose email or username is identifier; the caller verifies the password."""
+    return db.query(models.User).filter(
         (models.User.email == identifier) | (models.User.username == identifier)
     ).first()
 
-    if user and auth.verify_password(password, user.hashed_password):
-        return user
-    return None
+def get_user(db: Session, user_id: int) -> models.User | None:
+    return db.query(models.User).filter(models.User.id == user_id).first()
 
 def update_user_api_key(db: Session, user_id: int, new_key: str):
     user = db.query(models.User).filter(models.User.id == user_id).first()
@@ -177,16 +402,17 @@ def update_user_api_key(db: Session, user_id: int, new_key: str):
         raise HTTPException(status_code=404, detail="User not found")
     user.openai_api_key = new_key
     db.commit()
+    user_cache.invalidate(user_id)
     return {"msg": "API key updated"}
 
-def update_user_password(db: Session, user_id: int, new_password: str):
+def update_user_password(db: Session, user_id: int, hashed_password: str):
     user = db.query(models.User).filter(models.User.id == user_id).first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    
-    hashed_password = auth.hash_password(new_password)
+
     user.hashed_password = hashed_password
     db.commit()
+    user_cache.invalidate(user_id)
     return {"msg": "Password updated successfully"}
 
 def update_user_username(db: Session, user_id: int, new_username: str):
@@ -199,6 +425,7 @@ def update_user_username(db: Session, user_id: int, new_username: str):
     
     user.username = new_username
     db.commit()
+    user_cache.invalidate(user_id)
     return {"msg": "Username updated successfully"}
 
 def update_user_email(db: Session, user_id: int, new_email: str):
@@ -211,6 +438,7 @@ def update_user_email(db: Session, user_id: int, new_email: str):
     
     user.email = new_email
     db.commit()
+    user_cache.invalidate(user_id)
     return {"msg": "Email updated successfully"}
 
 def get_api_usage(db: Session, user_id: int) -> list[models.ApiUsage]:
@@ -227,18 +455,135 @@ def create_api_usage(
     db: Session,
     user_id: int,
     note_id: int | None = None,
-    usage_date: str = "",
+    usage_date: datetime | None = None,
     input_tokens: int = 0,
-    output_tokens: int = 0
+    output_tokens: int = 0,
+    cache_hit: bool = False
 ) -> models.ApiUsage:
+    usage_date = usage_date or models.utcnow()
     api_usage = models.ApiUsage(
         user_id=user_id,
         note_id=note_id,
         usage_date=usage_date,
         input_tokens=input_tokens,
-        output_tokens=output_tokens
+        output_tokens=output_tokens,
+        cache_hit=cache_hit
     )
     db.add(api_usage)
+    add_to_rollup(db, [(user_id, usage_date, input_tokens, output_tokens, cache_hit)])
     db.commit()
     db.refresh(api_usage)
-    return api_usage
\ No newline at end of file
+    return api_usage
+
+def get_extraction_cache(db: Session, content_hash: str, extractor_version: str) -> str | None:
+    """Cached text for a file, counting the hit. Values are read before the commit expires the entry,
+    so callers off the session's thread never trigger a lazy load."""
+    entry = (
+        db.query(models.ExtractionCache)
+        .filter(
+            models.ExtractionCache.content_hash == content_hash,
+            models.ExtractionCache.extractor_version == extractor_version,
+        )
+        .first()
+    )
+    if entry is None:
+        return None
+    text = entry.text
+    entry.hits = (entry.hits or 0) + 1
+    entry.last_used_at = time.time()
+    db.commit()
+    return text
+
+def create_extraction_cache(db: Session, content_hash: str, extractor_version: str, text: str) -> models.ExtractionCache | None:
+    entry = models.ExtractionCache(
+        content_hash=content_hash,
+        extractor_version=extractor_version,
+        text=text,
+        size=len(text.encode("utf-8")),
+        hits=0,
+        last_used_at=time.time(),
+    )
+    db.add(entry)
+    try:
+        db.commit()
+    except IntegrityError:
+        # Another worker cached the same file first
+        db.rollback()
+        return None
+    return entry
+
+def _evict_cache(db: Session, model, max_bytes: int) -> int:
+    """Delete least recently used entries until the cache fits in max_bytes. Returns rows evicted."""
+    total = db.query(func.coalesce(func.sum(model.size), 0)).scalar()
+    excess = total - max_bytes
+    if excess <= 0:
+        return 0
+    doomed = []
+    for entry_id, size in db.query(model.id, model.size).order_by(model.last_used_at).all():
+        doomed.append(entry_id)
+        excess -= size
+        if excess <= 0:
+            break
+    db.query(model).filter(model.id.in_(doomed)).delete(synchronize_session=False)
+    db.commit()
+    return len(doomed)
+
+def evict_extraction_cache(db: Session, max_bytes: int) -> int:
+    return _evict_cache(db, models.ExtractionCache, max_bytes)
+
+def evict_summary_cache(db: Session, max_bytes: int) -> int:
+    return _evict_cache(db, models.SummaryCache, max_bytes)
+
+def get_summary_cache(
+    db: Session, user_id: int, content_hash: str, include_action_items: bool, model: str, prompt_version: str
+) -> tuple[str, str] | None:
+    """Cached (summary, action_items), counting the hit; read before the commit as in get_extraction_cache."""
+    entry = (
+        db.query(models.SummaryCache)
+        .filter(
+            models.SummaryCache.user_id == user_id,
+            models.SummaryCache.content_hash == content_hash,
+            models.SummaryCache.include_action_items == include_action_items,
+            models.SummaryCache.model == model,
+            models.SummaryCache.prompt_version == prompt_version,
+        )
+        .first()
+    )
+    if entry is None:
+        return None
+    cached = entry.summary, entry.action_items
+    entry.hits = (entry.hits or 0) + 1
+    entry.last_used_at = time.time()
+    db.commit()
+    return cached
+
+def create_summary_cache(
+    db: Session,
+    user_id: int,
+    content_hash: str,
+    include_action_items: bool,
+    model: str,
+    prompt_version: str,
+    summary: str,
+    action_items: str,
+) -> models.SummaryCache | None:
+    entry = models.SummaryCache(
+        user_id=user_id,
+        content_hash=content_hash,
+        include_action_items=include_action_items,
+        model=model,
+        prompt_version=prompt_version,
+        summary=summary,
+        action_items=action_items,
+        size=len(summary.encode("utf-8")) + len(action_items.encode("utf-8")),
+        hits=0,
+        last_used_at=time.time(),
+    )
+    db.add(entry)
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        return None
+    return entry
+
@@ -10,19 +10,147 @@ DB_URL = os.getenv("DATABASE_URL")
 if not DB_URL:
     raise RuntimeError("DATABASE_URL environment variable is not set")
 
-from sqlalchemy import create_engine
+import asyncio
+import threading
+import time
+from collections import deque
+from sqlalchemy import create_engine, exc
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from app.metrics import instrument_engine, instrument_sessions
 
-engine = create_engine(DB_URL)
+# --- Connection pool, shared by the sync engine and the optional async engine ---
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+# Seconds a request waits for a free connection before failing
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+# Replace connections older than this many seconds (-1 to never recycle)
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "1") == "1"
+# Serve read endpoints from an async engine (asyncpg / aiosqlite) instead of the threadpool
+DB_ASYNC = os.getenv("DB_ASYNC", "0") == "1"
+# Defaults to DATABASE_URL with its driver swapped for the async one
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL")
+
+ASYNC_DRIVERS = {"postgresql": "postgresql+asyncpg", "sqlite": "sqlite+aiosqlite"}
+
+
+class PoolStats:
+    """Checkout wait times of a connection pool; kept outside the pool, which the engine may recreate."""
+
+    def __init__(self, recent: int = 1000):
+        self._lock = threading.Lock()
+        self._recent = deque(maxlen=recent)
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def record(self, wait: float, timed_out: bool = False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+            self._recent.append(wait)
+
+    def snapshot(self, pool=None) -> dict:
+        with self._lock:
+            recent = sorted(self._recent)
+            stats = {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_ms_avg": round(1000 * self.total_wait / max(1, self.checkouts + self.timeouts), 3),
+                "wait_ms_max": round(1000 * self.max_wait, 3),
+                "wait_ms_p50": round(1000 * recent[len(recent) // 2], 3) if recent else 0.0,
+                "wait_ms_p95": round(1000 * recent[int(len(recent) * 0.95)], 3) if recent else 0.0,
+            }
+        if isinstance(pool, QueuePool):
+            capacity = pool.size() + max(0, pool._max_overflow)
+            stats.update(
+                size=pool.size(),
+                max_overflow=pool._max_overflow,
+                checked_out=pool.checkedout(),
+                idle=pool.checkedin(),
+                saturation=round(pool.checkedout() / capacity, 3) if capacity > 0 else None,
+            )
+        return stats
+
+
+class TimedPoolMixin:
+    """Records how long each checkout waited for a connection (including opening a new one)."""
+    stats: PoolStats
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except exc.TimeoutError:
+            self.stats.record(time.perf_counter() - start, timed_out=True)
+            raise
+        self.stats.record(time.perf_counter() - start)
+        return conn
+
+
+class TimedQueuePool(TimedPoolMixin, QueuePool):
+    stats = PoolStats()
+
+
+class TimedAsyncQueuePool(TimedPoolMixin, AsyncAdaptedQueuePool):
+    stats = PoolStats()
+
+
+def pool_options(url: str, poolclass) -> dict:
+    if make_url(url).get_backend_name() == "sqlite" and make_url(url).database in (None, "", ":memory:"):
+        # In-memory SQLite lives in a single connection; keep SQLAlchemy's default pool for it
+        return {}
+    return {
+        "poolclass": poolclass,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+
+
+def async_url(url: str) -> str:
+    parsed = make_url(url)
+    driver = ASYNC_DRIVERS.get(parsed.get_backend_name())
+    if driver is None:
+        raise RuntimeError(f"No async driver for {parsed.get_backend_name()}; set ASYNC_DATABASE_URL")
+    return parsed.set(drivername=driver).render_as_string(hide_password=False)
+
+
+engine = create_engine(DB_URL, **pool_options(DB_URL, TimedQueuePool))
+instrument_engine(engine)
+# Covers AsyncSession too, which commits through a sync Session
+instrument_sessions(Session)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+async_engine = None
+AsyncSessionLocal = None
+if DB_ASYNC:
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    _async_url = ASYNC_DATABASE_URL or async_url(DB_URL)
+    async_engine = create_async_engine(_async_url, **pool_options(_async_url, TimedAsyncQueuePool))
+    instrument_engine(async_engine.sync_engine)
+    # Loaded objects stay readable after commit instead of triggering (disallowed) lazy loads
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
 
 def init_db():
-    from app import models
+    from app import models, search
     Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        search.create_search_index(conn)
 
 def get_db():
     db = SessionLocal()
@@ -30,3 +158,33 @@ def get_db():
         yield db
     finally:
         db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+async def get_read_db():
+    """Session for async read endpoints: an AsyncSession when DB_ASYNC is on, else a sync Session
+    whose queries app.async_crud runs in worker threads."""
+    if AsyncSessionLocal is not None:
+        async with AsyncSessionLocal() as db:
+            yield db
+    else:
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            if db.in_transaction():
+                await asyncio.to_thread(db.close)
+            else:
+                db.close()
+
+async def close_async_engine():
+    if async_engine is not None:
+        await async_engine.dispose()
+
+def pool_status() -> dict:
+    status = {"sync": TimedQueuePool.stats.snapshot(engine.pool)}
+    if async_engine is not None:
+        status["async"] = TimedAsyncQueuePool.stats.snapshot(async_engine.pool)
+    return status
@@ -0,0 +1,186 @@
+# app/jobs.py
+import asyncio
+import logging
+import os
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Number of uploads processed at once per worker process
+UPLOAD_CONCURRENCY = int(os.getenv("UPLOAD_CONCURRENCY", "4"))
+# How long finished jobs stay queryable through GET /jobs/{id}
+JOB_RETENTION_SECONDS = int(os.getenv("JOB_RETENTION_SECONDS", "3600"))
+# How long shutdown waits for queued and running jobs before failing the rest
+JOB_DRAIN_TIMEOUT = float(os.getenv("JOB_DRAIN_TIMEOUT", "30"))
+
+
+class JobError(Exception):
+    """A job failure that should be reported to the client with a status code."""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+@dataclass
+class Stage:
+    name: str
+    status: str = "pending"
+    cached: bool = False
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    @property
+    def duration_ms(self) -> Optional[float]:
+        if self.started_at is None:
+            return None
+        end = self.finished_at or time.monotonic()
+        return round((end - self.started_at) * 1000, 1)
+
+
+@dataclass
+class Job:
+    id: str
+    user_id: int
+    stages: list[Stage]
+    status: str = "queued"
+    error: Optional[str] = None
+    status_code: Optional[int] = None
+    note_id: Optional[int] = None
+    created_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+
+    @property
+    def progress(self) -> float:
+        done = sum(1 for s in self.stages if s.status in ("done", "skipped"))
+        return round(done / len(self.stages), 2) if self.stages else 1.0
+
+    @contextmanager
+    def stage(self, name: str):
+        """Mark a pipeline stage as running for the duration of the block."""
+        current = next(s for s in self.stages if s.name == name)
+        current.status = "running"
+        current.started_at = time.monotonic()
+        try:
+            yield current
+        except BaseException:
+            current.status = "failed"
+            raise
+        else:
+            current.status = "done"
+        finally:
+            current.finished_at = time.monotonic()
+
+
+JobFn = Callable[[Job], Awaitable[None]]
+# Releases what a job holds (upload buffer, limiter permit) when it is rejected or never runs
+Discard = Callable[[], Awaitable[None]]
+
+
+class JobManager:
+    """In-process job registry backed by a bounded pool of asyncio workers."""
+
+    def __init__(self, concurrency: int = UPLOAD_CONCURRENCY, retention: int = JOB_RETENTION_SECONDS):
+        self.concurrency = max(1, concurrency)
+        self.retention = retention
+        self._jobs: dict[str, Job] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: list[asyncio.Task] = []
+        self._accepting = False
+
+    async def start(self):
+        if self._workers:
+            return
+        self._queue = asyncio.Queue()
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+        self._accepting = True
+
+    async def stop(self, timeout: float = JOB_DRAIN_TIMEOUT):
+        """Stop accepting jobs and let queued and running ones finish for up to timeout seconds.
+
+        Jobs still running after that are cancelled and jobs never started are discarded;
+        both are marked failed with a 503 so clients polling them see a final state.
+        """
+        self._accepting = False
+        if self._queue is None:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Jobs did not finish within %gs of shutdown; failing the rest", timeout)
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        while not self._queue.empty():
+            job, _, discard = self._queue.get_nowait()
+            await self._abandon(job, discard)
+            self._queue.task_done()
+
+    def submit(self, user_id: int, stages: tuple[str, ...], fn: JobFn, discard: Optional[Discard] = None) -> Job:
+        """Queue fn to run as a job. Raises JobError(503) once the manager is stopping;
+        the caller still owns anything fn would have released."""
+        if not self._accepting:
+            raise JobError(503, "Server is shutting down")
+        self._prune()
+        job = Job(id=uuid.uuid4().hex, user_id=user_id, stages=[Stage(name) for name in stages])
+        self._jobs[job.id] = job
+        self._queue.put_nowait((job, fn, discard))
+        return job
+
+    def get(self, job_id: str, user_id: int) -> Optional[Job]:
+        job = self._jobs.get(job_id)
+        if job is None or job.user_id != user_id:
+            return None
+        return job
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue else 0
+
+    async def _abandon(self, job: Job, discard: Optional[Discard]):
+        job.status = "failed"
+        job.error = "Server shut down before the job finished"
+        job.status_code = 503
+        job.finished_at = time.time()
+        if discard is not None:
+            try:
+                await discard()
+            except Exception:
+                logger.exception("Failed to release resources of job %s", job.id)
+
+    async def _worker(self):
+        while True:
+            job, fn, discard = await self._queue.get()
+            job.status = "running"
+            try:
+                await fn(job)
+                job.status = "completed"
+            except asyncio.CancelledError:
+                await self._abandon(job, discard)
+                raise
+            except JobError as e:
+                job.status = "failed"
+                job.error = e.detail
+                job.status_code = e.status_code
+            except Exception as e:
+                job.status = "failed"
+                job.error = str(e)
+                job.status_code = 500
+            finally:
+                job.finished_at = job.finished_at or time.time()
+                self._queue.task_done()
+
+    def _prune(self):
+        cutoff = time.time() - self.retention
+        expired = [job_id for job_id, job in self._jobs.items() if job.finished_at and job.finished_at < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+
+job_manager = JobManager()
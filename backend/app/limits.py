@@ -0,0 +1,285 @@
+# app/limits.py
+import math
+import os
+import threading
+import time
+from dataclasses import dataclass
+
+# --- Admission control for extraction and summarization (uploads, re-summarizing a note) ---
+# Each unit of work takes a token from a per-user and a global bucket, and holds a concurrency slot in both
+# until it finishes; a request that cannot get either is rejected with 429 and Retry-After instead of queueing.
+# memory: per-process state; redis: limits shared by every worker
+LIMIT_BACKEND = os.getenv("LIMIT_BACKEND", "memory")
+LIMIT_REDIS_URL = os.getenv("LIMIT_REDIS_URL", os.getenv("REDIS_URL", "redis://localhost:6379/0"))
+# Tokens added per second (0 disables the bucket) and bucket capacity
+LIMIT_USER_RATE = float(os.getenv("LIMIT_USER_RATE", "0.5"))
+LIMIT_USER_BURST = float(os.getenv("LIMIT_USER_BURST", "10"))
+LIMIT_GLOBAL_RATE = float(os.getenv("LIMIT_GLOBAL_RATE", "0"))
+LIMIT_GLOBAL_BURST = float(os.getenv("LIMIT_GLOBAL_BURST", "100"))
+# Units queued or running at once (0 for no limit)
+LIMIT_USER_CONCURRENCY = int(os.getenv("LIMIT_USER_CONCURRENCY", "4"))
+LIMIT_GLOBAL_CONCURRENCY = int(os.getenv("LIMIT_GLOBAL_CONCURRENCY", "32"))
+# Redis only: a slot held by a worker that died is given back after this many seconds
+LIMIT_SLOT_TTL_SECONDS = int(os.getenv("LIMIT_SLOT_TTL_SECONDS", "900"))
+
+
+@dataclass(frozen=True)
+class Scope:
+    key: str
+    rate: float
+    burst: float
+    concurrency: int
+
+
+class LimitExceeded(Exception):
+    def __init__(self, scope: str, reason: str, retry_after: float):
+        super().__init__(f"Too many {'requests' if reason == 'rate' else 'uploads in progress'}; try again later")
+        self.scope = scope
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class MemoryBackend:
+    # Seconds between sweeps for buckets that have refilled
+    PRUNE_INTERVAL = 60.0
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # scope key -> (tokens, updated, time the bucket is full again)
+        self._buckets: dict[str, tuple[float, float, float]] = {}
+        self._in_flight: dict[str, int] = {}
+        self._pruned_at = time.monotonic()
+
+    def _tokens(self, scope: Scope, now: float) -> float:
+        tokens, updated, _ = self._buckets.get(scope.key, (scope.burst, now, now))
+        return min(scope.burst, tokens + (now - updated) * scope.rate)
+
+    def _prune(self, now: float):
+        """Forget buckets of idle users once they have refilled; a missing bucket counts as full."""
+        if now - self._pruned_at < self.PRUNE_INTERVAL:
+            return
+        self._pruned_at = now
+        for key in [key for key, (_, _, full_at) in self._buckets.items() if full_at <= now]:
+            del self._buckets[key]
+
+    async def acquire(self, scopes: list[Scope], cost: float, slots: int) -> tuple[Scope, str, float] | None:
+        """Take cost tokens and slots from every scope, or nothing; returns (scope, reason, wait) on rejection."""
+        with self._lock:
+            now = time.monotonic()
+            self._prune(now)
+            for scope in scopes:
+                if scope.concurrency and self._in_flight.get(scope.key, 0) + slots > scope.concurrency:
+                    return scope, "concurrency", 0.0
+                if scope.rate and self._tokens(scope, now) < cost:
+                    return scope, "rate", (cost - self._tokens(scope, now)) / scope.rate
+            for scope in scopes:
+                if scope.rate:
+                    tokens = self._tokens(scope, now) - cost
+                    self._buckets[scope.key] = (tokens, now, now + (scope.burst - tokens) / scope.rate)
+                self._in_flight[scope.key] = self._in_flight.get(scope.key, 0) + slots
+            return None
+
+    async def release(self, scopes: list[Scope], slots: int):
+        with self._lock:
+            for scope in scopes:
+                remaining = self._in_flight.get(scope.key, 0) - slots
+                if remaining > 0:
+                    self._in_flight[scope.key] = remaining
+                else:
+                    self._in_flight.pop(scope.key, None)
+
+    def in_flight(self, key: str) -> int | None:
+        return self._in_flight.get(key, 0)
+
+
+# KEYS: bucket and in-flight key per scope; ARGV: now, cost, slots, slot ttl, then rate, burst, concurrency per scope
+ACQUIRE_SCRIPT = """
+local now, cost, slots, ttl = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3]), tonumber(ARGV[4])
+local tokens = {}
+for i = 1, #KEYS / 2 do
+  local rate, burst, limit = tonumber(ARGV[2 + i * 3]), tonumber(ARGV[3 + i * 3]), tonumber(ARGV[4 + i * 3])
+  local in_flight = tonumber(redis.call('GET', KEYS[i * 2]) or '0')
+  if limit > 0 and in_flight + slots > limit then
+    return {i, 'concurrency', '0'}
+  end
+  if rate > 0 then
+    local bucket = redis.call('HMGET', KEYS[i * 2 - 1], 'tokens', 'updated')
+    local t = tonumber(bucket[1] or burst)
+    local updated = tonumber(bucket[2] or now)
+    t = math.min(burst, t + math.max(0, now - updated) * rate)
+    if t < cost then
+      return {i, 'rate', tostring((cost - t) / rate)}
+    end
+    tokens[i] = t
+  end
+end
+for i = 1, #KEYS / 2 do
+  local rate, burst = tonumber(ARGV[2 + i * 3]), tonumber(ARGV[3 + i * 3])
+  if tokens[i] then
+    redis.call('HSET', KEYS[i * 2 - 1], 'tokens', tostring(tokens[i] - cost), 'updated', tostring(now))
+    redis.call('EXPIRE', KEYS[i * 2 - 1], math.ceil(burst / rate) + 1)
+  end
+  redis.call('INCRBY', KEYS[i * 2], slots)
+  redis.call('EXPIRE', KEYS[i * 2], ttl)
+end
+return nil
+"""
+
+# KEYS: in-flight key per scope; ARGV: slots. A counter whose key expired mid-request would go negative
+# and over-admit, so counters that reach zero or below are deleted instead.
+RELEASE_SCRIPT = """
+for i = 1, #KEYS do
+  if redis.call('DECRBY', KEYS[i], ARGV[1]) <= 0 then
+    redis.call('DEL', KEYS[i])
+  end
+end
+return nil
+"""
+
+
+class RedisBackend:
+    """Buckets and in-flight counters live in Redis under limit:<scope>; each acquire is one atomic script."""
+
+    def __init__(self, url: str):
+        try:
+            import redis.asyncio
+        except ImportError:
+            raise RuntimeError("LIMIT_BACKEND=redis requires the redis package")
+        self._redis = redis.asyncio.Redis.from_url(url)
+        self._acquire = self._redis.register_script(ACQUIRE_SCRIPT)
+        self._release = self._redis.register_script(RELEASE_SCRIPT)
+
+    async def acquire(self, scopes: list[Scope], cost: float, slots: int) -> tuple[Scope, str, float] | None:
+        keys, args = [], [time.time(), cost, slots, LIMIT_SLOT_TTL_SECONDS]
+        for scope in scopes:
+            keys += [f"limit:{scope.key}:bucket", f"limit:{scope.key}:in_flight"]
+            args += [scope.rate, scope.burst, scope.concurrency]
+        rejected = await self._acquire(keys=keys, args=args)
+        if rejected is None:
+            return None
+        index, reason, wait = rejected
+        reason = reason.decode() if isinstance(reason, bytes) else reason
+        return scopes[index - 1], reason, float(wait)
+
+    async def release(self, scopes: list[Scope], slots: int):
+        await self._release(keys=[f"limit:{scope.key}:in_flight" for scope in scopes], args=[slots])
+
+    def in_flight(self, key: str) -> int | None:
+        return None
+
+    async def close(self):
+        await self._redis.aclose()
+
+
+class Permit:
+    """Slots held for one admitted request; release() (or leaving an async with block) gives them back."""
+
+    def __init__(self, limiter: "Limiter", scopes: list[Scope], slots: int):
+        self._limiter = limiter
+        self._scopes = scopes
+        self._slots = slots
+        self._started = time.monotonic()
+        self._released = False
+
+    async def release(self):
+        if self._released:
+            return
+        self._released = True
+        await self._limiter._release(self._scopes, self._slots, time.monotonic() - self._started)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.release()
+
+
+class Limiter:
+    def __init__(self, backend):
+        self.backend = backend
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.admitted = 0
+        self.rejected = {"user": {"rate": 0, "concurrency": 0}, "global": {"rate": 0, "concurrency": 0}}
+        self.completed = 0
+        self.total_seconds = 0.0
+
+    def _scopes(self, user_id: int) -> list[Scope]:
+        return [
+            Scope(f"user:{user_id}", LIMIT_USER_RATE, LIMIT_USER_BURST, LIMIT_USER_CONCURRENCY),
+            Scope("global", LIMIT_GLOBAL_RATE, LIMIT_GLOBAL_BURST, LIMIT_GLOBAL_CONCURRENCY),
+        ]
+
+    async def admit(self, user_id: int, cost: int = 1, slots: int = 1) -> Permit:
+        """Admit cost units of work running slots at a time, or raise LimitExceeded."""
+        scopes = self._scopes(user_id)
+        # A request larger than a limit could never be admitted; let it take the whole allowance instead
+        cost = min([cost, *(s.burst for s in scopes if s.rate)])
+        slots = min([slots, *(s.concurrency for s in scopes if s.concurrency)])
+        rejected = await self.backend.acquire(scopes, cost, slots)
+        if rejected is not None:
+            scope, reason, wait = rejected
+            name = "global" if scope.key == "global" else "user"
+            with self._lock:
+                self.rejected[name][reason] += 1
+                if reason == "concurrency":
+                    # Roughly when a slot frees up
+                    wait = self.total_seconds / self.completed if self.completed else 1.0
+            raise LimitExceeded(name, reason, wait)
+        with self._lock:
+            self.admitted += 1
+            self.in_flight += slots
+        return Permit(self, scopes, slots)
+
+    async def _release(self, scopes: list[Scope], slots: int, held: float):
+        with self._lock:
+            self.in_flight -= slots
+            self.completed += 1
+            self.total_seconds += held
+        await self.backend.release(scopes, slots)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "backend": LIMIT_BACKEND,
+                "admitted": self.admitted,
+                "rejected": {scope: dict(reasons) for scope, reasons in self.rejected.items()},
+                # Units this process admitted that are still queued or running
+                "in_flight": self.in_flight,
+                "global_in_flight": self.backend.in_flight("global"),
+                "avg_hold_ms": round(1000 * self.total_seconds / self.completed, 1) if self.completed else 0.0,
+                "limits": {
+                    "user": {"rate": LIMIT_USER_RATE, "burst": LIMIT_USER_BURST, "concurrency": LIMIT_USER_CONCURRENCY},
+                    "global": {
+                        "rate": LIMIT_GLOBAL_RATE, "burst": LIMIT_GLOBAL_BURST, "concurrency": LIMIT_GLOBAL_CONCURRENCY
+                    },
+                },
+            }
+
+    async def close(self):
+        if hasattr(self.backend, "close"):
+            await self.backend.close()
+
+
+async def hold(permit: Permit, events):
+    """Relay a streaming response, releasing the permit when it ends or the client goes away."""
+    try:
+        async for event in events:
+            yield event
+    finally:
+        await permit.release()
+
+
+def retry_after(seconds: float) -> str:
+    return str(max(1, math.ceil(seconds)))
+
+
+def _backend():
+    if LIMIT_BACKEND == "memory":
+        return MemoryBackend()
+    if LIMIT_BACKEND == "redis":
+        return RedisBackend(LIMIT_REDIS_URL)
+    raise RuntimeError(f"Unknown LIMIT_BACKEND {LIMIT_BACKEND!r}")
+
+
+limiter = Limiter(_backend())
@@ -1,17 +1,34 @@
-from fastapi import FastAPI, UploadFile, File, Form, Depends, Query, HTTPException
+from fastapi import FastAPI, UploadFile, File, Form, Depends, Header, Query, HTTPException, Response
 from fastapi.security import OAuth2PasswordRequestForm
 from fastapi.middleware.cors import CORSMiddleware
-from app.database import init_db, get_db
-from app.summarizer import summarize_text
-from app.parse import save_upload, detect_mime, extract_with_tika
-from app import crud, schemas, auth
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from starlette.background import BackgroundTask
+from app.database import init_db, get_db, get_read_db, close_async_engine, pool_status
+from app.parse import UploadTooLarge, ingest_upload, get_extractor, close_extractor
+from app.jobs import JobError, job_manager
+from app.cache import extraction_stats, summary_stats, summarize_cached
+from app.summarizer import SummarizerUnavailable, close_clients
+from app.related import related_index
+from app.user_cache import user_cache
+from app.passwords import HasherBusy, hash_password_async, password_hasher, verify_and_update_async
+from app.limits import LimitExceeded, Permit, hold, limiter, retry_after
+from app.metrics import MetricsMiddleware, register_stats, render as render_metrics
+from app.profiling import PROFILING_ENABLED, ProfilingMiddleware, authorized, profile_store
+from app.pipeline import (
+    BATCH_CONCURRENCY, BATCH_MAX_FILES, UPLOAD_STAGES, note_json, run_upload, run_batch_upload, stream_upload,
+    stream_resummarize,
+)
+from app import async_crud, crud, models, schemas, auth, ocr, search, usage, usage_log
+from app.usage import UsageEvent
 from sqlalchemy.orm import Session
-from typing import Optional
+from typing import Literal, Optional
 from sqlalchemy.exc import IntegrityError
-import io
-import os
+import asyncio
+from datetime import date, datetime
 
 app = FastAPI()
+# Keep proxies (nginx) from buffering server-sent events
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
 app.add_middleware(
     CORSMiddleware,
     allow_origins=[
@@ -21,58 +38,348 @@ app.add_middleware(
     ],
     allow_credentials=True,
     allow_methods=["*"],
-    allow_headers=["*"]
+    allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"]
 )
+app.add_middleware(MetricsMiddleware)
+if PROFILING_ENABLED:
+    # Not installed at all unless PROFILE_TOKEN or PROFILE_SAMPLE_RATE is set
+    app.add_middleware(ProfilingMiddleware)
+
+# Exported as gauges on /metrics, next to the latency histograms
+register_stats("extraction_cache", extraction_stats.snapshot)
+register_stats("summary_cache", summary_stats.snapshot)
+register_stats("related_index", related_index.stats)
+register_stats("usage_log", usage_log.usage_buffer.stats)
+register_stats("user_cache", user_cache.stats)
+register_stats("db_pool", pool_status)
+register_stats("limits", limiter.stats)
+register_stats("password_hasher", password_hasher.stats)
+register_stats("jobs", lambda: {"queue_depth": job_manager.queue_depth})
 
 @app.on_event("startup")
-def startup_event():
+async def startup_event():
     init_db()
+    get_extractor()
+    await job_manager.start()
+    usage_log.start()
+    await asyncio.to_thread(ocr.warm_up)
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    # Drains queued and running uploads first, so usage from the last of them is flushed too
+    await job_manager.stop()
+    await asyncio.to_thread(usage_log.stop)
+    ocr.shutdown()
+    close_extractor()
+    await close_clients()
+    await close_async_engine()
+    await user_cache.close()
+    await limiter.close()
+    password_hasher.shutdown()
+
+def summarizer_unavailable(e: SummarizerUnavailable) -> HTTPException:
+    headers = {"Retry-After": str(max(1, round(e.retry_after)))} if e.retry_after else None
+    return HTTPException(status_code=e.status_code, detail=e.detail, headers=headers)
+
+async def admit_or_429(user_id: int, cost: int = 1, slots: int = 1) -> Permit:
+    """Admit extraction/summarization work for a user, rejecting it with a 429 when their or the global limit is hit."""
+    try:
+        return await limiter.admit(user_id, cost, slots)
+    except LimitExceeded as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": retry_after(e.retry_after)})
+
+async def ingest_admitted(file: UploadFile, permit: Permit):
+    """ingest_upload for an admitted request; the permit is given back if ingestion fails for any reason."""
+    try:
+        try:
+            return await ingest_upload(file)
+        except UploadTooLarge as e:
+            raise HTTPException(status_code=413, detail=str(e))
+    except BaseException:
+        await permit.release()
+        raise
+
+def permit_stream(permit: Permit, events) -> StreamingResponse:
+    """SSE response holding the permit. The background task releases it too, since hold() only
+    runs its cleanup once the body has started and the client may leave before that."""
+    return StreamingResponse(
+        hold(permit, events), media_type="text/event-stream", headers=SSE_HEADERS,
+        background=BackgroundTask(permit.release),
+    )
+
+async def job_out(job, db) -> dict:
+    note = await async_crud.get_note_by_id(db, job.note_id, job.user_id) if job.status == "completed" else None
+    return {
+        "id": job.id,
+        "status": job.status,
+        "progress": job.progress,
+        "stages": [
+            {"name": s.name, "status": s.status, "cached": s.cached, "duration_ms": s.duration_ms}
+            for s in job.stages
+        ],
+        "error": job.error,
+        "status_code": job.status_code,
+        "note": note,
+    }
 
-@app.post("/upload/", response_model=schemas.Note)
+@app.post("/upload/", response_model=schemas.Job, status_code=202)
 async def upload_note(
     file: UploadFile = File(...),
     title: str = Form(...),
     include_action_items: bool = Form(True),
-    created_at: Optional[str] = Form(None),
+    created_at: Optional[datetime] = Form(None),
     tags: list[str] = Form(default=[]),
-    db: Session = Depends(get_db),
-    current_user: schemas.UserOut = Depends(auth.get_current_user)
+    db=Depends(get_read_db),
+    current_user: schemas.UserOut = Depends(auth.get_current_user),
+    api_key: Optional[str] = Depends(auth.get_openai_api_key)
 ):
-    path = save_upload(file)
-    mime = detect_mime(path)
-    try:
-        content = extract_with_tika(path)
-    except Exception as e:
-        os.remove(path)
-        raise HTTPException(status_code=400, detail=f"Failed to parse {mime}: {e}")
-    if not content.strip():
-        os.remove(path)
-        raise HTTPException(status_code=415, detail="Failed to parse text from file")
+    permit = await admit_or_429(current_user.id)
+    upload = await ingest_admitted(file, permit)
+
+    async def run(job):
+        # The slot stays taken while the job waits in the queue, so a user cannot pile up uploads
+        async with permit:
+            await run_upload(job, upload, title, include_action_items, created_at, tags, api_key)
+
+    async def discard():
+        upload.close()
+        await permit.release()
+
     try:
-        summary, action_items, input_tokens, output_tokens = summarize_text(content, current_user.openai_api_key, include_action_items)
-    except ValueError as e:
-        os.remove(path)
-        raise HTTPException(status_code=400, detail=str(e))
-    db_note = crud.create_note(db, title, content, summary, action_items, created_at, tags, current_user.id)
-    if not db_note:
-        os.remove(path)
-        raise HTTPException(status_code=400, detail="Failed to create note")
-    api_usage = crud.create_api_usage(
-        db, current_user.id, db_note.id, created_at, input_tokens, output_tokens
+        job = job_manager.submit(current_user.id, UPLOAD_STAGES, run, discard)
+    except JobError as e:
+        await discard()
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    return await job_out(job, db)
+
+@app.post("/upload/batch", response_model=schemas.BatchUpload)
+async def upload_notes_batch(
+    files: list[UploadFile] = File(...),
+    titles: list[str] = Form(default=[]),
+    tags: list[str] = Form(default=[]),
+    include_action_items: bool = Form(True),
+    created_at: Optional[datetime] = Form(None),
+    current_user: schemas.UserOut = Depends(auth.get_current_user),
+    api_key: Optional[str] = Depends(auth.get_openai_api_key)
+):
+    """Upload many files at once. titles and tags are matched to files by position;
+    each tags value is a comma-separated list for that file."""
+    if len(files) > BATCH_MAX_FILES:
+        raise HTTPException(status_code=413, detail=f"A batch can contain at most {BATCH_MAX_FILES} files")
+    if len(titles) > len(files) or len(tags) > len(files):
+        raise HTTPException(status_code=400, detail="More titles or tags than files")
+    # Every file costs a token; the batch holds as many slots as files it extracts and summarizes at once
+    async with await admit_or_429(current_user.id, len(files), min(len(files), BATCH_CONCURRENCY)):
+        entries = []
+        for i, file in enumerate(files):
+            entry = {
+                "filename": file.filename or "",
+                "title": titles[i] if i < len(titles) and titles[i] else (file.filename or f"Upload {i + 1}"),
+                "tags": [t.strip() for t in tags[i].split(",") if t.strip()] if i < len(tags) else [],
+            }
+            try:
+                entry["upload"] = await ingest_upload(file)
+            except UploadTooLarge as e:
+                entry["error"] = JobError(413, str(e))
+            entries.append(entry)
+        results = await run_batch_upload(
+            entries, current_user.id, include_action_items, created_at, api_key
+        )
+        created = sum(1 for r in results if r["status"] == "created")
+        return {"created": created, "failed": len(results) - created, "results": results}
+
+@app.post("/upload/stream")
+async def upload_note_stream(
+    file: UploadFile = File(...),
+    title: str = Form(...),
+    include_action_items: bool = Form(True),
+    created_at: Optional[datetime] = Form(None),
+    tags: list[str] = Form(default=[]),
+    current_user: schemas.UserOut = Depends(auth.get_current_user),
+    api_key: Optional[str] = Depends(auth.get_openai_api_key)
+):
+    permit = await admit_or_429(current_user.id)
+    upload = await ingest_admitted(file, permit)
+    events = stream_upload(upload, current_user.id, title, include_action_items, created_at, tags, api_key)
+    return permit_stream(permit, events)
+
+@app.get("/jobs/{job_id}", response_model=schemas.Job)
+async def get_job(
+    job_id: str,
+    db=Depends(get_read_db),
+    current_user: schemas.UserOut = Depends(auth.get_current_user)
+):
+    job = job_manager.get(job_id, current_user.id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return await job_out(job, db)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Prometheus text exposition of this process's latency histograms, counters and stats."""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+def require_profile_token(x_profile_token: Optional[str] = Header(None)):
+    if not authorized(x_profile_token):
+        raise HTTPException(status_code=404, detail="Not Found")
+
+@app.get("/debug/profiles", dependencies=[Depends(require_profile_token)])
+def list_profiles():
+    """Most recent request profiles, newest first."""
+    return profile_store.list()
+
+@app.get("/debug/profiles/{profile_id}.pstats", dependencies=[Depends(require_profile_token)])
+def download_profile_pstats(profile_id: int):
+    """The profile as a pstats file: python -m pstats <file>, snakeviz, etc."""
+    profile = profile_store.get(profile_id)
+    if not profile:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return Response(
+        profile.pstats(), media_type="application/octet-stream",
+        headers={"Content-Disposition": f'attachment; filename="profile-{profile_id}.pstats"'},
     )
-    if not api_usage:
-        os.remove(path)
-        raise HTTPException(status_code=400, detail="Failed to log API usage")
-    os.remove(path)
-    return db_note
-
-@app.get("/notes/", response_model=list[schemas.Note])
-def get_notes(
+
+@app.get("/debug/profiles/{profile_id}.collapsed", dependencies=[Depends(require_profile_token)])
+def download_profile_collapsed(profile_id: int):
+    """Sampled stacks in the folded format of flamegraph.pl and speedscope."""
+    profile = profile_store.get(profile_id)
+    collapsed = profile.collapsed() if profile else None
+    if collapsed is None:
+        raise HTTPException(status_code=404, detail="Profile not found or not sampled")
+    return PlainTextResponse(collapsed)
+
+@app.get("/health/extractor")
+def extractor_health():
+    return get_extractor().health()
+
+@app.get("/health/ocr")
+def ocr_health():
+    """OCR process pool state and why it last failed to start, if it did."""
+    return ocr.health()
+
+@app.get("/health/auth")
+def auth_health():
+    """Load on the password hashing executor."""
+    return password_hasher.stats()
+
+@app.get("/health/limits")
+def limits_health():
+    """Admission limiter counters and the number of uploads waiting for a job worker."""
+    return {**limiter.stats(), "queue_depth": job_manager.queue_depth}
+
+@app.get("/health/db")
+def db_health():
+    """Connection pool usage and how long requests have waited to check out a connection."""
+    return pool_status()
+
+@app.get("/cache/stats")
+def get_cache_stats(current_user: schemas.UserOut = Depends(auth.get_current_user)):
+    return {
+        "extraction": extraction_stats.snapshot(),
+        "summary": summary_stats.snapshot(),
+        "related_index": related_index.stats(),
+        "usage_log": usage_log.usage_buffer.stats(),
+        "user_cache": user_cache.stats(),
+    }
+
+@app.get("/notes/", response_model=list[schemas.NoteListItem], response_model_exclude_unset=True)
+async def get_notes(
+    response: Response,
     tags: Optional[list[str]] = Query(None),
+    limit: Optional[int] = Query(None, ge=1, le=crud.NOTES_PAGE_MAX_LIMIT),
+    cursor: Optional[str] = None,
+    order_by: Literal["created_at", "updated_at"] = "created_at",
+    fields: Optional[str] = None,
+    match: Literal["any", "all"] = "any",
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    sort: Optional[Literal["desc", "asc"]] = None,
+    db=Depends(get_read_db),
+    current_user: schemas.UserOut = Depends(auth.get_current_user)
+):
+    """List notes. Pass limit (and the X-Next-Cursor value as cursor) to page through them
+    newest first; pass fields=id,name,... to skip loading the large text columns.
+    since/until bound order_by (since inclusive, until exclusive; naive times are UTC) and sort orders by it."""
+    selected = crud.NOTE_LIST_FIELDS
+    if fields:
+        selected = tuple(dict.fromkeys(["id", *(f.strip() for f in fields.split(",") if f.strip())]))
+        unknown = [f for f in selected if f not in crud.NOTE_LIST_FIELDS]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    load = selected if fields else None
+    since = models.as_utc(since) if since else None
+    until = models.as_utc(until) if until else None
+    if limit is None and cursor is None:
+        notes = await async_crud.get_notes(db, tags, current_user.id, load, match, since, until, order_by, sort)
+    else:
+        try:
+            notes, next_cursor = await async_crud.get_notes_page(
+                db, tags, current_user.id, limit or crud.NOTES_PAGE_MAX_LIMIT, cursor, order_by, load, match,
+                since, until, sort or "desc"
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
+    return [{name: getattr(note, name) for name in selected} for note in notes]
+
+def related_out(db: Session, hits: list[tuple[int, float]], user_id: int) -> list[dict]:
+    if not hits:
+        return []
+    notes = {
+        note.id: note
+        for note in crud.get_notes_by_ids(db, [note_id for note_id, _ in hits], user_id)
+    }
+    return [
+        {
+            "id": note_id,
+            "name": notes[note_id].name,
+            "summary": notes[note_id].summary,
+            "created_at": notes[note_id].created_at,
+            "updated_at": notes[note_id].updated_at,
+            "score": score,
+        }
+        for note_id, score in hits
+        if note_id in notes
+    ]
+
+@app.get("/notes/related/", response_model=list[schemas.RelatedNote])
+def query_related_notes(
+    q: str,
+    limit: int = Query(10, ge=1, le=100),
+    db: Session = Depends(get_db),
+    current_user: schemas.UserOut = Depends(auth.get_current_user)
+):
+    if not q.strip():
+        raise HTTPException(status_code=400, detail="Query cannot be empty")
+    return related_out(db, related_index.query(db, current_user.id, q, limit), current_user.id)
+
+@app.get("/notes/tags/lookup", response_model=dict[int, list[schemas.Tag]])
+async def get_tags_for_notes(
+    ids: list[str] = Query(...),
+    db=Depends(get_read_db),
+    current_user: schemas.UserOut = Depends(auth.get_current_user)
+):
+    """Tags for many notes at once: ?ids=1,2,3 or ?ids=1&ids=2."""
+    try:
+        note_ids = [int(i) for value in ids for i in value.split(",") if i.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids must be integers")
+    if len(note_ids) > crud.NOTES_PAGE_MAX_LIMIT:
+        raise HTTPException(status_code=400, detail=f"At most {crud.NOTES_PAGE_MAX_LIMIT} ids per request")
+    return await async_crud.get_tags_for_notes(db, note_ids, current_user.id)
+
+@app.get("/notes/{note_id}/related", response_model=list[schemas.RelatedNote])
+def get_related_notes(
+    note_id: int,
+    limit: int = Query(10, ge=1, le=100),
     db: Session = Depends(get_db),
     current_user: schemas.UserOut = Depends(auth.get_current_user)
 ):
-    return crud.get_notes(db, tags, current_user.id)
+    if not crud.get_note_by_id(db, note_id, current_user.id):
+        raise HTTPException(status_code=404, detail="Note not found")
+    return related_out(db, related_index.related(db, current_user.id, note_id, limit), current_user.id)
 
 @app.delete("/notes/{note_id}")
 def delete_note(
@@ -84,47 +391,79 @@ def delete_note(
     return {"message": "Note deleted successfully"}
 
 @app.get("/notes/{note_id}", response_model=schemas.Note)
-def get_note(
+async def get_note(
     note_id: int,
-    db: Session = Depends(get_db),
+    db=Depends(get_read_db),
     current_user: schemas.UserOut = Depends(auth.get_current_user)
 ):
-    note = crud.get_note_by_id(db, note_id, current_user.id)
+    note = await async_crud.get_note_by_id(db, note_id, current_user.id)
     if not note:
         return {"error": "Note not found"}
     return note
 
-@app.get("/notes/search/", response_model=list[schemas.Note])
+@app.get("/notes/search/", response_model=list[schemas.NoteSearchResult])
 def search_notes(
     query: str,
+    limit: int = Query(search.SEARCH_MAX_RESULTS, ge=1, le=500),
     db: Session = Depends(get_db),
     current_user: schemas.UserOut = Depends(auth.get_current_user)
 ):
-    if not query:
+    if not query.strip():
         raise HTTPException(status_code=400, detail="Search query cannot be empty")
-    notes = crud.search_notes(db, query, current_user.id)
-    return notes
+    return search.search_notes(db, query, current_user.id, limit)
 
 @app.put("/notes/{note_id}", response_model=schemas.Note)
-def update_note(
+async def update_note(
     note_id: int,
     request: schemas.NoteUpdate,
     db: Session = Depends(get_db),
-    current_user: schemas.UserOut = Depends(auth.get_current_user)
+    current_user: schemas.UserOut = Depends(auth.get_current_user),
+    api_key: Optional[str] = Depends(auth.get_openai_api_key)
 ):
+    if request.content is None:
+        raise HTTPException(status_code=422, detail="content is required to re-summarize a note")
     try:
-        summary, action_items, input_tokens, output_tokens = summarize_text(request.content, current_user.openai_api_key, request.include_action_items)
+        async with await admit_or_429(current_user.id):
+            summary, action_items, input_tokens, output_tokens, cache_hit = await summarize_cached(
+                db, current_user.id, request.content, api_key, request.include_action_items
+            )
+    except SummarizerUnavailable as e:
+        raise summarizer_unavailable(e)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
-    updated_note = crud.update_note(db, note_id, None, request.content, summary, request.updated_at, action_items, current_user.id)
-    if not updated_note:
-        return {"error": "Note not found"}
-    api_usage = crud.create_api_usage(
-        db, current_user.id, updated_note.id, request.updated_at, input_tokens, output_tokens
+    usage = UsageEvent(current_user.id, note_id, request.updated_at, input_tokens, output_tokens, cache_hit)
+
+    def save():
+        # Serialized here so neither the tags nor attributes expired by log_usage's commit load on the event loop
+        updated_note = crud.update_note(
+            db, note_id, None, request.content, summary, request.updated_at, action_items,
+            current_user.id, usage_log.in_transaction(usage)
+        )
+        if not updated_note:
+            return {"error": "Note not found"}
+        usage_log.log_usage(db, usage)
+        return note_json(updated_note)
+
+    return await asyncio.to_thread(save)
+
+@app.post("/notes/{note_id}/summarize/stream")
+async def update_note_stream(
+    note_id: int,
+    request: schemas.NoteUpdate,
+    db=Depends(get_read_db),
+    current_user: schemas.UserOut = Depends(auth.get_current_user),
+    api_key: Optional[str] = Depends(auth.get_openai_api_key)
+):
+    if request.content is None:
+        raise HTTPException(status_code=422, detail="content is required to re-summarize a note")
+    if not await async_crud.get_note_by_id(db, note_id, current_user.id):
+        raise HTTPException(status_code=404, detail="Note not found")
+    permit = await admit_or_429(current_user.id)
+    events = stream_resummarize(
+        note_id, current_user.id, request.content, request.include_action_items,
+        request.updated_at, api_key
     )
-    if not api_usage:
-        raise HTTPException(status_code=400, detail="Failed to log API usage")
-    return updated_note
+    return permit_stream(permit, events)
 
 @app.put("/notes/{note_id}/name", response_model=schemas.Note)
 def update_note_name(
@@ -150,28 +489,39 @@ def create_tag(
         raise HTTPException(status_code=400, detail="Tag already exists")
 
 @app.get("/tags/", response_model=list[schemas.Tag])
-def get_all_tags(
-    db: Session = Depends(get_db),
+async def get_all_tags(
+    db=Depends(get_read_db),
     current_user: schemas.UserOut = Depends(auth.get_current_user)
 ):
-    return crud.get_tags(db, current_user.id)
+    return await async_crud.get_tags(db, current_user.id)
+
+@app.get("/tags/facets", response_model=list[schemas.TagFacet])
+async def get_tag_facets(
+    tags: list[str] = Query(default=[]),
+    match: Literal["all", "any"] = "all",
+    db=Depends(get_read_db),
+    current_user: schemas.UserOut = Depends(auth.get_current_user)
+):
+    """Note count per tag, optionally counting only notes that match the selected tags."""
+    return await async_crud.get_tag_facets(db, current_user.id, tags, match)
 
 @app.get("/tags/{note_id}", response_model=list[schemas.Tag])
-def get_tags_for_note(
+async def get_tags_for_note(
     note_id: int,
-    db: Session = Depends(get_db),
+    db=Depends(get_read_db),
     current_user: schemas.UserOut = Depends(auth.get_current_user)
 ):
-    tags = crud.get_tag_for_note(db, note_id, current_user.id)
+    tags = await async_crud.get_tag_for_note(db, note_id, current_user.id)
     return tags
 
 @app.get("/notes/tags/", response_model=list[schemas.Note])
-def get_notes_by_tags(
+async def get_notes_by_tags(
     tags: list[str] = Query(default=[]),
-    db: Session = Depends(get_db),
+    match: Literal["all", "any"] = "all",
+    db=Depends(get_read_db),
     current_user: schemas.UserOut = Depends(auth.get_current_user)
 ):
-    notes = crud.get_notes_by_tags(db, tags, current_user.id)
+    notes = await async_crud.get_notes_by_tags(db, tags, current_user.id, match)
     return notes
 
 @app.delete("/tags/{tag_id}", response_model=schemas.Tag)
@@ -209,20 +559,34 @@ def remove_tag_from_note(
         raise HTTPException(status_code=404, detail="Note or Tag not found")
     return note
 
+async def hash_or_503(fn, *args):
+    """Run a password hash on the bcrypt executor, shedding load with a 503 when its queue is full."""
+    try:
+        return await fn(*args)
+    except HasherBusy as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(max(1, round(e.retry_after)))})
+
 @app.post("/register/")
-def register(user: schemas.UserCreate, db: Session = Depends(get_db)):
-    new_user = crud.register_user(db, user)
+async def register(user: schemas.UserCreate, db: Session = Depends(get_db)):
+    hashed = await hash_or_503(hash_password_async, user.password)
+    new_user = await asyncio.to_thread(crud.register_user, db, user, hashed)
     access_token = auth.create_access_token(data={"sub": str(new_user.id)})
     return {"access_token": access_token, "token_type": "bearer"}
 
 @app.post("/token")
-def login_for_access_token(
+async def login_for_access_token(
     form_data: OAuth2PasswordRequestForm = Depends(),
     db: Session = Depends(get_db)
 ):
-    user = crud.authenticate_user(db, form_data.username, form_data.password)
-    if not user:
+    user = await asyncio.to_thread(crud.get_user_by_login, db, form_data.username)
+    valid, new_hash = False, None
+    if user:
+        valid, new_hash = await hash_or_503(verify_and_update_async, form_data.password, user.hashed_password)
+    if not valid:
         raise HTTPException(status_code=401, detail="Incorrect username or password")
+    if new_hash:
+        # Stored with a different bcrypt cost; upgrade it now that the plain password is known
+        await asyncio.to_thread(crud.update_user_password, db, user.id, new_hash)
 
     access_token = auth.create_access_token(data={"sub": str(user.id)})
     return {"access_token": access_token, "token_type": "bearer"}
@@ -236,16 +600,22 @@ def update_api_key(
     return crud.update_user_api_key(db, current_user.id, data.new_key)
 
 @app.put("/users/me/password")
-def update_password(
+async def update_password(
     data: schemas.UpdatePassword,
     db: Session = Depends(get_db),
     current_user: schemas.UserOut = Depends(auth.get_current_user)
 ):
     if not data.new_password:
         raise HTTPException(status_code=400, detail="New password cannot be empty")
-    if not auth.verify_password(data.old_password, current_user.hashed_password):
+    # The cached current_user carries no password hash
+    user = await asyncio.to_thread(crud.get_user, db, current_user.id)
+    valid = False
+    if user:
+        valid, _ = await hash_or_503(verify_and_update_async, data.old_password, user.hashed_password)
+    if not valid:
         raise HTTPException(status_code=401, detail="Current password is incorrect")
-    return crud.update_user_password(db, current_user.id, data.new_password)
+    hashed = await hash_or_503(hash_password_async, data.new_password)
+    return await asyncio.to_thread(crud.update_user_password, db, current_user.id, hashed)
 
 @app.put("/users/me/username")
 def update_username(
@@ -268,13 +638,37 @@ def update_email(
     return crud.update_user_email(db, current_user.id, data.new_email)
 
 @app.get("/users/me/usage")
-def get_api_usage(
+async def get_api_usage(
+    db=Depends(get_read_db),
+    current_user: schemas.UserOut = Depends(auth.get_current_user)
+):
+    return await async_crud.get_api_usage(db, current_user.id)
+
+@app.get("/users/me/usage/summary", response_model=schemas.UsageSummary)
+def get_api_usage_summary(
+    period: Literal["day", "week", "month"] = "day",
+    start: Optional[date] = None,
+    end: Optional[date] = None,
     db: Session = Depends(get_db),
     current_user: schemas.UserOut = Depends(auth.get_current_user)
 ):
-    usage = crud.get_api_usage(db, current_user.id)
-    return usage
+    return usage.usage_summary(db, current_user.id, period, start, end)
 
-@app.get("/users/me")
-def get_current_user_info(current_user: schemas.UserOut = Depends(auth.get_current_user)):
-    return current_user
\ No newline at end of file
+@app.get("/users/me/usage/notes", response_model=list[schemas.NoteUsage])
+def get_api_usage_by_note(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    note_id: Optional[int] = None,
+    db: Session = Depends(get_db),
+    current_user: schemas.UserOut = Depends(auth.get_current_user)
+):
+    return usage.usage_by_note(db, current_user.id, start, end, note_id)
+
+@app.get("/users/me", response_model=schemas.UserOut)
+def get_current_user_info(
+    current_user: schemas.UserOut = Depends(auth.get_current_user),
+    api_key: Optional[str] = Depends(auth.get_openai_api_key)
+):
+    return {
+        "id": current_user.id, "email": current_user.email, "username": current_user.username, "openai_api_key": api_key
+    }
\ No newline at end of file
@@ -0,0 +1,248 @@
+# app/metrics.py
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from starlette.datastructures import MutableHeaders
+
+# --- Latency histograms and counters, served in Prometheus text format on /metrics ---
+# Values are per process; with several uvicorn workers each one is scraped (or summed) separately.
+# Add a Server-Timing header with the stages each request spent time in
+SERVER_TIMING = os.getenv("SERVER_TIMING", "1") == "1"
+
+PREFIX = "note_summarizer"
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+# Time spent per stage by the current request, for its Server-Timing header
+_timings: ContextVar[dict | None] = ContextVar("timings", default=None)
+
+
+def _labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _le(bound) -> str:
+    return f'le="{bound}"'
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()):
+        self.name = f"{PREFIX}_{name}"
+        self.help = help
+        self.labelnames = labelnames
+        self._values: dict[tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = (), buckets: tuple[float, ...] = BUCKETS):
+        self.name = f"{PREFIX}_{name}"
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = buckets
+        # labels -> (count per bucket, sum, count)
+        self._values: dict[tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, seconds: float, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            series = self._values.setdefault(key, [[0] * len(self.buckets), 0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    series[0][i] += 1
+            series[1] += seconds
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._values.items()):
+                for bound, bucket_count in zip(self.buckets, counts):
+                    lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, _le(bound))} {bucket_count}")
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, _le('+Inf'))} {count}")
+                lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {total}")
+                lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+_registry: list = []
+# name -> callable returning a (possibly nested) dict of numbers, exported as gauges
+_collectors: dict[str, object] = {}
+
+http_seconds = Histogram("http_request_duration_seconds", "Time to serve a request", ("method", "route", "status"))
+stage_seconds = Histogram("stage_duration_seconds", "Time spent in a stage of the upload and summary pipeline", ("stage",))
+extract_seconds = Histogram("extract_duration_seconds", "Text extraction time by MIME type", ("mime", "method"))
+db_query_seconds = Histogram("db_query_duration_seconds", "Database statement execution time", ("operation",))
+db_commit_seconds = Histogram("db_commit_duration_seconds", "Session commit time, including the final flush")
+openai_seconds = Histogram(
+    "openai_request_duration_seconds", "OpenAI latency until the response (or the first stream chunk) arrives", ("mode",)
+)
+openai_tokens = Counter("openai_tokens_total", "Tokens spent on OpenAI summaries", ("type",))
+openai_retries = Counter("openai_retries_total", "OpenAI calls retried after a transient failure", ("reason",))
+
+
+def add_timing(name: str, seconds: float):
+    """Add seconds under name to the current request's Server-Timing header, if there is a request."""
+    timings = _timings.get()
+    if timings is not None:
+        total, count = timings.get(name, (0.0, 0))
+        timings[name] = (total + seconds, count + 1)
+
+
+@contextmanager
+def timed(stage: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        stage_seconds.observe(elapsed, stage=stage)
+        add_timing(stage, elapsed)
+
+
+def register_stats(name: str, collect):
+    _collectors[name] = collect
+
+
+def _flatten(prefix: str, stats: dict) -> list[tuple[str, float]]:
+    values = []
+    for key, value in stats.items():
+        name = f"{prefix}_{key}"
+        if isinstance(value, dict):
+            values += _flatten(name, value)
+        elif isinstance(value, bool):
+            values.append((name, int(value)))
+        elif isinstance(value, (int, float)):
+            values.append((name, value))
+    return values
+
+
+def render() -> str:
+    lines = []
+    for metric in _registry:
+        lines += metric.render()
+    for collector, collect in _collectors.items():
+        try:
+            stats = collect()
+        except Exception:
+            continue
+        for name, value in _flatten(f"{PREFIX}_{collector}", stats):
+            lines += [f"# TYPE {name} gauge", f"{name} {value}"]
+    return "\n".join(lines) + "\n"
+
+
+def server_timing(timings: dict, total: float) -> str:
+    entries = [f"{name};dur={1000 * seconds:.1f}" + (f';desc="{count}x"' if count > 1 else "")
+               for name, (seconds, count) in timings.items()]
+    entries.append(f"total;dur={1000 * total:.1f}")
+    return ", ".join(entries)
+
+
+class MetricsMiddleware:
+    """Times every request by route template and reports its stages in a Server-Timing header.
+
+    A plain ASGI middleware, so streamed responses pass through untouched; their header only
+    covers the work done before the first byte.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        start = time.perf_counter()
+        timings = {}
+        token = _timings.set(timings)
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if SERVER_TIMING:
+                    MutableHeaders(scope=message).append(
+                        "Server-Timing", server_timing(timings, time.perf_counter() - start)
+                    )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _timings.reset(token)
+            route = getattr(scope.get("route"), "path", "unmatched")
+            http_seconds.observe(time.perf_counter() - start, method=scope["method"], route=route, status=status)
+
+
+def instrument_engine(engine):
+    """Time every statement run on engine (a sync Engine, or an AsyncEngine's sync_engine)."""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.get("query_started")
+        if not started:
+            return
+        elapsed = time.perf_counter() - started.pop()
+        operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+        if operation not in ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH"):
+            operation = "OTHER"
+        db_query_seconds.observe(elapsed, operation=operation)
+        add_timing("db", elapsed)
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(context):
+        started = context.connection.info.get("query_started") if context.connection is not None else None
+        if started:
+            started.pop()
+
+
+def instrument_sessions(session_class):
+    from sqlalchemy import event
+
+    @event.listens_for(session_class, "before_commit")
+    def before_commit(session):
+        session.info["commit_started"] = time.perf_counter()
+
+    @event.listens_for(session_class, "after_commit")
+    def after_commit(session):
+        started = session.info.pop("commit_started", None)
+        if started is not None:
+            elapsed = time.perf_counter() - started
+            db_commit_seconds.observe(elapsed)
+            add_timing("db_commit", elapsed)
@@ -1,19 +1,66 @@
 # app/models.py
-from sqlalchemy import Table, Column, Integer, String, Text, ForeignKey
+from datetime import date, datetime, timezone
+from sqlalchemy import (
+    Table, Column, Integer, String, Text, Float, Boolean, Date, DateTime, ForeignKey, Index, UniqueConstraint, false
+)
 from sqlalchemy.orm import relationship
+from sqlalchemy.types import TypeDecorator
 from app.database import Base
 
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+def as_utc(value: datetime) -> datetime:
+    """Aware datetime in UTC; naive values are taken to be UTC already."""
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+def parse_timestamp(value) -> datetime | None:
+    """Lenient parse of the timestamps clients used to send as free-form strings (ISO 8601 or a leading date)."""
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return as_utc(value)
+    text = str(value).strip()
+    if not text:
+        return None
+    try:
+        return as_utc(datetime.fromisoformat(text.replace("Z", "+00:00")))
+    except ValueError:
+        pass
+    try:
+        return datetime.combine(date.fromisoformat(text[:10]), datetime.min.time(), timezone.utc)
+    except ValueError:
+        return None
+
+class UTCDateTime(TypeDecorator):
+    """Timezone-aware timestamp, always stored and returned in UTC (SQLite keeps no offset of its own)."""
+    impl = DateTime(timezone=True)
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return as_utc(value) if isinstance(value, datetime) else value
+
+    def process_result_value(self, value, dialect):
+        return as_utc(value) if value is not None else None
+
+
 note_tags = Table(
     "note_tags",
     Base.metadata,
-    Column("note_id", Integer, ForeignKey("notes.id")),
-    Column("tag_id", Integer, ForeignKey("tags.id")),
+    # The primary key serves note -> tags lookups; the reverse index serves tag -> notes
+    Column("note_id", Integer, ForeignKey("notes.id"), primary_key=True),
+    Column("tag_id", Integer, ForeignKey("tags.id"), primary_key=True),
+    Index("ix_note_tags_tag_id_note_id", "tag_id", "note_id"),
 )
 
 class Tag(Base):
     __tablename__ = "tags"
+    __table_args__ = (UniqueConstraint("user_id", "name", name="uq_tags_user_id_name"),)
     id = Column(Integer, primary_key=True, index=True)
-    name = Column(String, unique=True, index=True)
+    name = Column(String, index=True)
     color = Column(String)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     user = relationship("User", back_populates="tags")
@@ -21,14 +68,19 @@ class Tag(Base):
 
 class Note(Base):
     __tablename__ = "notes"
+    # Timelines and pages are always per user, newest first by one of the two timestamps
+    __table_args__ = (
+        Index("ix_notes_user_id_created_at", "user_id", "created_at"),
+        Index("ix_notes_user_id_updated_at", "user_id", "updated_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, index=True)
     content = Column(Text)
     summary = Column(Text)
     action_items = Column(Text)
-    created_at = Column(String, index=True)
-    updated_at = Column(String, index=True)
+    created_at = Column(UTCDateTime, nullable=False, default=utcnow)
+    updated_at = Column(UTCDateTime, nullable=False, default=utcnow)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     user = relationship("User", back_populates="notes")
     tags = relationship("Tag", secondary=note_tags, back_populates="notes")
@@ -48,12 +100,57 @@ class User(Base):
 
 class ApiUsage(Base):
     __tablename__ = "api_usage"
-    
+    __table_args__ = (Index("ix_api_usage_user_id_usage_date", "user_id", "usage_date"),)
+
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     note_id = Column(Integer, ForeignKey("notes.id"), nullable=True)
     user = relationship("User", back_populates="api_usage")
     note = relationship("Note", back_populates="api_usage")
-    usage_date = Column(String, index=True)
+    usage_date = Column(UTCDateTime, nullable=False, default=utcnow)
     input_tokens = Column(Integer, default=0)
     output_tokens = Column(Integer, default=0)
+    cache_hit = Column(Boolean, default=False, server_default=false(), nullable=False)
+
+class ApiUsageDaily(Base):
+    """Per-user, per-day totals of api_usage, updated in the same transaction as each usage row."""
+    __tablename__ = "api_usage_daily"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    requests = Column(Integer, nullable=False, default=0)
+    input_tokens = Column(Integer, nullable=False, default=0)
+    output_tokens = Column(Integer, nullable=False, default=0)
+    cache_hits = Column(Integer, nullable=False, default=0)
+
+class ExtractionCache(Base):
+    __tablename__ = "extraction_cache"
+    __table_args__ = (UniqueConstraint("content_hash", "extractor_version"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    content_hash = Column(String(64), nullable=False)
+    extractor_version = Column(String, nullable=False)
+    text = Column(Text, nullable=False)
+    size = Column(Integer, nullable=False)  # Bytes of extracted text, used for eviction
+    hits = Column(Integer, default=0)
+    last_used_at = Column(Float, index=True)  # Unix timestamp for LRU eviction
+
+class SummaryCache(Base):
+    __tablename__ = "summary_cache"
+    __table_args__ = (
+        UniqueConstraint("user_id", "content_hash", "include_action_items", "model", "prompt_version"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    # Summaries are generated with the user's own OpenAI key, so they are not shared between users
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    content_hash = Column(String(64), nullable=False)
+    include_action_items = Column(Boolean, nullable=False)
+    model = Column(String, nullable=False)
+    prompt_version = Column(String, nullable=False)
+    summary = Column(Text, nullable=False)
+    action_items = Column(Text, nullable=False)
+    size = Column(Integer, nullable=False)  # Bytes of summary and action items, used for eviction
+    hits = Column(Integer, default=0)
+    last_used_at = Column(Float, index=True)
+
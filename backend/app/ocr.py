@@ -0,0 +1,191 @@
+# app/ocr.py
+import logging
+import multiprocessing
+import os
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from PIL import Image, ImageOps, ImageSequence
+import pypdfium2 as pdfium
+import pytesseract
+
+logger = logging.getLogger(__name__)
+
+# --- OCR engine: preprocessing in the caller, recognition in a warm process pool ---
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", str(os.cpu_count() or 2)))
+OCR_TARGET_DPI = int(os.getenv("OCR_TARGET_DPI", "300"))
+# Longest side after scaling; phone photos are usually far larger than Tesseract needs
+OCR_MAX_DIMENSION = int(os.getenv("OCR_MAX_DIMENSION", "2500"))
+OCR_MIN_DIMENSION = int(os.getenv("OCR_MIN_DIMENSION", "1000"))
+OCR_BINARIZE = os.getenv("OCR_BINARIZE", "1") == "1"
+
+_pool: ProcessPoolExecutor | None = None
+_pool_lock = threading.Lock()
+# Why the pool last failed to start or broke, reported by health()
+_pool_error: str | None = None
+
+
+def _init_worker():
+    # Each worker handles one page at a time; stop Tesseract from spawning its own threads
+    os.environ["OMP_THREAD_LIMIT"] = "1"
+
+
+def _ping():
+    return os.getpid()
+
+
+def start():
+    """Create the process pool and spawn its workers so the first upload does not pay for it.
+
+    Called at startup and again by every OCR call, so a pool that failed to start
+    or broke is recreated on the next use. Raises if the workers cannot be spawned.
+    """
+    global _pool, _pool_error
+    with _pool_lock:
+        if _pool is None:
+            pool = ProcessPoolExecutor(
+                max_workers=OCR_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+            )
+            try:
+                for future in [pool.submit(_ping) for _ in range(OCR_WORKERS)]:
+                    future.result()
+            except Exception as e:
+                pool.shutdown(cancel_futures=True)
+                _pool_error = f"{type(e).__name__}: {e}"
+                raise
+            _pool, _pool_error = pool, None
+        return _pool
+
+
+def warm_up():
+    """start() for application startup: a failure is logged and left to the first OCR call to retry,
+    so the rest of the API still comes up."""
+    try:
+        start()
+    except Exception:
+        logger.exception("Could not start the OCR process pool; OCR uploads will retry it")
+
+
+def _discard(pool: ProcessPoolExecutor, error: Exception):
+    global _pool, _pool_error
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+            _pool_error = f"{type(error).__name__}: {error}"
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown():
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(cancel_futures=True)
+
+
+def health() -> dict:
+    return {"workers": OCR_WORKERS, "running": _pool is not None, "error": _pool_error}
+
+
+def _otsu_threshold(img: Image.Image) -> int:
+    hist = img.histogram()
+    total = sum(hist)
+    sum_all = sum(i * h for i, h in enumerate(hist))
+    sum_bg = weight_bg = 0
+    best, threshold = 0.0, 127
+    for t, count in enumerate(hist):
+        weight_bg += count
+        if weight_bg == 0:
+            continue
+        weight_fg = total - weight_bg
+        if weight_fg == 0:
+            break
+        sum_bg += t * count
+        mean_bg = sum_bg / weight_bg
+        mean_fg = (sum_all - sum_bg) / weight_fg
+        between = weight_bg * weight_fg * (mean_bg - mean_fg) ** 2
+        if between > best:
+            best, threshold = between, t
+    return threshold
+
+
+def _recognize(size: tuple[int, int], raw: bytes) -> str:
+    """Runs in a pool worker: contrast-stretch, binarize and OCR one grayscale page."""
+    img = ImageOps.autocontrast(Image.frombytes("L", size, raw))
+    if OCR_BINARIZE:
+        threshold = _otsu_threshold(img)
+        img = img.point(lambda p: 255 if p > threshold else 0)
+    try:
+        return pytesseract.image_to_string(img, config=f"--dpi {OCR_TARGET_DPI}")
+    except Exception as e:
+        # Some pytesseract errors cannot be unpickled and would break the whole pool
+        raise RuntimeError(str(e)) from None
+
+
+def prepare(img: Image.Image, dpi: float | None = None) -> tuple[tuple[int, int], bytes]:
+    """Orient, grayscale and rescale a page to roughly OCR_TARGET_DPI within the size bounds."""
+    img = ImageOps.exif_transpose(img).convert("L")
+    scale = OCR_TARGET_DPI / dpi if dpi else 1.0
+    longest = max(img.size) * scale
+    if longest > OCR_MAX_DIMENSION:
+        scale *= OCR_MAX_DIMENSION / longest
+    elif longest < OCR_MIN_DIMENSION:
+        scale *= OCR_MIN_DIMENSION / longest
+    if abs(scale - 1.0) > 0.05:
+        size = (max(1, round(img.width * scale)), max(1, round(img.height * scale)))
+        img = img.resize(size, Image.LANCZOS)
+    return img.size, img.tobytes()
+
+
+def _image_dpi(img: Image.Image) -> float | None:
+    dpi = img.info.get("dpi")
+    # Camera images often claim 72 dpi, which says nothing about the text size
+    if dpi and dpi[0] and float(dpi[0]) > 72:
+        return float(dpi[0])
+    return None
+
+
+def _run(pages) -> str:
+    """OCR prepared pages in the pool, keeping a bounded number in flight and their order intact."""
+    pool = start()
+    inflight, texts = deque(), []
+    try:
+        for size, raw in pages:
+            inflight.append(pool.submit(_recognize, size, raw))
+            if len(inflight) >= OCR_WORKERS * 2:
+                texts.append(inflight.popleft().result())
+        texts.extend(future.result() for future in inflight)
+    except BrokenProcessPool as e:
+        # A worker died (e.g. killed for memory); replace the pool on the next call
+        _discard(pool, e)
+        raise
+    return "\n\n".join(text.strip() for text in texts if text.strip())
+
+
+def ocr_image(stream) -> str:
+    """OCR an image, splitting multi-frame files (e.g. TIFF) into pages recognized in parallel."""
+    img = Image.open(stream)
+    if img.format == "JPEG":
+        # Let libjpeg decode at reduced scale instead of decoding full size and shrinking
+        img.draft("L", (OCR_MAX_DIMENSION, OCR_MAX_DIMENSION))
+    dpi = _image_dpi(img)
+    return _run(prepare(frame.copy(), dpi) for frame in ImageSequence.Iterator(img))
+
+
+def ocr_pdf(stream) -> str:
+    """Render every page of an image-only PDF and OCR the pages in parallel, in order."""
+    pdf = pdfium.PdfDocument(stream)
+
+    def pages():
+        for page in pdf:
+            bitmap = page.render(scale=OCR_TARGET_DPI / 72, grayscale=True)
+            yield prepare(bitmap.to_pil(), OCR_TARGET_DPI)
+            page.close()
+
+    try:
+        return _run(pages())
+    finally:
+        pdf.close()
@@ -1,38 +1,247 @@
+import hashlib
+import io
 import os
-import shutil
-import uuid
-from tika import parser
+import tempfile
+import threading
+import time
 import magic
-from PIL import Image
-import pytesseract
-
-# --- File upload and extraction helpers ---
-UPLOAD_DIR = "/tmp/uploads"
-os.makedirs(UPLOAD_DIR, exist_ok=True)
-
-def save_upload(tmp_file):
-    """Save an UploadFile to disk and return its filesystem path."""
-    ext = os.path.splitext(tmp_file.filename)[1] or ""
-    file_id = str(uuid.uuid4())
-    path = os.path.join(UPLOAD_DIR, f"{file_id}{ext}")
-    with open(path, "wb") as out:
-        shutil.copyfileobj(tmp_file.file, out)
-    return path
-
-def detect_mime(path):
-    """Detect MIME type of file at given path."""
-    ms = magic.Magic(mime=True)
-    return ms.from_file(path)
-
-def extract_with_tika(path):
-    """Extract text content using OCR for images or Apache Tika for other files."""
-    mime = detect_mime(path)
-    if mime and mime.startswith("image/"):
+import requests
+from requests.adapters import HTTPAdapter
+from app import ocr
+from app.metrics import extract_seconds, timed
+
+# --- Upload ingestion and extraction helpers ---
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(25 * 1024 * 1024)))
+# Uploads larger than this spill from memory into an anonymous temp file
+SPOOL_MEMORY_BYTES = int(os.getenv("UPLOAD_SPOOL_MEMORY_BYTES", str(4 * 1024 * 1024)))
+CHUNK_SIZE = 64 * 1024
+SNIFF_BYTES = 2048
+# Bump whenever extraction output changes so cached text is not reused
+EXTRACTOR_VERSION = "tika-tesseract-2"
+
+TIKA_SERVER_URL = os.getenv("TIKA_SERVER_URL", "http://localhost:9998").rstrip("/")
+TIKA_CONNECT_TIMEOUT = float(os.getenv("TIKA_CONNECT_TIMEOUT", "5"))
+TIKA_READ_TIMEOUT = float(os.getenv("TIKA_READ_TIMEOUT", "120"))
+TIKA_POOL_SIZE = int(os.getenv("TIKA_POOL_SIZE", "8"))
+# Consecutive Tika failures before calls fail fast, and how long to wait before probing again
+TIKA_BREAKER_THRESHOLD = int(os.getenv("TIKA_BREAKER_THRESHOLD", "5"))
+TIKA_BREAKER_RESET_SECONDS = float(os.getenv("TIKA_BREAKER_RESET_SECONDS", "30"))
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+class ExtractorUnavailable(RuntimeError):
+    """The text extraction backend is down or the circuit breaker is open."""
+
+
+class SpooledUpload:
+    """An uploaded file held in memory, spilling to an unlinked temp file when it grows large.
+
+    Use it as a context manager so the buffer (and any spill file) is released
+    however the request ends.
+    """
+
+    def __init__(self, filename: str | None, max_bytes: int = MAX_UPLOAD_BYTES):
+        self.filename = filename or ""
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.mime = None
+        self.sha256 = None
+        self._hash = hashlib.sha256()
+        self._head = b""
+        self._file = io.BytesIO()
+        self._spilled = False
+
+    def write(self, chunk: bytes):
+        self.size += len(chunk)
+        if self.size > self.max_bytes:
+            raise UploadTooLarge(f"Upload exceeds the {self.max_bytes} byte limit")
+        if len(self._head) < SNIFF_BYTES:
+            self._head += chunk[:SNIFF_BYTES - len(self._head)]
+        self._hash.update(chunk)
+        if not self._spilled and self.size > SPOOL_MEMORY_BYTES:
+            # TemporaryFile is unlinked on creation, so a crash cannot leak it
+            spill = tempfile.TemporaryFile()
+            spill.write(self._file.getbuffer())
+            self._file = spill
+            self._spilled = True
+        self._file.write(chunk)
+
+    def finish(self):
+        with timed("detect_mime"):
+            self.mime = get_extractor().detect_mime(self._head)
+        self.sha256 = self._hash.hexdigest()
+        return self
+
+    def stream(self):
+        """Return the buffered bytes as a readable stream positioned at the start."""
+        self._file.seek(0)
+        return self._file
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+async def ingest_upload(upload_file, max_bytes: int = MAX_UPLOAD_BYTES) -> SpooledUpload:
+    """Read an UploadFile chunk by chunk, enforcing max_bytes, hashing it and sniffing its MIME type."""
+    if upload_file.size is not None and upload_file.size > max_bytes:
+        raise UploadTooLarge(f"Upload exceeds the {max_bytes} byte limit")
+    spooled = SpooledUpload(upload_file.filename, max_bytes)
+    try:
+        with timed("save_upload"):
+            while chunk := await upload_file.read(CHUNK_SIZE):
+                spooled.write(chunk)
+        return spooled.finish()
+    except BaseException:
+        spooled.close()
+        raise
+
+class CircuitBreaker:
+    """Fail fast after repeated failures, letting a single probe through once reset_seconds pass."""
+
+    def __init__(self, threshold: int = TIKA_BREAKER_THRESHOLD, reset_seconds: float = TIKA_BREAKER_RESET_SECONDS):
+        self.threshold = threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_seconds:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state != "half-open":
+                return self.state == "closed"
+            # Let one caller probe; everyone else keeps failing fast until it reports back
+            self.opened_at = time.monotonic()
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+
+
+class Extractor:
+    """Long-lived extraction service: one libmagic handle and a keep-alive connection pool to Tika."""
+
+    def __init__(
+        self,
+        tika_url: str = TIKA_SERVER_URL,
+        pool_size: int = TIKA_POOL_SIZE,
+        timeout: tuple[float, float] = (TIKA_CONNECT_TIMEOUT, TIKA_READ_TIMEOUT),
+    ):
+        self.tika_url = tika_url
+        self.timeout = timeout
+        self.breaker = CircuitBreaker()
+        # libmagic handles are not thread-safe
+        self._magic = magic.Magic(mime=True)
+        self._magic_lock = threading.Lock()
+        self._session = requests.Session()
+        self._session.mount(self.tika_url, HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0))
+
+    def detect_mime(self, head: bytes) -> str:
+        """Detect MIME type from the first bytes of a file."""
+        with self._magic_lock:
+            return self._magic.from_buffer(head)
+
+    def extract(self, stream, mime: str) -> str:
+        """Extract text content using OCR for images or Apache Tika for other files."""
+        start = time.perf_counter()
+        method = "ocr" if mime and mime.startswith("image/") else "tika"
+        try:
+            if method == "ocr":
+                try:
+                    with timed("extract_ocr"):
+                        return ocr.ocr_image(stream)
+                except Exception as e:
+                    raise RuntimeError(f"OCR extraction failed: {e}")
+            # fallback to Tika for non-image types
+            with timed("extract_tika"):
+                content = self._tika(stream, mime)
+            if mime == "application/pdf" and not content.strip():
+                # No text layer: treat it as a scanned document and OCR each page
+                method = "tika+ocr"
+                stream.seek(0)
+                try:
+                    with timed("extract_ocr"):
+                        return ocr.ocr_pdf(stream)
+                except Exception as e:
+                    raise RuntimeError(f"OCR extraction failed: {e}")
+            return content
+        finally:
+            extract_seconds.observe(time.perf_counter() - start, mime=mime or "unknown", method=method)
+
+    def _tika(self, stream, mime: str) -> str:
+        if not self.breaker.allow():
+            raise ExtractorUnavailable("Text extraction service is temporarily unavailable")
+        try:
+            resp = self._session.put(
+                f"{self.tika_url}/tika",
+                data=stream,
+                headers={"Content-Type": mime or "application/octet-stream", "Accept": "text/plain"},
+                timeout=self.timeout,
+            )
+        except requests.RequestException as e:
+            self.breaker.record_failure()
+            raise ExtractorUnavailable(f"Text extraction service is unavailable: {e}")
+        if resp.status_code >= 500:
+            self.breaker.record_failure()
+            raise ExtractorUnavailable(f"Text extraction service returned {resp.status_code}")
+        self.breaker.record_success()
+        if resp.status_code != 200:
+            # 415/422: Tika is healthy but cannot parse this file
+            raise RuntimeError(f"Tika could not parse the file ({resp.status_code})")
+        resp.encoding = "utf-8"
+        return resp.text
+
+    def health(self) -> dict:
         try:
-            img = Image.open(path)
-            return pytesseract.image_to_string(img)
-        except Exception as e:
-            raise RuntimeError(f"OCR extraction failed: {e}")
-    # fallback to Tika for non-image types
-    parsed = parser.from_file(path)
-    return parsed.get("content", "") or ""
\ No newline at end of file
+            resp = self._session.get(f"{self.tika_url}/tika", timeout=(TIKA_CONNECT_TIMEOUT, 5))
+            tika = "ok" if resp.status_code == 200 else f"error {resp.status_code}"
+        except requests.RequestException:
+            tika = "unreachable"
+        return {"tika": tika, "breaker": self.breaker.state}
+
+    def close(self):
+        self._session.close()
+
+
+_extractor: Extractor | None = None
+_extractor_lock = threading.Lock()
+
+
+def get_extractor() -> Extractor:
+    global _extractor
+    if _extractor is None:
+        with _extractor_lock:
+            if _extractor is None:
+                _extractor = Extractor()
+    return _extractor
+
+
+def close_extractor():
+    global _extractor
+    if _extractor is not None:
+        _extractor.close()
+        _extractor = None
@@ -0,0 +1,119 @@
+# app/passwords.py
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from passlib.context import CryptContext
+
+# --- Password hashing, kept off the AnyIO threadpool that serves every other sync endpoint ---
+# bcrypt cost factor; hashes with any other cost are rehashed on the user's next successful login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# thread (bcrypt releases the GIL) or process
+PASSWORD_HASH_EXECUTOR = os.getenv("PASSWORD_HASH_EXECUTOR", "thread")
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Hashes allowed to wait for a worker; past this, auth requests get a 503 instead of queueing
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "32"))
+
+if PASSWORD_HASH_EXECUTOR not in ("thread", "process"):
+    raise RuntimeError(f"Unknown PASSWORD_HASH_EXECUTOR {PASSWORD_HASH_EXECUTOR!r}")
+
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS,
+)
+
+
+def hash_password(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return pwd_context.verify(plain_password, hashed_password)
+
+
+def verify_and_update(plain_password: str, hashed_password: str) -> tuple[bool, str | None]:
+    """(valid, new hash to store if the stored one was made with a different cost, else None)."""
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+
+class HasherBusy(Exception):
+    def __init__(self, retry_after: float):
+        super().__init__("Too many password checks in progress")
+        self.retry_after = retry_after
+
+
+class PasswordHasher:
+    """Bounded executor for bcrypt work with queue-depth admission control."""
+
+    def __init__(self, workers: int = PASSWORD_HASH_WORKERS, max_pending: int = PASSWORD_HASH_MAX_PENDING,
+                 kind: str = PASSWORD_HASH_EXECUTOR):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.kind = kind
+        self._executor: Executor | None = None
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.total_seconds = 0.0
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+        return self._executor
+
+    def _admit(self):
+        with self._lock:
+            if self.in_flight >= self.workers + self.max_pending:
+                self.rejected += 1
+                # Roughly how long the queue ahead takes to drain
+                average = self.total_seconds / self.completed if self.completed else 0.25
+                raise HasherBusy(average * self.in_flight / self.workers)
+            self.in_flight += 1
+
+    async def run(self, fn, *args):
+        self._admit()
+        start = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._get_executor(), fn, *args)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+                self.completed += 1
+                self.total_seconds += time.perf_counter() - start
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "executor": self.kind,
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "in_flight": self.in_flight,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "avg_ms": round(1000 * self.total_seconds / self.completed, 1) if self.completed else 0.0,
+                "bcrypt_rounds": BCRYPT_ROUNDS,
+            }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+password_hasher = PasswordHasher()
+
+
+async def hash_password_async(password: str) -> str:
+    return await password_hasher.run(hash_password, password)
+
+
+async def verify_and_update_async(plain_password: str, hashed_password: str) -> tuple[bool, str | None]:
+    return await password_hasher.run(verify_and_update, plain_password, hashed_password)
@@ -0,0 +1,293 @@
+# app/pipeline.py
+import asyncio
+import json
+import logging
+import os
+from datetime import datetime
+from typing import AsyncIterator, Optional
+from app.database import SessionLocal
+from app.parse import EXTRACTOR_VERSION, ExtractorUnavailable, SpooledUpload, get_extractor
+from app.cache import lookup_extraction, store_extraction, summarize_cached, stream_summary_cached
+from app.summarizer import SummarizerUnavailable
+from app.jobs import UPLOAD_CONCURRENCY, Job, JobError
+from app.usage import UsageEvent
+from app import crud, schemas, usage_log
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_STAGES = ("extract", "summarize", "save_note", "log_usage")
+# Files from one batch request extracted and summarized at the same time
+BATCH_CONCURRENCY = int(os.getenv("BATCH_UPLOAD_CONCURRENCY", str(UPLOAD_CONCURRENCY)))
+BATCH_MAX_FILES = int(os.getenv("BATCH_UPLOAD_MAX_FILES", "50"))
+
+
+def extract_cached(upload: SpooledUpload) -> tuple[str, bool]:
+    """Extract text from an upload, reusing cached text for identical files. Returns (text, cache_hit)."""
+    db = SessionLocal()
+    try:
+        cached = lookup_extraction(db, upload.sha256, EXTRACTOR_VERSION)
+        if cached is not None:
+            return cached, True
+        content = get_extractor().extract(upload.stream(), upload.mime)
+        if content.strip():
+            store_extraction(db, upload.sha256, EXTRACTOR_VERSION, content)
+        return content, False
+    finally:
+        db.close()
+
+
+async def extract_upload(upload: SpooledUpload) -> tuple[str, bool]:
+    """Run extract_cached off the event loop, translating failures into JobErrors."""
+    try:
+        content, cached = await asyncio.to_thread(extract_cached, upload)
+    except ExtractorUnavailable as e:
+        raise JobError(503, str(e))
+    except Exception as e:
+        raise JobError(400, f"Failed to parse {upload.mime}: {e}")
+    if not content.strip():
+        raise JobError(415, "Failed to parse text from file")
+    return content, cached
+
+
+def summarizer_error(e: Exception) -> JobError:
+    if isinstance(e, SummarizerUnavailable):
+        return JobError(e.status_code, e.detail)
+    return JobError(400, str(e))
+
+
+async def summarize_with_cache(user_id: int, text: str, openai_api_key: str | None, include_action_items: bool):
+    db = SessionLocal()
+    try:
+        return await summarize_cached(db, user_id, text, openai_api_key, include_action_items)
+    finally:
+        db.close()
+
+
+async def run_upload(
+    job: Job,
+    upload: SpooledUpload,
+    title: str,
+    include_action_items: bool,
+    created_at: Optional[datetime],
+    tags: list[str],
+    openai_api_key: Optional[str],
+):
+    """Run extract -> summarize -> save note -> log usage for an uploaded file."""
+    with upload, job.stage("extract") as stage:
+        content, stage.cached = await extract_upload(upload)
+
+    with job.stage("summarize") as stage:
+        try:
+            summary, action_items, input_tokens, output_tokens, summary_hit = await summarize_with_cache(
+                job.user_id, content, openai_api_key, include_action_items
+            )
+            stage.cached = summary_hit
+        except (SummarizerUnavailable, ValueError) as e:
+            raise summarizer_error(e)
+
+    usage = UsageEvent(job.user_id, None, created_at, input_tokens, output_tokens, summary_hit)
+
+    def save():
+        db = SessionLocal()
+        try:
+            with job.stage("save_note"):
+                db_note = crud.create_note(
+                    db, title, content, summary, action_items, created_at, tags, job.user_id,
+                    usage=usage_log.in_transaction(usage)
+                )
+                if not db_note:
+                    raise JobError(400, "Failed to create note")
+                job.note_id = usage.note_id = db_note.id
+            with job.stage("log_usage"):
+                usage_log.log_usage(db, usage)
+        finally:
+            db.close()
+
+    await asyncio.to_thread(save)
+
+
+async def _prepare_batch_item(
+    user_id: int, upload: SpooledUpload, include_action_items: bool, openai_api_key: Optional[str]
+) -> dict:
+    with upload:
+        content, _ = await extract_upload(upload)
+    try:
+        summary, action_items, input_tokens, output_tokens, cache_hit = await summarize_with_cache(
+            user_id, content, openai_api_key, include_action_items
+        )
+    except (SummarizerUnavailable, ValueError) as e:
+        raise summarizer_error(e)
+    return {
+        "content": content,
+        "summary": summary,
+        "action_items": action_items,
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+        "cache_hit": cache_hit,
+    }
+
+
+async def run_batch_upload(
+    entries: list[dict],
+    user_id: int,
+    include_action_items: bool,
+    created_at: Optional[datetime],
+    openai_api_key: Optional[str],
+) -> list[dict]:
+    """Extract and summarize a batch of files concurrently, then save every success in one transaction.
+
+    Each entry holds filename, title, tags and either an upload or the JobError
+    raised while ingesting it. Returns one result per entry, in order.
+    """
+    slots = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    async def prepare(entry: dict):
+        if entry.get("error"):
+            return entry["error"]
+        async with slots:
+            try:
+                return await _prepare_batch_item(user_id, entry["upload"], include_action_items, openai_api_key)
+            except JobError as e:
+                return e
+            except Exception as e:
+                # One broken file must not fail the rest of the batch
+                logger.exception("Batch item %s failed", entry["filename"])
+                return JobError(500, str(e))
+
+    prepared = await asyncio.gather(*(prepare(entry) for entry in entries))
+    results = [
+        {"index": i, "filename": entry["filename"], "status": "pending", "status_code": None, "error": None, "note": None}
+        for i, entry in enumerate(entries)
+    ]
+    items = []
+    for result, entry, outcome in zip(results, entries, prepared):
+        if isinstance(outcome, JobError):
+            result.update(status="failed", status_code=outcome.status_code, error=outcome.detail)
+        else:
+            items.append((result, {**outcome, "title": entry["title"], "tags": entry["tags"], "created_at": created_at}))
+
+    def save():
+        db = SessionLocal()
+        try:
+            return crud.create_notes_bulk(db, [item for _, item in items], user_id)
+        finally:
+            db.close()
+
+    if items:
+        try:
+            notes = await asyncio.to_thread(save)
+        except Exception as e:
+            for result, _ in items:
+                result.update(status="failed", status_code=500, error=f"Failed to save notes: {e}")
+        else:
+            for (result, _), note in zip(items, notes):
+                result.update(status="created", status_code=201, note=note)
+    return results
+
+
+def sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def note_json(note) -> dict:
+    return schemas.Note.model_validate(note, from_attributes=True).model_dump(mode="json")
+
+
+async def _stream_summary_events(
+    db, user_id: int, text: str, openai_api_key: Optional[str], include_action_items: bool, result: list
+):
+    """Relay summary events as SSE, leaving (summary, action_items, tokens in, tokens out, cache_hit) in result."""
+    try:
+        async for event, data in stream_summary_cached(db, user_id, text, openai_api_key, include_action_items):
+            if event == "result":
+                result.extend(data)
+            else:
+                yield sse(event, {"text": data})
+    except (SummarizerUnavailable, ValueError) as e:
+        raise summarizer_error(e)
+
+
+async def stream_upload(
+    upload: SpooledUpload,
+    user_id: int,
+    title: str,
+    include_action_items: bool,
+    created_at: Optional[datetime],
+    tags: list[str],
+    openai_api_key: Optional[str],
+) -> AsyncIterator[str]:
+    """Upload pipeline as server-sent events: stage updates, summary deltas, action items, then the saved note."""
+    db = SessionLocal()
+    try:
+        with upload:
+            yield sse("stage", {"stage": "extract", "status": "running"})
+            content, cached = await extract_upload(upload)
+            yield sse("stage", {"stage": "extract", "status": "done", "cached": cached})
+
+        yield sse("stage", {"stage": "summarize", "status": "running"})
+        result = []
+        async for message in _stream_summary_events(db, user_id, content, openai_api_key, include_action_items, result):
+            yield message
+        summary, action_items, input_tokens, output_tokens, cache_hit = result
+
+        usage = UsageEvent(user_id, None, created_at, input_tokens, output_tokens, cache_hit)
+
+        def save():
+            db_note = crud.create_note(
+                db, title, content, summary, action_items, created_at, tags, user_id,
+                usage=usage_log.in_transaction(usage)
+            )
+            if not db_note:
+                raise JobError(400, "Failed to create note")
+            usage.note_id = db_note.id
+            usage_log.log_usage(db, usage)
+            return note_json(db_note)
+
+        yield sse("done", await asyncio.to_thread(save))
+    except JobError as e:
+        yield sse("error", {"status_code": e.status_code, "detail": e.detail})
+    except Exception:
+        # End the stream with an error event so the client is not left waiting for "done"
+        logger.exception("Streaming upload %r failed", title)
+        yield sse("error", {"status_code": 500, "detail": "Unexpected server error"})
+    finally:
+        db.close()
+
+
+async def stream_resummarize(
+    note_id: int,
+    user_id: int,
+    content: str,
+    include_action_items: bool,
+    updated_at: Optional[datetime],
+    openai_api_key: Optional[str],
+) -> AsyncIterator[str]:
+    """Re-summarize an existing note as server-sent events, saving the note once the stream completes."""
+    db = SessionLocal()
+    try:
+        result = []
+        async for message in _stream_summary_events(db, user_id, content, openai_api_key, include_action_items, result):
+            yield message
+        summary, action_items, input_tokens, output_tokens, cache_hit = result
+
+        usage = UsageEvent(user_id, note_id, updated_at, input_tokens, output_tokens, cache_hit)
+
+        def save():
+            db_note = crud.update_note(
+                db, note_id, None, content, summary, updated_at, action_items, user_id,
+                usage=usage_log.in_transaction(usage)
+            )
+            if not db_note:
+                raise JobError(404, "Note not found")
+            usage_log.log_usage(db, usage)
+            return note_json(db_note)
+
+        yield sse("done", await asyncio.to_thread(save))
+    except JobError as e:
+        yield sse("error", {"status_code": e.status_code, "detail": e.detail})
+    except Exception:
+        # End the stream with an error event so the client is not left waiting for "done"
+        logger.exception("Streaming re-summarize of note %s failed", note_id)
+        yield sse("error", {"status_code": 500, "detail": "Unexpected server error"})
+    finally:
+        db.close()
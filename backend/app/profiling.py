@@ -0,0 +1,257 @@
+# app/profiling.py
+import cProfile
+import hmac
+import itertools
+import marshal
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter, deque
+from dataclasses import dataclass, field
+
+# --- On-demand profiles of single requests ---
+# A request is profiled when it carries X-Profile-Token: <PROFILE_TOKEN>, or at random with PROFILE_SAMPLE_RATE.
+# The same header is required to list and download profiles. With neither set the middleware is not installed.
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN") or None
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+# sample: wall-clock stack samples of every thread, so work in the threadpool shows up too
+# cprofile: deterministic call counts, but only for code on the event loop thread
+# Both see the whole process: requests share the event loop and threadpool, so stacks cannot be told
+# apart by thread. Profiles record how many other requests overlapped them; profile an idle server
+# (or compare against concurrent_requests = 0) for a clean single-request picture.
+PROFILE_MODE = os.getenv("PROFILE_MODE", "sample")
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+# Most recent profiles kept for download
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "20"))
+
+PROFILE_HEADER = "x-profile-token"
+PROFILING_ENABLED = bool(PROFILE_TOKEN) or PROFILE_SAMPLE_RATE > 0
+
+if PROFILE_MODE not in ("sample", "cprofile"):
+    raise RuntimeError(f"Unknown PROFILE_MODE {PROFILE_MODE!r}")
+
+# Leaf frames of threads with nothing to do; samples stopped in these are counted as idle
+IDLE_FRAMES = {
+    ("threading.py", "wait"), ("queue.py", "get"), ("thread.py", "_worker"), ("selectors.py", "select"),
+}
+
+
+@dataclass
+class Profile:
+    id: int
+    method: str
+    path: str
+    mode: str
+    started_at: float
+    duration_ms: float = 0.0
+    status: int | None = None
+    samples: int = 0
+    idle_samples: int = 0
+    # Most other requests in flight at once while this one was profiled
+    concurrent_requests: int = 0
+    # sample mode: collapsed stack -> count, and (file, line, function) stack -> count
+    stacks: Counter = field(default_factory=Counter)
+    frames: Counter = field(default_factory=Counter)
+    # cprofile mode: the profiler's pstats dict
+    stats: dict | None = None
+
+    def summary(self) -> dict:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "mode": self.mode,
+            "status": self.status,
+            "started_at": self.started_at,
+            "duration_ms": self.duration_ms,
+            "samples": self.samples,
+            "idle_samples": self.idle_samples,
+            "concurrent_requests": self.concurrent_requests,
+        }
+
+    def collapsed(self) -> str | None:
+        """Stacks in the folded format read by flamegraph.pl and speedscope."""
+        if self.mode != "sample":
+            return None
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def pstats(self) -> bytes:
+        """Marshalled stats loadable with pstats.Stats; in sample mode times are estimated from the samples."""
+        if self.stats is not None:
+            return marshal.dumps(self.stats)
+        return marshal.dumps(_sampled_stats(self.frames, PROFILE_INTERVAL_MS / 1000))
+
+
+def _label(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _sampled_stats(frames: Counter, interval: float) -> dict:
+    """pstats entries from stack samples: each sample is one "call" lasting interval seconds."""
+    stats = {}
+    for stack, count in frames.items():
+        seen = set()
+        for depth, func in enumerate(stack):
+            cc, nc, tt, ct, callers = stats.setdefault(func, (0, 0, 0.0, 0.0, {}))
+            leaf = depth == len(stack) - 1
+            if func not in seen:
+                cc, nc, ct = cc + count, nc + count, ct + count * interval
+                seen.add(func)
+            if leaf:
+                tt += count * interval
+            if depth:
+                caller = stack[depth - 1]
+                pcc, pnc, ptt, pct = callers.get(caller, (0, 0, 0.0, 0.0))
+                callers[caller] = (pcc + count, pnc + count, ptt + (count * interval if leaf else 0.0),
+                                   pct + count * interval)
+            stats[func] = (cc, nc, tt, ct, callers)
+    return stats
+
+
+class Sampler(threading.Thread):
+    """Samples the stacks of every other thread until stopped."""
+
+    def __init__(self, profile: Profile, interval: float):
+        super().__init__(name="profile-sampler", daemon=True)
+        self.profile = profile
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def run(self):
+        own = threading.get_ident()
+        names = {}
+        while not self._stop_event.wait(self.interval):
+            if len(names) != threading.active_count():
+                names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                code = frame.f_code
+                if (os.path.basename(code.co_filename), code.co_name) in IDLE_FRAMES:
+                    self.profile.idle_samples += 1
+                    continue
+                codes = []
+                while frame is not None:
+                    codes.append(frame.f_code)
+                    frame = frame.f_back
+                codes.reverse()
+                thread = names.get(ident, str(ident))
+                self.profile.stacks[";".join([thread, *(_label(c) for c in codes)])] += 1
+                self.profile.frames[tuple((c.co_filename, c.co_firstlineno, c.co_name) for c in codes)] += 1
+                self.profile.samples += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+class ProfileStore:
+    def __init__(self, keep: int = PROFILE_KEEP):
+        self._profiles: deque[Profile] = deque(maxlen=keep)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        # cProfile hooks the event loop thread, so only one request can hold it at a time
+        self._cprofile_busy = False
+
+    def start(self, method: str, path: str):
+        """Begin profiling a request; returns (profile, stop) or None if a cProfile run is already active."""
+        profile = Profile(next(self._ids), method, path, PROFILE_MODE, time.time())
+        if PROFILE_MODE == "cprofile":
+            with self._lock:
+                if self._cprofile_busy:
+                    return None
+                self._cprofile_busy = True
+            profiler = cProfile.Profile()
+            profiler.enable()
+
+            def stop():
+                profiler.disable()
+                profiler.create_stats()
+                profile.stats = profiler.stats
+                with self._lock:
+                    self._cprofile_busy = False
+        else:
+            sampler = Sampler(profile, PROFILE_INTERVAL_MS / 1000)
+            sampler.start()
+            stop = sampler.stop
+        return profile, stop
+
+    def add(self, profile: Profile):
+        with self._lock:
+            self._profiles.append(profile)
+
+    def list(self) -> list[dict]:
+        with self._lock:
+            return [p.summary() for p in reversed(self._profiles)]
+
+    def get(self, profile_id: int) -> Profile | None:
+        with self._lock:
+            return next((p for p in self._profiles if p.id == profile_id), None)
+
+
+profile_store = ProfileStore()
+
+
+def authorized(token: str | None) -> bool:
+    # compare_digest only accepts ASCII str, so compare bytes; headers can carry anything
+    return bool(PROFILE_TOKEN) and token is not None and hmac.compare_digest(
+        token.encode("utf-8", "surrogateescape"), PROFILE_TOKEN.encode("utf-8")
+    )
+
+
+class ProfilingMiddleware:
+    """Profiles requests that ask for it (or are sampled) and stores the result in profile_store.
+
+    Profiled responses carry X-Profile-Id, the id to download the profile with.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        # Requests in flight and the profiles being recorded; only touched from the event loop
+        self._in_flight = 0
+        self._active: dict[int, Profile] = {}
+
+    def _wanted(self, scope) -> bool:
+        for name, value in scope["headers"]:
+            if name == PROFILE_HEADER.encode():
+                return authorized(value.decode("latin-1"))
+        return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        self._in_flight += 1
+        for active in self._active.values():
+            active.concurrent_requests = max(active.concurrent_requests, self._in_flight - 1)
+        try:
+            await self._profile(scope, receive, send)
+        finally:
+            self._in_flight -= 1
+
+    async def _profile(self, scope, receive, send):
+        if scope["path"].startswith("/debug/profiles") or not self._wanted(scope):
+            return await self.app(scope, receive, send)
+        started = profile_store.start(scope["method"], scope["path"])
+        if started is None:
+            return await self.app(scope, receive, send)
+        profile, stop = started
+        profile.concurrent_requests = self._in_flight - 1
+        self._active[profile.id] = profile
+        start = time.perf_counter()
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                profile.status = message["status"]
+                message.setdefault("headers", [])
+                message["headers"] = [*message["headers"], (b"x-profile-id", str(profile.id).encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            stop()
+            del self._active[profile.id]
+            profile.duration_ms = round(1000 * (time.perf_counter() - start), 1)
+            profile_store.add(profile)
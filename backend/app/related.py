@@ -0,0 +1,249 @@
+# app/related.py
+import os
+import re
+import threading
+import time
+from collections import Counter, OrderedDict
+import numpy as np
+from sqlalchemy.orm import Session
+from app import models
+
+# --- Per-user BM25 index for "related notes", kept in memory of each worker process ---
+# Memory budget for all loaded user indexes; the least recently used users are dropped first
+RELATED_INDEX_MAX_BYTES = int(os.getenv("RELATED_INDEX_MAX_BYTES", str(256 * 1024 * 1024)))
+# Rebuild an index from the database after this long, picking up writes made by other workers
+RELATED_INDEX_TTL_SECONDS = float(os.getenv("RELATED_INDEX_TTL_SECONDS", "600"))
+# Number of a note's most distinctive terms used as the query when looking for related notes
+RELATED_QUERY_TERMS = int(os.getenv("RELATED_QUERY_TERMS", "40"))
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+TOKEN_RE = re.compile(r"[a-z0-9]{2,}")
+STOPWORDS = frozenset(
+    "a an and are as at be been but by can could did do does for from had has have he her his how i if in into "
+    "is it its just me more most my no not of on or our she so some such than that the their them then there "
+    "these they this those to too very was we were what when where which who will with would you your".split()
+)
+
+
+def tokenize(text: str) -> list[str]:
+    return [t for t in TOKEN_RE.findall(text.lower()) if t not in STOPWORDS]
+
+
+def note_terms(note) -> Counter:
+    return Counter(tokenize(" ".join(filter(None, (note.name, note.summary, note.content)))))
+
+
+class UserIndex:
+    """Inverted index over one user's notes stored as parallel COO arrays (doc row, term id, term frequency).
+
+    New and updated notes are appended to a pending list and merged on the next
+    query; removed notes are masked out and dropped when enough of them pile up.
+    """
+
+    def __init__(self):
+        self.vocab: dict[str, int] = {}
+        self.rows: dict[int, int] = {}  # note id -> document row
+        self.note_ids = np.zeros(0, dtype=np.int64)
+        self.doc_len = np.zeros(0, dtype=np.float32)
+        self.alive = np.zeros(0, dtype=bool)
+        self.post_doc = np.zeros(0, dtype=np.int32)
+        self.post_term = np.zeros(0, dtype=np.int32)
+        self.post_tf = np.zeros(0, dtype=np.float32)
+        self._pending: list[tuple[int, int, np.ndarray, np.ndarray]] = []
+        self.built_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def add(self, note_id: int, terms: Counter):
+        self.remove(note_id)
+        term_ids = np.fromiter(
+            (self.vocab.setdefault(term, len(self.vocab)) for term in terms), dtype=np.int32, count=len(terms)
+        )
+        tfs = np.fromiter(terms.values(), dtype=np.float32, count=len(terms))
+        row = len(self.note_ids) + len(self._pending)
+        self.rows[note_id] = row
+        self._pending.append((note_id, row, term_ids, tfs))
+
+    def remove(self, note_id: int):
+        row = self.rows.pop(note_id, None)
+        if row is None:
+            return
+        if row < len(self.alive):
+            self.alive[row] = False
+        else:
+            self._pending = [p for p in self._pending if p[0] != note_id]
+            # Rows of later pending notes shift down by one
+            for i, (nid, r, term_ids, tfs) in enumerate(self._pending):
+                if r > row:
+                    self._pending[i] = (nid, r - 1, term_ids, tfs)
+                    self.rows[nid] = r - 1
+
+    def _merge(self):
+        if self._pending:
+            self.note_ids = np.concatenate([self.note_ids, [p[0] for p in self._pending]])
+            self.doc_len = np.concatenate([self.doc_len, [p[3].sum() for p in self._pending]]).astype(np.float32)
+            self.alive = np.concatenate([self.alive, np.ones(len(self._pending), dtype=bool)])
+            self.post_doc = np.concatenate(
+                [self.post_doc, *(np.full(len(p[2]), p[1], dtype=np.int32) for p in self._pending)]
+            )
+            self.post_term = np.concatenate([self.post_term, *(p[2] for p in self._pending)])
+            self.post_tf = np.concatenate([self.post_tf, *(p[3] for p in self._pending)])
+            self._pending = []
+        dead = len(self.alive) - int(self.alive.sum())
+        if dead and dead * 4 > len(self.alive):
+            self._compact()
+
+    def _compact(self):
+        keep = self.alive
+        new_row = np.cumsum(keep, dtype=np.int64) - 1
+        posting_keep = keep[self.post_doc]
+        self.post_doc = new_row[self.post_doc[posting_keep]].astype(np.int32)
+        self.post_term = self.post_term[posting_keep]
+        self.post_tf = self.post_tf[posting_keep]
+        self.note_ids = self.note_ids[keep]
+        self.doc_len = self.doc_len[keep]
+        self.alive = np.ones(len(self.note_ids), dtype=bool)
+        self.rows = {int(note_id): row for row, note_id in enumerate(self.note_ids)}
+
+    def _idf(self, term_ids: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Return (posting mask for term_ids among live notes, idf indexed by position in term_ids)."""
+        mask = np.isin(self.post_term, term_ids) & self.alive[self.post_doc]
+        position = np.searchsorted(term_ids, self.post_term[mask])
+        df = np.bincount(position, minlength=len(term_ids))
+        n = float(self.alive.sum())
+        return mask, np.log1p((n - df + 0.5) / (df + 0.5))
+
+    def score(self, weights: dict[int, float]) -> np.ndarray:
+        """BM25 score of every document row for a weighted bag of term ids."""
+        self._merge()
+        if not weights or not self.alive.any():
+            return np.zeros(len(self.note_ids), dtype=np.float32)
+        order = sorted(weights)
+        term_ids = np.array(order, dtype=np.int32)
+        query_weight = np.array([weights[t] for t in order], dtype=np.float32)
+        mask, idf = self._idf(term_ids)
+        docs, tf = self.post_doc[mask], self.post_tf[mask]
+        position = np.searchsorted(term_ids, self.post_term[mask])
+        avg_len = float(self.doc_len[self.alive].mean()) or 1.0
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_len[docs] / avg_len)
+        contrib = query_weight[position] * idf[position] * tf * (BM25_K1 + 1) / (tf + norm)
+        return np.bincount(docs, weights=contrib, minlength=len(self.note_ids))
+
+    def top(self, scores: np.ndarray, limit: int, exclude: int | None = None) -> list[tuple[int, float]]:
+        scores = np.where(self.alive, scores, 0)
+        if exclude is not None and exclude in self.rows:
+            scores[self.rows[exclude]] = 0
+        candidates = np.flatnonzero(scores > 0)
+        if len(candidates) > limit:
+            candidates = candidates[np.argpartition(-scores[candidates], limit)[:limit]]
+        candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return [(int(self.note_ids[row]), round(float(scores[row]), 4)) for row in candidates]
+
+    def query(self, text: str, limit: int) -> list[tuple[int, float]]:
+        terms = Counter(tokenize(text))
+        weights = {self.vocab[t]: float(count) for t, count in terms.items() if t in self.vocab}
+        return self.top(self.score(weights), limit)
+
+    def related(self, note_id: int, limit: int) -> list[tuple[int, float]]:
+        self._merge()
+        row = self.rows.get(note_id)
+        if row is None:
+            return []
+        own = self.post_doc == row
+        term_ids, tfs = self.post_term[own], self.post_tf[own]
+        if not len(term_ids):
+            return []
+        # Query with the note's most distinctive terms, weighted by tf-idf
+        order = np.argsort(term_ids)
+        term_ids, tfs = term_ids[order], tfs[order]
+        _, idf = self._idf(term_ids)
+        weight = tfs * idf
+        best = np.argsort(-weight, kind="stable")[:RELATED_QUERY_TERMS]
+        weights = {int(term_ids[i]): float(weight[i] / weight[best[0]]) for i in best if weight[i] > 0}
+        return self.top(self.score(weights), limit, exclude=note_id)
+
+    @property
+    def nbytes(self) -> int:
+        arrays = (self.note_ids, self.doc_len, self.alive, self.post_doc, self.post_term, self.post_tf)
+        pending = sum(p[2].nbytes + p[3].nbytes for p in self._pending)
+        # Rough per-entry cost of the Python dicts
+        return sum(a.nbytes for a in arrays) + pending + 80 * (len(self.vocab) + len(self.rows))
+
+
+class RelatedIndex:
+    """LRU of per-user indexes, built lazily from the database and kept under RELATED_INDEX_MAX_BYTES."""
+
+    def __init__(self, max_bytes: int = RELATED_INDEX_MAX_BYTES, ttl: float = RELATED_INDEX_TTL_SECONDS):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._users: OrderedDict[int, UserIndex] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _build(self, db: Session, user_id: int) -> UserIndex:
+        index = UserIndex()
+        notes = (
+            db.query(models.Note.id, models.Note.name, models.Note.summary, models.Note.content)
+            .filter(models.Note.user_id == user_id)
+            .yield_per(500)
+        )
+        for note in notes:
+            index.add(note.id, note_terms(note))
+        index._merge()
+        return index
+
+    def get(self, db: Session, user_id: int) -> UserIndex:
+        with self._lock:
+            index = self._users.get(user_id)
+            if index is not None and time.monotonic() - index.built_at < self.ttl:
+                self._users.move_to_end(user_id)
+                return index
+        index = self._build(db, user_id)
+        with self._lock:
+            self._users[user_id] = index
+            self._users.move_to_end(user_id)
+            self._evict()
+        return index
+
+    def _evict(self):
+        total = sum(index.nbytes for index in self._users.values())
+        # Always keep the most recently used index, even if it alone exceeds the budget
+        while total > self.max_bytes and len(self._users) > 1:
+            _, index = self._users.popitem(last=False)
+            total -= index.nbytes
+
+    def note_saved(self, note):
+        """Reindex a created or updated note if its owner's index is loaded."""
+        with self._lock:
+            index = self._users.get(note.user_id)
+        if index is not None:
+            terms = note_terms(note)
+            with index.lock:
+                index.add(note.id, terms)
+
+    def note_deleted(self, user_id: int, note_id: int):
+        with self._lock:
+            index = self._users.get(user_id)
+        if index is not None:
+            with index.lock:
+                index.remove(note_id)
+
+    def related(self, db: Session, user_id: int, note_id: int, limit: int) -> list[tuple[int, float]]:
+        index = self.get(db, user_id)
+        with index.lock:
+            return index.related(note_id, limit)
+
+    def query(self, db: Session, user_id: int, text: str, limit: int) -> list[tuple[int, float]]:
+        index = self.get(db, user_id)
+        with index.lock:
+            return index.query(text, limit)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "users": len(self._users),
+                "bytes": sum(index.nbytes for index in self._users.values()),
+                "max_bytes": self.max_bytes,
+            }
+
+
+related_index = RelatedIndex()
@@ -2,14 +2,35 @@
 from pydantic import BaseModel
 from pydantic import model_validator
 from typing import Optional
+from datetime import date, datetime
+
+class TagBase(BaseModel):
+    name: str
+    color: Optional[str] = "#D1D5DB"  # Default color
+
+class TagCreate(TagBase):
+    pass
+
+class Tag(TagBase):
+    id: int
+    user_id: int
+
+    class Config:
+        orm_mode = True
+
+class TagFacet(BaseModel):
+    id: int
+    name: str
+    color: Optional[str] = None
+    note_count: int
 
 class NoteBase(BaseModel):
     name: str
     content: str
     summary: str
     action_items: str
-    created_at: Optional[str] = None
-    updated_at: Optional[str] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
 
 class NoteCreate(NoteBase):
     pass
@@ -17,32 +38,43 @@ class NoteCreate(NoteBase):
 class Note(NoteBase):
     id: int
     user_id: int
+    tags: list[Tag] = []
 
     class Config:
         orm_mode = True
 
+class NoteSearchResult(Note):
+    rank: float = 0.0
+    snippet: Optional[str] = None
+
+class RelatedNote(BaseModel):
+    id: int
+    name: str
+    summary: str
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    score: float
+
+class NoteListItem(BaseModel):
+    """A note in GET /notes/ results; only the fields that were requested are present."""
+    id: int
+    user_id: Optional[int] = None
+    name: Optional[str] = None
+    content: Optional[str] = None
+    summary: Optional[str] = None
+    action_items: Optional[str] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    tags: Optional[list[Tag]] = None
+
 class NoteUpdate(BaseModel):
     name: str | None = None
     content: str | None = None
     summary: str | None = None
     action_items: str | None = None
     include_action_items: Optional[bool] = True
-    created_at: Optional[str] = None
-    updated_at: Optional[str] = None
-
-    class Config:
-        orm_mode = True
-
-class TagBase(BaseModel):
-    name: str
-    color: Optional[str] = "#D1D5DB"  # Default color
-
-class TagCreate(TagBase):
-    pass
-
-class Tag(TagBase):
-    id: int
-    user_id: int
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
 
     class Config:
         orm_mode = True
@@ -76,9 +108,10 @@ class UpdateAPIKey(BaseModel):
     new_key: str
 
 class ApiUsageBase(BaseModel):
-    usage_date: str
+    usage_date: datetime
     input_tokens: int = 0
     output_tokens: int = 0
+    cache_hit: bool = False
 
 class ApiUsageCreate(ApiUsageBase):
     user_id: int
@@ -90,4 +123,56 @@ class ApiUsage(ApiUsageBase):
     note_id: Optional[int] = None
 
     class Config:
-        orm_mode = True
\ No newline at end of file
+        orm_mode = True
+
+class UsageTotals(BaseModel):
+    requests: int = 0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cache_hits: int = 0
+
+class UsageBucket(UsageTotals):
+    period_start: date
+
+class UsageSummary(BaseModel):
+    period: str
+    start: Optional[date] = None
+    end: Optional[date] = None
+    totals: UsageTotals
+    buckets: list[UsageBucket]
+
+class NoteUsage(BaseModel):
+    note_id: Optional[int] = None
+    requests: int
+    input_tokens: int
+    output_tokens: int
+    first_used: Optional[datetime] = None
+    last_used: Optional[datetime] = None
+
+class JobStage(BaseModel):
+    name: str
+    status: str
+    cached: bool = False
+    duration_ms: Optional[float] = None
+
+class Job(BaseModel):
+    id: str
+    status: str
+    progress: float
+    stages: list[JobStage]
+    error: Optional[str] = None
+    status_code: Optional[int] = None
+    note: Optional[Note] = None
+
+class BatchUploadResult(BaseModel):
+    index: int
+    filename: str
+    status: str
+    status_code: Optional[int] = None
+    error: Optional[str] = None
+    note: Optional[Note] = None
+
+class BatchUpload(BaseModel):
+    created: int
+    failed: int
+    results: list[BatchUploadResult]
@@ -0,0 +1,169 @@
+# app/search.py
+import html
+import os
+from sqlalchemy import inspect, text
+from sqlalchemy.orm import Session, selectinload
+from app import models
+
+# --- Full-text search over note name, summary, action items and content ---
+# Postgres uses a generated tsvector column with a GIN index; SQLite uses an FTS5 table kept in sync by triggers.
+SEARCH_LANGUAGE = os.getenv("SEARCH_LANGUAGE", "english")
+SEARCH_MAX_RESULTS = int(os.getenv("SEARCH_MAX_RESULTS", "50"))
+SNIPPET_START, SNIPPET_STOP = "<mark>", "</mark>"
+# Private-use characters the database wraps matches in; swapped for the tags once the snippet is escaped
+_MATCH_START, _MATCH_STOP = "\ue000", "\ue001"
+# Only the start of very long notes is indexed: a tsvector cannot exceed 1 MB
+PG_INDEXED_CONTENT_CHARS = 250_000
+
+# Name matches rank highest, then summary and action items, then the body
+PG_SEARCH_VECTOR = (
+    f"setweight(to_tsvector('{SEARCH_LANGUAGE}', coalesce(name, '')), 'A') || "
+    f"setweight(to_tsvector('{SEARCH_LANGUAGE}', coalesce(summary, '')), 'B') || "
+    f"setweight(to_tsvector('{SEARCH_LANGUAGE}', coalesce(action_items, '')), 'B') || "
+    f"setweight(to_tsvector('{SEARCH_LANGUAGE}', left(coalesce(content, ''), {PG_INDEXED_CONTENT_CHARS})), 'C')"
+)
+
+SQLITE_FTS_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS notes_fts USING fts5(
+        name, summary, action_items, content, content='notes', content_rowid='id', tokenize='porter unicode61'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS notes_fts_insert AFTER INSERT ON notes BEGIN
+        INSERT INTO notes_fts(rowid, name, summary, action_items, content)
+        VALUES (new.id, new.name, new.summary, new.action_items, new.content);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS notes_fts_delete AFTER DELETE ON notes BEGIN
+        INSERT INTO notes_fts(notes_fts, rowid, name, summary, action_items, content)
+        VALUES ('delete', old.id, old.name, old.summary, old.action_items, old.content);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS notes_fts_update AFTER UPDATE ON notes BEGIN
+        INSERT INTO notes_fts(notes_fts, rowid, name, summary, action_items, content)
+        VALUES ('delete', old.id, old.name, old.summary, old.action_items, old.content);
+        INSERT INTO notes_fts(rowid, name, summary, action_items, content)
+        VALUES (new.id, new.name, new.summary, new.action_items, new.content);
+    END""",
+]
+
+
+def create_search_index(conn):
+    """Create the search column/index (Postgres) or FTS table and triggers (SQLite) if missing."""
+    dialect = conn.dialect.name
+    if dialect == "postgresql":
+        columns = {c["name"] for c in inspect(conn).get_columns("notes")}
+        if "search_vector" not in columns:
+            conn.execute(text(
+                f"ALTER TABLE notes ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ({PG_SEARCH_VECTOR}) STORED"
+            ))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_notes_search_vector ON notes USING gin (search_vector)"))
+    elif dialect == "sqlite":
+        created = not inspect(conn).has_table("notes_fts")
+        for statement in SQLITE_FTS_DDL:
+            conn.execute(text(statement))
+        if created:
+            # Index notes that existed before the FTS table
+            conn.execute(text("INSERT INTO notes_fts(notes_fts) VALUES ('rebuild')"))
+
+
+def _fts5_query(query: str) -> str:
+    """Quote each term so user input cannot use FTS5 syntax; the last term also matches as a prefix."""
+    terms = ['"' + term.replace('"', '""') + '"' for term in query.split()]
+    if terms:
+        terms[-1] += "*"
+    return " ".join(terms)
+
+
+def _highlight(snippet: str | None) -> str | None:
+    """HTML-escape a snippet from the database, then mark its matches with SNIPPET_START/SNIPPET_STOP."""
+    if snippet is None:
+        return None
+    return html.escape(snippet).replace(_MATCH_START, SNIPPET_START).replace(_MATCH_STOP, SNIPPET_STOP)
+
+
+def _search_postgres(db: Session, query: str, user_id: int, limit: int) -> list[tuple[int, float, str]]:
+    # ts_headline re-parses the document, so only run it on the page of top-ranked rows
+    rows = db.execute(
+        text(f"""
+            WITH q AS (SELECT websearch_to_tsquery('{SEARCH_LANGUAGE}', :query) AS tsq),
+            top AS (
+                SELECT notes.id, ts_rank_cd(notes.search_vector, q.tsq) AS rank
+                FROM notes, q
+                WHERE notes.user_id = :user_id AND notes.search_vector @@ q.tsq
+                ORDER BY rank DESC, notes.id DESC
+                LIMIT :limit
+            )
+            SELECT top.id, top.rank, ts_headline(
+                '{SEARCH_LANGUAGE}',
+                coalesce(notes.summary, '') || ' ' || left(coalesce(notes.content, ''), {PG_INDEXED_CONTENT_CHARS}),
+                q.tsq,
+                :options
+            )
+            FROM top JOIN notes ON notes.id = top.id, q
+            ORDER BY top.rank DESC, top.id DESC
+        """),
+        {
+            "query": query, "user_id": user_id, "limit": limit,
+            "options": f"StartSel={_MATCH_START}, StopSel={_MATCH_STOP}, MaxWords=30, MinWords=10, MaxFragments=2",
+        },
+    )
+    return [(row[0], float(row[1]), _highlight(row[2])) for row in rows]
+
+
+def _search_sqlite(db: Session, query: str, user_id: int, limit: int) -> list[tuple[int, float, str]]:
+    match = _fts5_query(query)
+    if not match:
+        return []
+    rows = db.execute(
+        text(f"""
+            SELECT notes_fts.rowid, bm25(notes_fts, 10.0, 4.0, 4.0, 1.0) AS rank,
+                   snippet(notes_fts, -1, :start, :stop, '…', 16)
+            FROM notes_fts JOIN notes ON notes.id = notes_fts.rowid
+            WHERE notes_fts MATCH :match AND notes.user_id = :user_id
+            ORDER BY rank, notes_fts.rowid DESC
+            LIMIT :limit
+        """),
+        {"match": match, "user_id": user_id, "limit": limit, "start": _MATCH_START, "stop": _MATCH_STOP},
+    )
+    # bm25() is lower-is-better; flip it so every backend returns higher-is-better
+    return [(row[0], -float(row[1]), _highlight(row[2])) for row in rows]
+
+
+def _search_like(db: Session, query: str, user_id: int, limit: int) -> list[tuple[int, float, str]]:
+    pattern = f"%{query}%"
+    ids = (
+        db.query(models.Note.id)
+        .filter(
+            models.Note.user_id == user_id,
+            models.Note.name.ilike(pattern)
+            | models.Note.summary.ilike(pattern)
+            | models.Note.action_items.ilike(pattern)
+            | models.Note.content.ilike(pattern),
+        )
+        .order_by(models.Note.id.desc())
+        .limit(limit)
+    )
+    return [(note_id, 0.0, None) for (note_id,) in ids]
+
+
+def search_notes(db: Session, query: str, user_id: int, limit: int = SEARCH_MAX_RESULTS) -> list[dict]:
+    """Ranked search over a user's notes. Returns note fields plus rank and a highlighted snippet:
+    HTML-escaped note text with matches wrapped in SNIPPET_START/SNIPPET_STOP."""
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        hits = _search_postgres(db, query, user_id, limit)
+    elif dialect == "sqlite":
+        hits = _search_sqlite(db, query, user_id, limit)
+    else:
+        hits = _search_like(db, query, user_id, limit)
+    if not hits:
+        return []
+    notes = {
+        note.id: note
+        for note in db.query(models.Note)
+        .options(selectinload(models.Note.tags))
+        .filter(models.Note.id.in_([h[0] for h in hits]))
+    }
+    columns = [column.name for column in models.Note.__table__.columns] + ["tags"]
+    return [
+        {**{name: getattr(notes[note_id], name) for name in columns}, "rank": rank, "snippet": snippet}
+        for note_id, rank, snippet in hits
+        if note_id in notes
+    ]
@@ -1,66 +1,476 @@
+import asyncio
+import hashlib
+import logging
 import os
-from openai import OpenAI
+import random
+import re
+import time
+import weakref
+from collections import OrderedDict
+from typing import AsyncIterator
+from openai import (
+    AsyncOpenAI,
+    APIConnectionError,
+    APIStatusError,
+    APITimeoutError,
+    AuthenticationError,
+    BadRequestError,
+    InternalServerError,
+    NotFoundError,
+    PermissionDeniedError,
+    RateLimitError,
+)
+from app.metrics import add_timing, openai_retries, openai_seconds, openai_tokens
 
+logger = logging.getLogger(__name__)
 
-def summarize_text(text: str, user_openai_api_key: str, include_action_items: bool = True) -> tuple[str, str, int, int]:
+MODEL = os.getenv("OPENAI_MODEL", "gpt-4.1-nano")
+# Bump whenever the prompts below change so cached summaries are not reused
+PROMPT_VERSION = "2"
+# Context windows by model prefix, longest prefix first; unknown models are assumed to have 128k
+MODEL_CONTEXT_TOKENS = {
+    "gpt-4.1": 1_047_576,
+    "gpt-4o": 128_000,
+    "gpt-4-turbo": 128_000,
+    "gpt-3.5-turbo": 16_385,
+    "o1": 200_000,
+    "o3": 200_000,
+    "o4": 200_000,
+}
+
+
+def context_tokens(model: str) -> int:
+    return next((size for prefix, size in MODEL_CONTEXT_TOKENS.items() if model.startswith(prefix)), 128_000)
+
+
+# Documents estimated above this many tokens are summarized chunk by chunk. Defaults to a quarter of
+# the model's context (leaving room for the prompt and the reply), capped so one call stays reasonably fast
+SUMMARY_CHUNK_TOKENS = int(os.getenv("SUMMARY_CHUNK_TOKENS") or min(context_tokens(MODEL) // 4, 100_000))
+# Concurrent chunk requests allowed per OpenAI key, across all of that user's uploads
+SUMMARY_USER_CONCURRENCY = int(os.getenv("SUMMARY_USER_CONCURRENCY", "4"))
+
+# Point at any OpenAI-compatible server, e.g. a local fake for tests and benchmarks
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "60"))
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "4"))
+OPENAI_BACKOFF_BASE = float(os.getenv("OPENAI_BACKOFF_BASE", "0.5"))
+OPENAI_BACKOFF_MAX = float(os.getenv("OPENAI_BACKOFF_MAX", "20"))
+# Clients (and their connection pools) are kept per API key
+OPENAI_CLIENT_CACHE_SIZE = int(os.getenv("OPENAI_CLIENT_CACHE_SIZE", "256"))
+OPENAI_CLIENT_IDLE_SECONDS = float(os.getenv("OPENAI_CLIENT_IDLE_SECONDS", "600"))
+
+RETRYABLE_ERRORS = (RateLimitError, APITimeoutError, APIConnectionError, InternalServerError)
+
+
+class SummarizerUnavailable(Exception):
+    """OpenAI could not be reached or kept rate limiting us after all retries."""
+
+    def __init__(self, detail: str, status_code: int = 503, retry_after: float | None = None):
+        super().__init__(detail)
+        self.detail = detail
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+SUMMARY_PROMPT = (
+    "Summarize this note clearly and concisely. "
+    "Do not include action items."
+)
+ACTION_ITEMS_INSTRUCTIONS = (
+    "Then, extract a list of action items and follow the response format strictly. Do not number the action items."
+    "Format the response as:\n\n"
+    "Summary:\n<summary here>\n\n"
+    "Action Items:\n- item 1\n- item 2\n- item 3"
+)
+ACTION_ITEMS_PROMPT = "Summarize this note clearly and concisely. " + ACTION_ITEMS_INSTRUCTIONS
+CHUNK_PROMPT = (
+    "You are summarizing one section of a longer document. "
+    "Summarize this section clearly and concisely, keeping names, numbers and decisions. "
+)
+REDUCE_PROMPT = (
+    "The following are summaries of consecutive sections of one document. "
+    "Merge them into a single clear and concise summary of the whole document. "
+    "Do not include action items."
+)
+
+_user_slots = weakref.WeakValueDictionary()
+# key hash -> (client, last used); ordered from least to most recently used
+_clients: OrderedDict[str, tuple[AsyncOpenAI, float]] = OrderedDict()
+
+
+def require_api_key(user_openai_api_key: str | None):
     if not user_openai_api_key or not user_openai_api_key.strip():
         raise ValueError("No OpenAI API key found. Please add your key in your profile settings.")
-    client = OpenAI(api_key=user_openai_api_key)
+
+
+def _key_hash(user_openai_api_key: str) -> str:
+    return hashlib.sha256(user_openai_api_key.encode("utf-8")).hexdigest()
+
+
+def _slots_for(user_openai_api_key: str) -> asyncio.Semaphore:
+    key = _key_hash(user_openai_api_key)
+    slots = _user_slots.get(key)
+    if slots is None:
+        slots = asyncio.Semaphore(SUMMARY_USER_CONCURRENCY)
+        _user_slots[key] = slots
+    return slots
+
+
+def get_client(user_openai_api_key: str) -> AsyncOpenAI:
+    """Return a pooled client for this key, evicting idle and least recently used clients."""
+    key = _key_hash(user_openai_api_key)
+    now = time.monotonic()
+    entry = _clients.pop(key, None)
+    client = entry[0] if entry else AsyncOpenAI(
+        api_key=user_openai_api_key,
+        base_url=OPENAI_BASE_URL,
+        timeout=OPENAI_TIMEOUT,
+        max_retries=0,  # retries are handled by _complete with jittered backoff
+    )
+    _clients[key] = (client, now)
+    evicted = []
+    while len(_clients) > OPENAI_CLIENT_CACHE_SIZE:
+        evicted.append(_clients.popitem(last=False)[1][0])
+    while _clients:
+        oldest_key, (oldest, last_used) = next(iter(_clients.items()))
+        if now - last_used < OPENAI_CLIENT_IDLE_SECONDS:
+            break
+        del _clients[oldest_key]
+        evicted.append(oldest)
+    loop = asyncio.get_running_loop()
+    for stale in evicted:
+        # Give requests still using the evicted client time to finish before closing its pool
+        loop.call_later(OPENAI_TIMEOUT, lambda c=stale: loop.create_task(c.close()))
+    return client
+
+
+async def close_clients():
+    while _clients:
+        client, _ = _clients.popitem()[1]
+        await client.close()
+
+
+def estimate_tokens(text: str) -> int:
+    # Roughly four characters per token for English text
+    return len(text) // 4 + 1
+
+
+def _is_heading(paragraph: str) -> bool:
+    line = paragraph.strip()
+    return "\n" not in line and len(line) < 80 and (
+        line.startswith("#") or line.isupper() or re.match(r"^(\d+(\.\d+)*|[IVX]+)[.)]?\s+\S", line) is not None
+    )
+
+
+def _split_oversized(paragraph: str, budget: int) -> list[str]:
+    """Split a paragraph that alone exceeds the budget on sentence ends, then hard-wrap."""
+    max_chars = budget * 4
+    pieces, current = [], ""
+    for sentence in re.split(r"(?<=[.!?])\s+", paragraph):
+        while len(sentence) > max_chars:
+            pieces.append(sentence[:max_chars])
+            sentence = sentence[max_chars:]
+        if current and len(current) + len(sentence) + 1 > max_chars:
+            pieces.append(current)
+            current = ""
+        current = f"{current} {sentence}" if current else sentence
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def split_text(text: str, budget: int = SUMMARY_CHUNK_TOKENS) -> list[str]:
+    """Split text into chunks of at most ~budget tokens on paragraph and section boundaries."""
+    chunks, current, current_tokens = [], [], 0
+    for paragraph in re.split(r"\n\s*\n", text):
+        if not paragraph.strip():
+            continue
+        tokens = estimate_tokens(paragraph)
+        # Start a new chunk at a heading once the current one is reasonably full
+        starts_section = _is_heading(paragraph) and current_tokens > budget // 2
+        if current and (current_tokens + tokens > budget or starts_section):
+            chunks.append("\n\n".join(current))
+            current, current_tokens = [], 0
+        if tokens > budget:
+            pieces = _split_oversized(paragraph, budget)
+            chunks.extend(pieces[:-1])
+            paragraph, tokens = pieces[-1], estimate_tokens(pieces[-1])
+        current.append(paragraph)
+        current_tokens += tokens
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+
+def _backoff(attempt: int, retry_after: float | None) -> float:
+    delay = random.uniform(0, min(OPENAI_BACKOFF_MAX, OPENAI_BACKOFF_BASE * 2 ** attempt))
+    return max(delay, retry_after or 0)
+
+
+def _retry_after(error: Exception) -> float | None:
+    response = getattr(error, "response", None)
     try:
-        if include_action_items:
-            response = client.chat.completions.create(
-                model="gpt-4.1-nano",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": (
-                            "Summarize this note clearly and concisely. "
-                            "Then, extract a list of action items and follow the response format strictly. Do not number the action items."
-                            "Format the response as:\n\n"
-                            "Summary:\n<summary here>\n\n"
-                            "Action Items:\n- item 1\n- item 2\n- item 3"
-                        )
-                    },
-                    {"role": "user", "content": text}
-                ],
-                temperature=0.7,
-            )
-        else:
-            response = client.chat.completions.create(
-                model="gpt-4.1-nano",
+        return float(response.headers.get("retry-after")) if response is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _error_message(e: APIStatusError) -> str:
+    """The message OpenAI returned, without the status code and raw body the SDK prefixes."""
+    body = e.body if isinstance(e.body, dict) else {}
+    return body.get("message") or e.message
+
+
+async def _create(client: AsyncOpenAI, system_prompt: str, text: str, **kwargs):
+    """Start a chat completion, retrying transient failures. Streams are only retried before the first token."""
+    mode = "stream" if kwargs.get("stream") else "complete"
+    for attempt in range(OPENAI_MAX_RETRIES + 1):
+        start = time.perf_counter()
+        try:
+            response = await client.chat.completions.create(
+                model=MODEL,
                 messages=[
-                    {
-                        "role": "system",
-                        "content": (
-                            "Summarize this note clearly and concisely. "
-                            "Do not include action items."
-                        )
-                    },
+                    {"role": "system", "content": system_prompt},
                     {"role": "user", "content": text}
                 ],
                 temperature=0.7,
+                **kwargs,
             )
-        # Capture token usage
-        usage = response.usage
-        prompt_tokens = usage.prompt_tokens
-        completion_tokens = usage.completion_tokens
-    except Exception as e:
-        raise ValueError("Invalid or missing OpenAI API key.") from e
-    
-    content = response.choices[0].message.content
+            elapsed = time.perf_counter() - start
+            openai_seconds.observe(elapsed, mode=mode)
+            add_timing("openai", elapsed)
+            return response
+        except AuthenticationError as e:
+            raise ValueError("Invalid or missing OpenAI API key.") from e
+        except PermissionDeniedError as e:
+            raise ValueError(f"Your OpenAI API key is not allowed to use {MODEL}: {_error_message(e)}") from e
+        except RateLimitError as e:
+            if getattr(e, "code", None) == "insufficient_quota":
+                raise ValueError("Your OpenAI API key has run out of credits.") from e
+            if attempt == OPENAI_MAX_RETRIES:
+                raise SummarizerUnavailable(
+                    "OpenAI rate limit reached. Please try again shortly.", 429, _retry_after(e)
+                ) from e
+            openai_retries.inc(reason="rate_limit")
+            await asyncio.sleep(_backoff(attempt, _retry_after(e)))
+        except RETRYABLE_ERRORS as e:
+            if attempt == OPENAI_MAX_RETRIES:
+                status = 504 if isinstance(e, APITimeoutError) else 503
+                raise SummarizerUnavailable("OpenAI is not responding. Please try again later.", status) from e
+            openai_retries.inc(reason="timeout" if isinstance(e, APITimeoutError) else "unavailable")
+            await asyncio.sleep(_backoff(attempt, None))
+        except BadRequestError as e:
+            if getattr(e, "code", None) == "context_length_exceeded":
+                raise ValueError("The note is too long for the summarization model.") from e
+            raise ValueError(f"OpenAI rejected the request: {_error_message(e)}") from e
+        except NotFoundError as e:
+            raise ValueError(f"OpenAI model {MODEL} is not available: {_error_message(e)}") from e
+        except APIStatusError as e:
+            logger.warning("OpenAI request failed with status %s: %s", e.status_code, e.message)
+            raise SummarizerUnavailable(f"OpenAI request failed: {_error_message(e)}", 502) from e
+
+
+def _count_tokens(prompt_tokens: int, completion_tokens: int):
+    openai_tokens.inc(prompt_tokens, type="input")
+    openai_tokens.inc(completion_tokens, type="output")
+
+
+async def _complete(client: AsyncOpenAI, system_prompt: str, text: str) -> tuple[str, int, int]:
+    response = await _create(client, system_prompt, text)
+    # Capture token usage
+    usage = response.usage
+    _count_tokens(usage.prompt_tokens, usage.completion_tokens)
+    return response.choices[0].message.content, usage.prompt_tokens, usage.completion_tokens
+
+
+def _action_item(line: str) -> str:
+    """An action item line without its bullet; shared with SectionParser so streamed items match saved ones."""
+    return line.strip().removeprefix("- ").strip()
+
+
+def _parse(content: str) -> tuple[str, str]:
+    summary, _, items = content.partition(SectionParser.ACTION_ITEMS_MARKER)
+    summary = summary.strip().removeprefix(SectionParser.SUMMARY_MARKER).strip()
+    action_items = "\n".join(item for item in map(_action_item, items.splitlines()) if item)
+    return summary, action_items
+
+
+def _merge_action_items(item_lists: list[str]) -> str:
+    """Concatenate action items from every chunk, dropping case/whitespace duplicates."""
+    seen, merged = set(), []
+    for items in item_lists:
+        for item in items.splitlines():
+            item = item.strip()
+            key = " ".join(item.lower().split()).rstrip(".")
+            if item and key not in seen:
+                seen.add(key)
+                merged.append(item)
+    return "\n".join(merged)
+
+
+async def _map_chunks(
+    client: AsyncOpenAI, text: str, user_openai_api_key: str, include_action_items: bool
+) -> tuple[str, str, int, int]:
+    """Summarize chunks concurrently. Returns (combined section summaries, merged action items, tokens in, tokens out)."""
+    chunks = split_text(text, SUMMARY_CHUNK_TOKENS)
+    chunk_prompt = CHUNK_PROMPT + (ACTION_ITEMS_INSTRUCTIONS if include_action_items else "Do not include action items.")
+    slots = _slots_for(user_openai_api_key)
+
+    async def summarize_chunk(chunk: str) -> tuple[str, int, int]:
+        async with slots:
+            return await _complete(client, chunk_prompt, chunk)
+
+    results = await asyncio.gather(*(summarize_chunk(chunk) for chunk in chunks))
+
+    parsed = [_parse(r[0]) for r in results]
+    action_items = _merge_action_items([p[1] for p in parsed]) if include_action_items else ""
+    combined = "\n\n".join(p[0] for p in parsed)
+    return combined, action_items, sum(r[1] for r in results), sum(r[2] for r in results)
+
+
+async def _summarize_chunked(client: AsyncOpenAI, text: str, user_openai_api_key: str, include_action_items: bool) -> tuple[str, str, int, int]:
+    combined, action_items, prompt_tokens, completion_tokens = await _map_chunks(
+        client, text, user_openai_api_key, include_action_items
+    )
+    # Reduce: merge the section summaries, recursing if they are still too long for one call
+    if estimate_tokens(combined) > SUMMARY_CHUNK_TOKENS:
+        summary, _, reduce_in, reduce_out = await _summarize_chunked(client, combined, user_openai_api_key, False)
+    else:
+        async with _slots_for(user_openai_api_key):
+            content, reduce_in, reduce_out = await _complete(client, REDUCE_PROMPT, combined)
+        summary = _parse(content)[0]
+    return summary, action_items, prompt_tokens + reduce_in, completion_tokens + reduce_out
+
+
+async def summarize_text(text: str, user_openai_api_key: str, include_action_items: bool = True) -> tuple[str, str, int, int]:
+    require_api_key(user_openai_api_key)
+    client = get_client(user_openai_api_key)
+
+    if estimate_tokens(text) > SUMMARY_CHUNK_TOKENS:
+        return await _summarize_chunked(client, text, user_openai_api_key, include_action_items)
+
+    system_prompt = ACTION_ITEMS_PROMPT if include_action_items else SUMMARY_PROMPT
+    content, prompt_tokens, completion_tokens = await _complete(client, system_prompt, text)
 
     # Test content
     # content = ("Summary: This is a summary of the note. It includes key points and important information.\n\n"
     #           "Action Items:\n- Review the document\n- Prepare for the next meeting\n- Follow up with the team")
 
-    summary = ""
-    action_items = ""
+    summary, action_items = _parse(content)
+    return summary, action_items, prompt_tokens, completion_tokens
+
+
+class SectionParser:
+    """Incrementally split a streamed "Summary: ... Action Items: - ..." completion into events."""
+
+    SUMMARY_MARKER = "Summary:"
+    ACTION_ITEMS_MARKER = "Action Items:"
+
+    def __init__(self):
+        self.content = ""
+        self._buffer = ""
+        self._in_items = False
+        self._started = False
+
+    def feed(self, delta: str) -> list[tuple[str, str]]:
+        self.content += delta
+        self._buffer += delta
+        return self._drain(final=False)
+
+    def finish(self) -> list[tuple[str, str]]:
+        return self._drain(final=True)
+
+    def _drain(self, final: bool) -> list[tuple[str, str]]:
+        events = []
+        if not self._in_items:
+            index = self._buffer.find(self.ACTION_ITEMS_MARKER)
+            if index >= 0:
+                text, self._buffer = self._buffer[:index], self._buffer[index + len(self.ACTION_ITEMS_MARKER):]
+                events += self._summary(text, final=True)
+                self._in_items = True
+            else:
+                # Hold back anything that could be the start of a marker split across deltas
+                keep = 0 if final else _partial_suffix(self._buffer, self.ACTION_ITEMS_MARKER)
+                text, self._buffer = self._buffer[:len(self._buffer) - keep], self._buffer[len(self._buffer) - keep:]
+                events += self._summary(text, final)
+        if self._in_items:
+            *lines, self._buffer = self._buffer.split("\n")
+            if final:
+                lines.append(self._buffer)
+                self._buffer = ""
+            for line in lines:
+                item = _action_item(line)
+                if item:
+                    events.append(("action_item", item))
+        return events
 
-    if "Action Items:" in content:
-        parts = content.split("Action Items:")
-        summary = parts[0].replace("Summary:", "").strip()
-        action_items = parts[1].replace("- ", "").strip()
+    def _summary(self, text: str, final: bool) -> list[tuple[str, str]]:
+        if not self._started:
+            text = text.lstrip()
+            if not final and len(text) < len(self.SUMMARY_MARKER) and self.SUMMARY_MARKER.startswith(text):
+                # Not enough text yet to tell whether it opens with the marker
+                self._buffer = text + self._buffer
+                return []
+            text = text.removeprefix(self.SUMMARY_MARKER).lstrip()
+            self._started = bool(text)
+        return [("summary", text)] if text else []
+
+
+def _partial_suffix(text: str, marker: str) -> int:
+    for size in range(min(len(marker) - 1, len(text)), 0, -1):
+        if marker.startswith(text[-size:]):
+            return size
+    return 0
+
+
+async def stream_summary(
+    text: str, user_openai_api_key: str, include_action_items: bool = True
+) -> AsyncIterator[tuple[str, object]]:
+    """Stream a summary as ("summary", delta) and ("action_item", item) events.
+
+    The last event is ("result", (summary, action_items, input_tokens, output_tokens)),
+    parsed exactly as summarize_text would have returned it.
+    """
+    require_api_key(user_openai_api_key)
+    client = get_client(user_openai_api_key)
+    prompt_tokens = completion_tokens = 0
+    action_items = None
+
+    if estimate_tokens(text) > SUMMARY_CHUNK_TOKENS:
+        # Long documents: map the chunks as usual, then stream only the reduce pass
+        combined, action_items, prompt_tokens, completion_tokens = await _map_chunks(
+            client, text, user_openai_api_key, include_action_items
+        )
+        if estimate_tokens(combined) > SUMMARY_CHUNK_TOKENS:
+            summary, _, reduce_in, reduce_out = await _summarize_chunked(client, combined, user_openai_api_key, False)
+            yield "summary", summary
+            for item in action_items.splitlines():
+                yield "action_item", item
+            yield "result", (summary, action_items, prompt_tokens + reduce_in, completion_tokens + reduce_out)
+            return
+        system_prompt, text = REDUCE_PROMPT, combined
     else:
-        summary = content.strip()
+        system_prompt = ACTION_ITEMS_PROMPT if include_action_items else SUMMARY_PROMPT
 
-    return summary, action_items, prompt_tokens, completion_tokens
+    stream = await _create(client, system_prompt, text, stream=True, stream_options={"include_usage": True})
+    parser = SectionParser()
+    try:
+        async for chunk in stream:
+            if chunk.usage:
+                prompt_tokens += chunk.usage.prompt_tokens
+                completion_tokens += chunk.usage.completion_tokens
+                _count_tokens(chunk.usage.prompt_tokens, chunk.usage.completion_tokens)
+            if chunk.choices and chunk.choices[0].delta.content:
+                for event in parser.feed(chunk.choices[0].delta.content):
+                    yield event
+    except RETRYABLE_ERRORS as e:
+        raise SummarizerUnavailable("OpenAI stream was interrupted. Please try again.") from e
+    for event in parser.finish():
+        yield event
+
+    summary, parsed_items = _parse(parser.content)
+    if action_items is None:
+        action_items = parsed_items
+    else:
+        for item in action_items.splitlines():
+            yield "action_item", item
+    yield "result", (summary, action_items, prompt_tokens, completion_tokens)
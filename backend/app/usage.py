@@ -0,0 +1,168 @@
+# app/usage.py
+from collections import defaultdict
+from dataclasses import asdict, dataclass
+from datetime import date, datetime, timedelta, timezone
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.orm import Session
+from app import models
+
+# --- API usage rollups: api_usage_daily holds per-user, per-day totals of api_usage ---
+ROLLUP_COLUMNS = ("requests", "input_tokens", "output_tokens", "cache_hits")
+
+
+@dataclass
+class UsageEvent:
+    """One summarization's token usage, as stored in an api_usage row."""
+    user_id: int
+    note_id: int | None
+    usage_date: datetime | None
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cache_hit: bool = False
+
+    def __post_init__(self):
+        self.usage_date = self.usage_date or models.utcnow()
+
+
+def usage_day(usage_date: datetime | str | None) -> date:
+    """UTC day of a usage timestamp (or of an old free-form string); today if there is none."""
+    parsed = models.parse_timestamp(usage_date)
+    return (parsed or models.utcnow()).date()
+
+
+def rollup_rows(usages) -> list[dict]:
+    """Collapse (user_id, usage_date, input_tokens, output_tokens, cache_hit) tuples into per-day rows."""
+    totals = defaultdict(lambda: dict.fromkeys(ROLLUP_COLUMNS, 0))
+    for user_id, usage_date, input_tokens, output_tokens, cache_hit in usages:
+        row = totals[(user_id, usage_day(usage_date))]
+        row["requests"] += 1
+        row["input_tokens"] += input_tokens or 0
+        row["output_tokens"] += output_tokens or 0
+        row["cache_hits"] += 1 if cache_hit else 0
+    return [{"user_id": user_id, "day": day, **row} for (user_id, day), row in totals.items()]
+
+
+def _upsert(bind, rows: list[dict]):
+    table = models.ApiUsageDaily.__table__
+    dialect = bind.dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        return None
+    stmt = insert(table).values(rows)
+    return stmt.on_conflict_do_update(
+        index_elements=[table.c.user_id, table.c.day],
+        set_={name: table.c[name] + stmt.excluded[name] for name in ROLLUP_COLUMNS},
+    )
+
+
+def add_to_rollup(db: Session, usages):
+    """Add usage rows to the daily rollup inside the caller's transaction (the caller commits)."""
+    rows = rollup_rows(usages)
+    if not rows:
+        return
+    stmt = _upsert(db.get_bind(), rows)
+    if stmt is not None:
+        db.execute(stmt)
+        return
+    # No native upsert: update in place, inserting the days that do not exist yet
+    for row in rows:
+        existing = db.get(models.ApiUsageDaily, (row["user_id"], row["day"]), with_for_update=True)
+        if existing is None:
+            db.add(models.ApiUsageDaily(**row))
+        else:
+            for name in ROLLUP_COLUMNS:
+                setattr(existing, name, getattr(existing, name) + row[name])
+    db.flush()
+
+
+def insert_usage(db: Session, events: list[UsageEvent]):
+    """Bulk insert api_usage rows (one executemany) and add them to the rollup; the caller commits."""
+    if not events:
+        return
+    db.execute(insert(models.ApiUsage), [asdict(event) for event in events])
+    add_to_rollup(db, [
+        (e.user_id, e.usage_date, e.input_tokens, e.output_tokens, e.cache_hit) for e in events
+    ])
+
+
+def rebuild_rollup(conn, batch_size: int = 5000):
+    """Recompute api_usage_daily from every api_usage row, e.g. after rows were bulk loaded around the ORM."""
+    conn.execute(delete(models.ApiUsageDaily.__table__))
+    usage = models.ApiUsage.__table__
+    result = conn.execution_options(yield_per=batch_size).execute(
+        select(usage.c.user_id, usage.c.usage_date, usage.c.input_tokens, usage.c.output_tokens, usage.c.cache_hit)
+    )
+    rows = rollup_rows(result)
+    for i in range(0, len(rows), batch_size):
+        conn.execute(models.ApiUsageDaily.__table__.insert(), rows[i:i + batch_size])
+
+
+def period_start(day: date, period: str) -> date:
+    if period == "week":
+        return day - timedelta(days=day.weekday())
+    if period == "month":
+        return day.replace(day=1)
+    return day
+
+
+def usage_summary(db: Session, user_id: int, period: str = "day", start: date | None = None, end: date | None = None) -> dict:
+    """Token and request totals per day, ISO week (starting Monday) or month between start and end inclusive."""
+    query = db.query(models.ApiUsageDaily).filter(models.ApiUsageDaily.user_id == user_id)
+    if start:
+        query = query.filter(models.ApiUsageDaily.day >= start)
+    if end:
+        query = query.filter(models.ApiUsageDaily.day <= end)
+    buckets = defaultdict(lambda: dict.fromkeys(ROLLUP_COLUMNS, 0))
+    totals = dict.fromkeys(ROLLUP_COLUMNS, 0)
+    for row in query.order_by(models.ApiUsageDaily.day):
+        bucket = buckets[period_start(row.day, period)]
+        for name in ROLLUP_COLUMNS:
+            bucket[name] += getattr(row, name)
+            totals[name] += getattr(row, name)
+    return {
+        "period": period,
+        "start": start,
+        "end": end,
+        "totals": totals,
+        "buckets": [{"period_start": key, **values} for key, values in buckets.items()],
+    }
+
+
+def usage_by_note(
+    db: Session, user_id: int, start: date | None = None, end: date | None = None, note_id: int | None = None
+) -> list[dict]:
+    """Totals per note, aggregated in the database from api_usage rows."""
+    usage = models.ApiUsage
+    query = (
+        db.query(
+            usage.note_id,
+            func.count(usage.id),
+            func.coalesce(func.sum(usage.input_tokens), 0),
+            func.coalesce(func.sum(usage.output_tokens), 0),
+            func.min(usage.usage_date),
+            func.max(usage.usage_date),
+        )
+        .filter(usage.user_id == user_id)
+        .group_by(usage.note_id)
+    )
+    if note_id is not None:
+        query = query.filter(usage.note_id == note_id)
+    # Whole UTC days, served by the (user_id, usage_date) index
+    if start:
+        query = query.filter(usage.usage_date >= datetime.combine(start, datetime.min.time(), timezone.utc))
+    if end:
+        query = query.filter(usage.usage_date < datetime.combine(end + timedelta(days=1), datetime.min.time(), timezone.utc))
+    return [
+        {
+            "note_id": row[0],
+            "requests": row[1],
+            "input_tokens": row[2],
+            "output_tokens": row[3],
+            "first_used": row[4],
+            "last_used": row[5],
+        }
+        for row in query.order_by(func.sum(usage.input_tokens + usage.output_tokens).desc())
+    ]
@@ -0,0 +1,194 @@
+# app/usage_log.py
+import logging
+import os
+import threading
+from collections import deque
+from sqlalchemy import select
+from sqlalchemy.exc import DataError, IntegrityError
+from sqlalchemy.orm import Session
+from app.database import SessionLocal
+from app.usage import UsageEvent, insert_usage
+from app import crud, models
+
+logger = logging.getLogger(__name__)
+
+# --- Usage logging for summarizations ---
+# buffered: queue events in memory and bulk insert them from a background thread (default)
+# same_transaction: write the usage row in the note's own transaction
+# inline: separate commit per usage row, as before
+USAGE_LOG_MODE = os.getenv("USAGE_LOG_MODE", "buffered")
+USAGE_FLUSH_SIZE = int(os.getenv("USAGE_FLUSH_SIZE", "200"))
+USAGE_FLUSH_INTERVAL = float(os.getenv("USAGE_FLUSH_INTERVAL", "2"))
+# Events held while the database is unreachable before the oldest are dropped
+USAGE_BUFFER_MAX = int(os.getenv("USAGE_BUFFER_MAX", "100000"))
+# Failed bulk inserts retried before falling back to row-by-row inserts that drop rejected rows
+USAGE_FLUSH_RETRIES = int(os.getenv("USAGE_FLUSH_RETRIES", "3"))
+
+if USAGE_LOG_MODE not in ("buffered", "same_transaction", "inline"):
+    raise RuntimeError(f"Unknown USAGE_LOG_MODE {USAGE_LOG_MODE!r}")
+
+
+class UsageBuffer:
+    """Write-behind buffer for api_usage rows, flushed by size, by time and on shutdown."""
+
+    def __init__(self, flush_size: int = USAGE_FLUSH_SIZE, interval: float = USAGE_FLUSH_INTERVAL,
+                 max_pending: int = USAGE_BUFFER_MAX, max_retries: int = USAGE_FLUSH_RETRIES):
+        self.flush_size = flush_size
+        self.interval = interval
+        self.max_retries = max_retries
+        self._pending: deque[UsageEvent] = deque(maxlen=max_pending)
+        self._lock = threading.Lock()
+        # Serializes flushes so rows are never inserted twice
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = False
+        self._thread: threading.Thread | None = None
+        self.flushed = 0
+        self.flushes = 0
+        self.failures = 0
+        self.dropped = 0
+        self.rejected = 0
+        # Consecutive failed bulk inserts
+        self._attempts = 0
+
+    def start(self):
+        if self._thread is None:
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="usage-log", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stop the flusher and write everything still buffered."""
+        if self._thread is not None:
+            self._stopping = True
+            self._wake.set()
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def add(self, event: UsageEvent):
+        with self._lock:
+            if len(self._pending) == self._pending.maxlen:
+                self.dropped += 1
+            self._pending.append(event)
+            full = len(self._pending) >= self.flush_size
+        if full:
+            self._wake.set()
+
+    def _run(self):
+        while not self._stopping:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self) -> int:
+        with self._flush_lock:
+            with self._lock:
+                batch = list(self._pending)
+                self._pending.clear()
+            if not batch:
+                return 0
+            try:
+                self._write(batch)
+                written = len(batch)
+            except Exception:
+                self.failures += 1
+                self._attempts += 1
+                if self._attempts <= self.max_retries:
+                    logger.exception("Failed to write %d usage rows; will retry", len(batch))
+                    self._requeue(batch)
+                    return 0
+                logger.exception("Failed to write %d usage rows %d times; writing them one at a time",
+                                 len(batch), self._attempts)
+                written = self._write_each(batch)
+            self._attempts = 0
+            self.flushes += 1
+            self.flushed += written
+            return written
+
+    def _write(self, events: list[UsageEvent]):
+        db = SessionLocal()
+        try:
+            _unlink_deleted_notes(db, events)
+            insert_usage(db, events)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _write_each(self, batch: list[UsageEvent]) -> int:
+        """Insert rows one by one, dropping those the database rejects; requeues the rest on other errors."""
+        written = 0
+        for i, event in enumerate(batch):
+            try:
+                self._write([event])
+                written += 1
+            except (IntegrityError, DataError):
+                self.rejected += 1
+                logger.exception("Dropping usage row rejected by the database: %r", event)
+            except Exception:
+                logger.exception("Failed to write usage rows; will retry")
+                self._requeue(batch[i:])
+                break
+        return written
+
+    def _requeue(self, batch: list[UsageEvent]):
+        with self._lock:
+            # Put the batch back ahead of newer events; a full buffer sheds the newest
+            self.dropped += max(0, len(self._pending) + len(batch) - self._pending.maxlen)
+            self._pending.extendleft(reversed(batch))
+
+    def stats(self) -> dict:
+        with self._lock:
+            pending = len(self._pending)
+        return {
+            "mode": USAGE_LOG_MODE,
+            "pending": pending,
+            "flushed": self.flushed,
+            "flushes": self.flushes,
+            "failures": self.failures,
+            "dropped": self.dropped,
+            "rejected": self.rejected,
+        }
+
+
+def _unlink_deleted_notes(db: Session, events: list[UsageEvent]):
+    """Clear note_id on events whose note was deleted while they were buffered."""
+    note_ids = {event.note_id for event in events if event.note_id is not None}
+    if not note_ids:
+        return
+    existing = set(db.scalars(select(models.Note.id).where(models.Note.id.in_(note_ids))))
+    for event in events:
+        if event.note_id not in existing:
+            event.note_id = None
+
+
+usage_buffer = UsageBuffer()
+
+
+def in_transaction(event: UsageEvent) -> UsageEvent | None:
+    """The event to pass to crud.create_note/update_note, which is only used in same_transaction mode."""
+    return event if USAGE_LOG_MODE == "same_transaction" else None
+
+
+def log_usage(db: Session, event: UsageEvent):
+    """Record usage for a note that has been saved; a no-op when it was written with the note."""
+    if USAGE_LOG_MODE == "same_transaction":
+        return
+    if USAGE_LOG_MODE == "inline":
+        crud.create_api_usage(
+            db, event.user_id, event.note_id, event.usage_date, event.input_tokens, event.output_tokens, event.cache_hit
+        )
+        return
+    usage_buffer.add(event)
+
+
+def start():
+    if USAGE_LOG_MODE == "buffered":
+        usage_buffer.start()
+
+
+def stop():
+    usage_buffer.stop()
@@ -0,0 +1,168 @@
+# app/user_cache.py
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# --- Cache of authenticated users, keyed by the token subject (the user id) ---
+# memory: per-process LRU; other workers see changes once their entry expires
+# redis: shared by every worker, so an update invalidates the user everywhere at once
+USER_CACHE_BACKEND = os.getenv("USER_CACHE_BACKEND", "memory")
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "60"))
+USER_CACHE_MAX_ENTRIES = int(os.getenv("USER_CACHE_MAX_ENTRIES", "10000"))
+USER_CACHE_REDIS_URL = os.getenv("USER_CACHE_REDIS_URL", os.getenv("REDIS_URL", "redis://localhost:6379/0"))
+
+# Columns kept for a cached user. Secrets (the password hash, the OpenAI key) are never cached, since the redis
+# backend shares entries with every worker; auth.get_openai_api_key reads the key where it is needed
+USER_FIELDS = ("id", "email", "username")
+
+
+class MemoryBackend:
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    async def get(self, key: str) -> dict | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    async def set(self, key: str, value: dict):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def size(self) -> int:
+        return len(self._entries)
+
+
+class RedisBackend:
+    """Entries live in Redis under user:<id> with a TTL; reads use the asyncio client, invalidation the sync one."""
+
+    def __init__(self, url: str, ttl: float):
+        try:
+            import redis
+            import redis.asyncio
+        except ImportError:
+            raise RuntimeError("USER_CACHE_BACKEND=redis requires the redis package")
+        self.ttl = ttl
+        self._async = redis.asyncio.Redis.from_url(url)
+        self._sync = redis.Redis.from_url(url)
+        self.evictions = 0
+
+    async def get(self, key: str) -> dict | None:
+        raw = await self._async.get(f"user:{key}")
+        return json.loads(raw) if raw else None
+
+    async def set(self, key: str, value: dict):
+        await self._async.set(f"user:{key}", json.dumps(value), px=int(self.ttl * 1000))
+
+    def delete(self, key: str):
+        self._sync.delete(f"user:{key}")
+
+    def size(self) -> int | None:
+        return None
+
+    async def close(self):
+        await self._async.aclose()
+        self._sync.close()
+
+
+class UserCache:
+    def __init__(self, backend, ttl: float = USER_CACHE_TTL_SECONDS):
+        self.backend = backend
+        self.enabled = ttl > 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.errors = 0
+        # Last invalidation per key in this process, so a lookup that raced an update cannot re-cache the old row
+        self._invalidated: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    async def get(self, key: str) -> dict | None:
+        if not self.enabled:
+            return None
+        try:
+            value = await self.backend.get(key)
+        except Exception:
+            # The cache is an optimization; fall back to the database when the backend is down
+            self.errors += 1
+            value = None
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    async def set(self, key: str, value: dict, looked_up_at: float):
+        """Cache a user row read from the database at looked_up_at (time.monotonic())."""
+        if not self.enabled or self._invalidated.get(key, 0.0) >= looked_up_at:
+            return
+        try:
+            await self.backend.set(key, value)
+        except Exception:
+            self.errors += 1
+
+    def invalidate(self, user_id: int):
+        key = str(user_id)
+        with self._lock:
+            self.invalidations += 1
+            self._invalidated[key] = time.monotonic()
+            if len(self._invalidated) > USER_CACHE_MAX_ENTRIES:
+                # Only recent invalidations matter; anything older than a TTL can go
+                cutoff = time.monotonic() - USER_CACHE_TTL_SECONDS
+                self._invalidated = {k: t for k, t in self._invalidated.items() if t >= cutoff}
+        if self.enabled:
+            try:
+                self.backend.delete(key)
+            except Exception:
+                self.errors += 1
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "backend": USER_CACHE_BACKEND,
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            "invalidations": self.invalidations,
+            "evictions": self.backend.evictions,
+            "errors": self.errors,
+            "size": self.backend.size(),
+        }
+
+    async def close(self):
+        if hasattr(self.backend, "close"):
+            await self.backend.close()
+
+
+def _backend():
+    if USER_CACHE_BACKEND == "memory":
+        return MemoryBackend(USER_CACHE_TTL_SECONDS, USER_CACHE_MAX_ENTRIES)
+    if USER_CACHE_BACKEND == "redis":
+        return RedisBackend(USER_CACHE_REDIS_URL, USER_CACHE_TTL_SECONDS)
+    raise RuntimeError(f"Unknown USER_CACHE_BACKEND {USER_CACHE_BACKEND!r}")
+
+
+user_cache = UserCache(_backend())
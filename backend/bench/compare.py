@@ -0,0 +1,51 @@
+# bench/compare.py
+# Compare two benchmark result files, e.g. from the main branch and from a change:
+#   python -m bench.compare bench-results/base/crud.json bench-results/crud.json --threshold 10
+# Exits with status 1 when any operation's p95 (or error count) got worse by more than the threshold.
+import argparse
+import json
+import sys
+
+METRICS = ("p50_ms", "p95_ms", "p99_ms", "throughput_per_s")
+
+
+def compare(base: dict, head: dict, threshold: float) -> tuple[list[str], bool]:
+    lines = [f"{'operation':<28}" + "".join(f"{m:>22}" for m in METRICS)]
+    regressed = False
+    for name in sorted(set(base["results"]) | set(head["results"])):
+        old, new = base["results"].get(name), head["results"].get(name)
+        if old is None or new is None:
+            lines.append(f"{name:<28}{'only in ' + ('head' if old is None else 'base'):>22}")
+            continue
+        cells = []
+        for metric in METRICS:
+            change = 100 * (new[metric] - old[metric]) / old[metric] if old[metric] else 0.0
+            cells.append(f"{new[metric]:>12.2f} ({change:+6.1f}%)")
+        worse_p95 = old["p95_ms"] and 100 * (new["p95_ms"] - old["p95_ms"]) / old["p95_ms"] > threshold
+        more_errors = new["errors"] > old["errors"]
+        flag = "  REGRESSION" if worse_p95 or more_errors else ""
+        regressed = regressed or bool(flag)
+        lines.append(f"{name:<28}" + "".join(f"{c:>22}" for c in cells) + flag)
+    return lines, regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files")
+    parser.add_argument("base")
+    parser.add_argument("head")
+    parser.add_argument("--threshold", type=float, default=10, help="allowed p95 increase in percent")
+    args = parser.parse_args()
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.head) as f:
+        head = json.load(f)
+    if base["suite"] != head["suite"]:
+        raise SystemExit(f"Cannot compare a {base['suite']} run with a {head['suite']} run")
+    print(f"base {base['meta']['commit']}  head {head['meta']['commit']}")
+    lines, regressed = compare(base, head, args.threshold)
+    print("\n".join(lines))
+    sys.exit(1 if regressed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+# bench/crud.py
+# Microbenchmarks of the app.crud read and write paths against a seeded SQLite database.
+#   python -m bench.crud --users 50 --notes 400 --iterations 300 --out bench-results/crud.json
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import timedelta
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="crud microbenchmarks")
+    parser.add_argument("--db", default=os.path.join(tempfile.gettempdir(), "note-summarizer-bench.db"),
+                        help="SQLite file, recreated on every run")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--notes", type=int, default=400, help="notes per user")
+    parser.add_argument("--tags", type=int, default=20, help="tags per user")
+    parser.add_argument("--tags-per-note", type=int, default=3)
+    parser.add_argument("--iterations", type=int, default=300, help="timed calls per operation")
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--only", help="comma-separated operation names")
+    parser.add_argument("--out", help="JSON file for the results (stdout when omitted)")
+    return parser.parse_args()
+
+
+def operations(data: dict, rng: random.Random) -> dict:
+    """name -> fn(db) doing one call for a random user, as the matching endpoint would."""
+    from app import crud, models, schemas, search
+    from bench.seed import WORDS
+
+    def user() -> int:
+        return rng.choice(data["users"])
+
+    def tags(n: int) -> list[str]:
+        return [f"tag-{t}" for t in rng.sample(range(data["tags"]), n)]
+
+    def note() -> tuple[int, int]:
+        user_id = user()
+        return rng.choice(data["notes"][user_id]), user_id
+
+    def list_range(db):
+        until = models.utcnow() - timedelta(days=rng.randint(0, 600))
+        crud.get_notes(db, None, user(), crud.NOTE_LIST_FIELDS, since=until - timedelta(days=90), until=until)
+
+    def second_page(db):
+        user_id = user()
+        _, cursor = crud.get_notes_page(db, None, user_id, 50, fields=crud.NOTE_LIST_FIELDS)
+        crud.get_notes_page(db, None, user_id, 50, cursor, fields=crud.NOTE_LIST_FIELDS)
+
+    def tags_for_notes(db):
+        user_id = user()
+        crud.get_tags_for_notes(db, rng.sample(data["notes"][user_id], 50), user_id)
+
+    def update(db):
+        note_id, user_id = note()
+        crud.update_note(db, note_id, content=f"bench edit {rng.random()}", user_id=user_id)
+
+    def create(db):
+        crud.create_note(db, "bench note", " ".join(rng.choices(WORDS, k=200)), "summary", "", None, tags(2), user())
+
+    def create_tag(db):
+        crud.create_tag(db, schemas.TagCreate(name=f"bench-{rng.random()}", color="#000000"), user())
+
+    return {
+        "get_notes": lambda db: crud.get_notes(db, None, user()),
+        "get_notes_list_fields": lambda db: crud.get_notes(db, None, user(), crud.NOTE_LIST_FIELDS),
+        "get_notes_tags_any": lambda db: crud.get_notes(db, tags(2), user(), crud.NOTE_LIST_FIELDS, "any"),
+        "get_notes_by_tags_all": lambda db: crud.get_notes_by_tags(db, tags(2), user()),
+        "get_notes_range": list_range,
+        "get_notes_page": lambda db: crud.get_notes_page(db, None, user(), 50, fields=crud.NOTE_LIST_FIELDS),
+        "get_notes_page_cursor": second_page,
+        "get_note_by_id": lambda db: crud.get_note_by_id(db, *note()),
+        "get_tags": lambda db: crud.get_tags(db, user()),
+        "get_tags_for_notes": tags_for_notes,
+        "get_tag_facets": lambda db: crud.get_tag_facets(db, user(), tags(1)),
+        "search_notes": lambda db: search.search_notes(db, " ".join(rng.sample(WORDS, 2)), user()),
+        "get_api_usage": lambda db: crud.get_api_usage(db, user()),
+        "update_note": update,
+        "create_note": create,
+        "create_tag": create_tag,
+    }
+
+
+def main():
+    args = parse_args()
+    if os.path.exists(args.db):
+        os.remove(args.db)
+    os.environ["DATABASE_URL"] = f"sqlite:///{args.db}"
+    os.environ.setdefault("BCRYPT_ROUNDS", "4")
+    from app.database import SessionLocal
+    from bench.seed import seed
+    from bench.stats import Recorder, report
+
+    started = time.perf_counter()
+    data = seed(args.users, args.notes, args.tags, args.tags_per_note, args.seed)
+    seed_seconds = time.perf_counter() - started
+
+    rng = random.Random(args.seed)
+    ops = operations(data, rng)
+    if args.only:
+        ops = {name: ops[name] for name in args.only.split(",")}
+    recorder = Recorder()
+    for name, fn in ops.items():
+        for i in range(args.warmup + args.iterations):
+            # A session per call, like a request
+            db = SessionLocal()
+            start = time.perf_counter()
+            try:
+                fn(db)
+                ok = True
+            except Exception as e:
+                db.rollback()
+                ok = False
+                if not recorder.errors[name]:
+                    print(f"{name} failed: {e!r}", file=sys.stderr)
+            finally:
+                duration = time.perf_counter() - start
+                db.close()
+            if i >= args.warmup:
+                recorder.record(name, duration, ok)
+    results = recorder.summary()
+    config = {k: v for k, v in vars(args).items() if k != "out"}
+    report("crud", config, results, args.out, {"seed_seconds": round(seed_seconds, 2)})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+# bench/fakes.py
+# Local stand-ins for the OpenAI API and Apache Tika, so benchmarks need no network access or API spend.
+#   python -m bench.fakes --openai-port 8100 --tika-port 8101 --openai-latency 0.8 --tika-latency 0.2
+# then run the backend with OPENAI_BASE_URL=http://127.0.0.1:8100/v1 TIKA_SERVER_URL=http://127.0.0.1:8101
+import argparse
+import asyncio
+import json
+import random
+import threading
+import time
+from dataclasses import dataclass
+import uvicorn
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import PlainTextResponse, StreamingResponse
+
+
+@dataclass
+class Latency:
+    """Seconds to wait per call: base plus a uniform 0..jitter, and a chance of answering with a 503."""
+    base: float = 0.0
+    jitter: float = 0.0
+    error_rate: float = 0.0
+
+    async def wait(self):
+        await asyncio.sleep(self.base + random.uniform(0, self.jitter))
+
+    def fails(self) -> bool:
+        return random.random() < self.error_rate
+
+
+def _completion_text(text: str) -> str:
+    words = text.split()
+    return (
+        f"Summary:\n{' '.join(words[:40]) or 'Empty note.'}\n\n"
+        "Action Items:\n- Review the notes\n- Follow up with the team"
+    )
+
+
+def openai_app(latency: Latency) -> FastAPI:
+    """Chat completions endpoint, streaming or not, with token usage estimated from the prompt length."""
+    app = FastAPI()
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        if latency.fails():
+            return Response(json.dumps({"error": {"message": "overloaded"}}), status_code=503,
+                            media_type="application/json")
+        prompt = " ".join(m["content"] for m in body["messages"])
+        content = _completion_text(body["messages"][-1]["content"])
+        usage = {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(content) // 4}
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        base = {"id": "chatcmpl-bench", "created": int(time.time()), "model": body.get("model", "bench")}
+        if not body.get("stream"):
+            await latency.wait()
+            return {
+                **base, "object": "chat.completion", "usage": usage,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            }
+
+        async def events():
+            # Spread the latency over the tokens, like a model producing them
+            pieces = [content[i:i + 16] for i in range(0, len(content), 16)]
+            await latency.wait()
+            for piece in pieces:
+                chunk = {**base, "object": "chat.completion.chunk",
+                         "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]}
+                yield f"data: {json.dumps(chunk)}\n\n"
+                await asyncio.sleep(latency.base / 20 / len(pieces))
+            final = {**base, "object": "chat.completion.chunk", "choices": [], "usage": usage}
+            yield f"data: {json.dumps(final)}\n\ndata: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return app
+
+
+def tika_app(latency: Latency) -> FastAPI:
+    """PUT /tika returns the uploaded bytes as text, which is what Tika does for plain text files."""
+    app = FastAPI()
+
+    @app.get("/tika")
+    async def hello():
+        return PlainTextResponse("This is Tika Server (bench fake). Please PUT")
+
+    @app.put("/tika")
+    async def extract(request: Request):
+        body = await request.body()
+        await latency.wait()
+        if latency.fails():
+            return PlainTextResponse("overloaded", status_code=503)
+        return PlainTextResponse(body.decode("utf-8", errors="replace"))
+
+    return app
+
+
+def serve(app, port: int, timeout: float = 30) -> tuple[uvicorn.Server, threading.Thread]:
+    """Run app on 127.0.0.1:port in a daemon thread and wait until it accepts connections."""
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    deadline = time.monotonic() + timeout
+    while not server.started:
+        if not thread.is_alive() or time.monotonic() > deadline:
+            raise RuntimeError(f"Server on port {port} did not start")
+        time.sleep(0.02)
+    return server, thread
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--openai-port", type=int, default=8100)
+    parser.add_argument("--openai-latency", type=float, default=0.5, help="seconds per completion")
+    parser.add_argument("--openai-jitter", type=float, default=0.2)
+    parser.add_argument("--openai-error-rate", type=float, default=0.0)
+    parser.add_argument("--tika-port", type=int, default=8101)
+    parser.add_argument("--tika-latency", type=float, default=0.05, help="seconds per extraction")
+    parser.add_argument("--tika-jitter", type=float, default=0.02)
+    parser.add_argument("--tika-error-rate", type=float, default=0.0)
+
+
+def start_fakes(args) -> tuple[str, str]:
+    """Start both fakes from parsed add_arguments options; returns (OPENAI_BASE_URL, TIKA_SERVER_URL)."""
+    serve(openai_app(Latency(args.openai_latency, args.openai_jitter, args.openai_error_rate)), args.openai_port)
+    serve(tika_app(Latency(args.tika_latency, args.tika_jitter, args.tika_error_rate)), args.tika_port)
+    return f"http://127.0.0.1:{args.openai_port}/v1", f"http://127.0.0.1:{args.tika_port}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake OpenAI and Tika servers")
+    add_arguments(parser)
+    openai_url, tika_url = start_fakes(parser.parse_args())
+    print(f"OPENAI_BASE_URL={openai_url}\nTIKA_SERVER_URL={tika_url}\nCtrl-C to stop")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+# bench/load.py
+# End-to-end load against app.main:app served by uvicorn, with the fake OpenAI and Tika servers behind it.
+# Virtual users log in as seeded users and loop over upload, list, search, tag filter and re-summarize.
+#   python -m bench.load --users 8 --duration 30 --openai-latency 0.5 --out bench-results/load.json
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+from bench import fakes
+
+DEFAULT_MIX = "upload=2,list=4,search=2,tag_filter=2,resummarize=1"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="End-to-end load scenario")
+    parser.add_argument("--users", type=int, default=8, help="concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=30, help="seconds of load after warmup")
+    parser.add_argument("--warmup", type=float, default=3, help="seconds of load not recorded")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="operation=weight,...")
+    parser.add_argument("--repeat-uploads", type=float, default=0.0,
+                        help="fraction of uploads that resend an earlier file (extraction and summary cache hits)")
+    parser.add_argument("--notes", type=int, default=200, help="seeded notes per user")
+    parser.add_argument("--tags", type=int, default=20, help="seeded tags per user")
+    parser.add_argument("--port", type=int, default=8200)
+    parser.add_argument("--db", default=os.path.join(tempfile.gettempdir(), "note-summarizer-load.db"),
+                        help="SQLite file, recreated on every run")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", help="JSON file for the results (stdout when omitted)")
+    fakes.add_arguments(parser)
+    return parser.parse_args()
+
+
+def configure(args, openai_url: str, tika_url: str):
+    """Point the app at the benchmark database and the fakes. Limits are off unless set in the environment."""
+    if os.path.exists(args.db):
+        os.remove(args.db)
+    os.environ["DATABASE_URL"] = f"sqlite:///{args.db}"
+    os.environ["OPENAI_BASE_URL"] = openai_url
+    os.environ["TIKA_SERVER_URL"] = tika_url
+    for name, value in {
+        "LIMIT_USER_RATE": "0", "LIMIT_USER_CONCURRENCY": "0", "LIMIT_GLOBAL_CONCURRENCY": "0",
+        "BCRYPT_ROUNDS": "4", "OCR_WORKERS": "1", "OPENAI_MAX_RETRIES": "0",
+    }.items():
+        os.environ.setdefault(name, value)
+
+
+class VirtualUser:
+    def __init__(self, client, username: str, password: str, args, recorder, rng: random.Random, words: list[str]):
+        self.client = client
+        self.username = username
+        self.password = password
+        self.args = args
+        self.recorder = recorder
+        self.rng = rng
+        self.words = words
+        self.headers = {}
+        self.note_ids: list[int] = []
+        self.uploads: list[bytes] = []
+        self.recording = False
+
+    async def call(self, name: str, method: str, url: str, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, headers=self.headers, **kwargs)
+        except Exception as e:
+            if self.recording:
+                self.recorder.record(name, time.perf_counter() - start, False, type(e).__name__)
+            return None
+        if self.recording:
+            self.recorder.record(name, time.perf_counter() - start, response.is_success, response.status_code)
+        return response
+
+    async def login(self):
+        response = await self.call("login", "POST", "/token", data={"username": self.username, "password": self.password})
+        self.headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        notes = await self.call("list", "GET", "/notes/", params={"limit": 200, "fields": "id"})
+        self.note_ids = [note["id"] for note in notes.json()]
+
+    def text(self) -> bytes:
+        if self.uploads and self.rng.random() < self.args.repeat_uploads:
+            return self.rng.choice(self.uploads)
+        body = " ".join(self.rng.choices(self.words, k=self.rng.randint(150, 800))).encode()
+        self.uploads.append(body)
+        return body
+
+    async def op_upload(self):
+        start = time.perf_counter()
+        response = await self.call(
+            "upload_submit", "POST", "/upload/",
+            files={"file": ("bench.txt", self.text(), "text/plain")}, data={"title": "Bench upload"},
+        )
+        if response is None or response.status_code != 202:
+            return
+        job = response.json()
+        while job["status"] not in ("completed", "failed"):
+            await asyncio.sleep(0.05)
+            response = await self.call("job_poll", "GET", f"/jobs/{job['id']}")
+            if response is None or not response.is_success:
+                return
+            job = response.json()
+        if self.recording:
+            self.recorder.record("upload_e2e", time.perf_counter() - start, job["status"] == "completed",
+                                 job["status_code"] or 201)
+        if job["status"] == "completed":
+            self.note_ids.append(job["note"]["id"])
+
+    async def op_list(self):
+        await self.call("list", "GET", "/notes/", params={"limit": 50})
+
+    async def op_search(self):
+        await self.call("search", "GET", "/notes/search/", params={"query": " ".join(self.rng.sample(self.words, 2))})
+
+    async def op_tag_filter(self):
+        tags = [f"tag-{t}" for t in self.rng.sample(range(self.args.tags), 2)]
+        await self.call("tag_filter", "GET", "/notes/", params={"tags": tags, "match": "any", "limit": 50,
+                                                                "fields": "id,name,created_at"})
+
+    async def op_resummarize(self):
+        if not self.note_ids:
+            return
+        content = " ".join(self.rng.choices(self.words, k=self.rng.randint(100, 400)))
+        await self.call("resummarize", "PUT", f"/notes/{self.rng.choice(self.note_ids)}", json={"content": content})
+
+    async def run(self, operations: list[str], weights: list[float], until: float):
+        while time.monotonic() < until:
+            await getattr(self, f"op_{self.rng.choices(operations, weights)[0]}")()
+
+
+async def drive(args, base_url: str, data: dict, recorder) -> float:
+    """Run the virtual users through warmup and the measured window; returns the measured seconds."""
+    import httpx
+    from bench.seed import PASSWORD, WORDS
+
+    mix = dict(item.split("=") for item in args.mix.split(","))
+    unknown = [name for name in mix if not hasattr(VirtualUser, f"op_{name}")]
+    if unknown:
+        raise SystemExit(f"Unknown operations in --mix: {', '.join(unknown)}")
+    operations, weights = list(mix), [float(w) for w in mix.values()]
+    async with httpx.AsyncClient(
+        base_url=base_url, timeout=120, limits=httpx.Limits(max_connections=args.users * 2)
+    ) as client:
+        users = [
+            VirtualUser(client, f"bench{u}", PASSWORD, args, recorder, random.Random(args.seed + u), WORDS)
+            for u in data["users"][:args.users]
+        ]
+        await asyncio.gather(*(user.login() for user in users))
+        warm_until = time.monotonic() + args.warmup
+        await asyncio.gather(*(user.run(operations, weights, warm_until) for user in users))
+        for user in users:
+            user.recording = True
+        start = time.monotonic()
+        await asyncio.gather(*(user.run(operations, weights, start + args.duration) for user in users))
+        return time.monotonic() - start
+
+
+def main():
+    args = parse_args()
+    openai_url, tika_url = fakes.start_fakes(args)
+    configure(args, openai_url, tika_url)
+    from app.main import app
+    from bench.seed import seed
+    from bench.stats import Recorder, report
+
+    data = seed(args.users, args.notes, args.tags, 3, args.seed)
+    server, thread = fakes.serve(app, args.port, timeout=120)
+    recorder = Recorder()
+    try:
+        elapsed = asyncio.run(drive(args, f"http://127.0.0.1:{args.port}", data, recorder))
+        import httpx
+        server_stats = {path: httpx.get(f"http://127.0.0.1:{args.port}{path}").json()
+                        for path in ("/health/db", "/health/limits")}
+    finally:
+        server.should_exit = True
+        thread.join(timeout=30)
+
+    results = recorder.summary(elapsed)
+    # upload_e2e spans a submit and its job polls, which are already counted
+    total = sum(r["count"] for name, r in results.items() if name != "upload_e2e")
+    config = {k: v for k, v in vars(args).items() if k not in ("out", "db")}
+    config["env"] = {name: os.environ[name] for name in sorted(os.environ)
+                     if name.startswith(("LIMIT_", "DB_", "UPLOAD_", "BCRYPT_", "USAGE_", "USER_CACHE_", "SUMMARY_"))}
+    report("load", config, results, args.out, {
+        "elapsed_s": round(elapsed, 2),
+        "total_requests": total,
+        "requests_per_s": round(total / elapsed, 2),
+        "server": server_stats,
+    })
+
+
+if __name__ == "__main__":
+    main()
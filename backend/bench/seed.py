@@ -0,0 +1,76 @@
+# bench/seed.py
+# Deterministic dataset for the benchmarks: users, tagged notes spread over two years, and usage rows.
+# Imported after DATABASE_URL points at the benchmark database.
+import random
+from datetime import timedelta
+from app import models
+from app.database import engine, init_db
+from app.passwords import hash_password
+from app.usage import rebuild_rollup
+
+WORDS = (
+    "meeting budget roadmap launch review design customer invoice sprint hiring deadline contract "
+    "research survey migration database latency release onboarding marketing quarterly forecast "
+    "security audit backlog feedback prototype vendor training report analytics outage incident"
+).split()
+PASSWORD = "bench-password"
+BATCH = 1000
+
+
+def note_text(rng: random.Random, words: int) -> str:
+    sentences = []
+    while words > 0:
+        length = min(words, rng.randint(6, 14))
+        sentences.append(" ".join(rng.choice(WORDS) for _ in range(length)).capitalize() + ".")
+        words -= length
+    return " ".join(sentences)
+
+
+def _insert(conn, table, rows: list[dict]):
+    for start in range(0, len(rows), BATCH):
+        conn.execute(table.insert(), rows[start:start + BATCH])
+
+
+def seed(users: int, notes_per_user: int, tags_per_user: int, tags_per_note: int, seed: int = 1) -> dict:
+    """Create the schema and fill it; returns the ids the benchmarks pick from."""
+    rng = random.Random(seed)
+    init_db()
+    hashed = hash_password(PASSWORD)
+    now = models.utcnow()
+    with engine.begin() as conn:
+        _insert(conn, models.User.__table__, [
+            {"id": u, "email": f"bench{u}@example.com", "username": f"bench{u}", "hashed_password": hashed,
+             "openai_api_key": "bench"}
+            for u in range(1, users + 1)
+        ])
+        tag_ids: dict[int, list[int]] = {}
+        tag_rows = []
+        for u in range(1, users + 1):
+            tag_ids[u] = list(range(len(tag_rows) + 1, len(tag_rows) + tags_per_user + 1))
+            tag_rows += [{"id": tag_ids[u][t], "name": f"tag-{t}", "color": "#888888", "user_id": u}
+                         for t in range(tags_per_user)]
+        _insert(conn, models.Tag.__table__, tag_rows)
+
+        note_rows, link_rows, usage_rows = [], [], []
+        note_ids: dict[int, list[int]] = {u: [] for u in range(1, users + 1)}
+        for u in range(1, users + 1):
+            for _ in range(notes_per_user):
+                note_id = len(note_rows) + 1
+                created = now - timedelta(minutes=rng.randint(0, 2 * 365 * 24 * 60))
+                note_rows.append({
+                    "id": note_id, "name": " ".join(rng.sample(WORDS, 3)).title(), "user_id": u,
+                    "content": note_text(rng, rng.randint(80, 600)), "summary": note_text(rng, 40),
+                    "action_items": "- " + note_text(rng, 8), "created_at": created,
+                    "updated_at": created + timedelta(hours=rng.randint(0, 48)),
+                })
+                note_ids[u].append(note_id)
+                link_rows += [{"note_id": note_id, "tag_id": t}
+                              for t in rng.sample(tag_ids[u], min(tags_per_note, tags_per_user))]
+                usage_rows.append({"user_id": u, "note_id": note_id, "usage_date": created,
+                                   "input_tokens": rng.randint(200, 4000), "output_tokens": rng.randint(50, 400),
+                                   "cache_hit": False})
+        _insert(conn, models.Note.__table__, note_rows)
+        _insert(conn, models.note_tags, link_rows)
+        _insert(conn, models.ApiUsage.__table__, usage_rows)
+        rebuild_rollup(conn)
+    return {"users": list(range(1, users + 1)), "notes": note_ids, "tags": tags_per_user}
@@ -0,0 +1,97 @@
+# bench/stats.py
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import time
+from collections import Counter, defaultdict
+
+
+def percentile(values: list[float], q: float) -> float:
+    """Linear-interpolated percentile of already sorted values (q in 0-100)."""
+    if not values:
+        return 0.0
+    rank = (len(values) - 1) * q / 100
+    low, high = math.floor(rank), math.ceil(rank)
+    return values[low] + (values[high] - values[low]) * (rank - low)
+
+
+class Recorder:
+    """Latencies and outcomes per operation name."""
+
+    def __init__(self):
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.errors: Counter = Counter()
+        self.statuses: dict[str, Counter] = defaultdict(Counter)
+
+    def record(self, name: str, seconds: float, ok: bool = True, status: int | str | None = None):
+        self.latencies[name].append(seconds)
+        if not ok:
+            self.errors[name] += 1
+        if status is not None:
+            self.statuses[name][str(status)] += 1
+
+    def summary(self, elapsed: float | None = None) -> dict:
+        """Per operation: count, errors, throughput and latency percentiles in ms.
+
+        Throughput is over elapsed wall-clock seconds when operations ran concurrently,
+        or over each operation's own total time when elapsed is None (one call at a time).
+        """
+        results = {}
+        for name, latencies in sorted(self.latencies.items()):
+            ordered = sorted(latencies)
+            seconds = elapsed if elapsed is not None else sum(ordered)
+            results[name] = {
+                "count": len(ordered),
+                "errors": self.errors[name],
+                "throughput_per_s": round(len(ordered) / seconds, 2) if seconds else 0.0,
+                "mean_ms": round(1000 * sum(ordered) / len(ordered), 3),
+                "p50_ms": round(1000 * percentile(ordered, 50), 3),
+                "p95_ms": round(1000 * percentile(ordered, 95), 3),
+                "p99_ms": round(1000 * percentile(ordered, 99), 3),
+                "max_ms": round(1000 * ordered[-1], 3),
+            }
+            if self.statuses[name]:
+                results[name]["statuses"] = dict(self.statuses[name])
+        return results
+
+
+def _git(*args: str) -> str | None:
+    try:
+        return subprocess.run(
+            ["git", *args], capture_output=True, text=True, check=True, cwd=os.path.dirname(__file__)
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def metadata() -> dict:
+    """Where and on what a run happened, so results from different commits can be told apart."""
+    status = _git("status", "--porcelain")
+    return {
+        "commit": _git("rev-parse", "HEAD"),
+        "dirty": bool(status) if status is not None else None,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def report(suite: str, config: dict, results: dict, out: str | None, extra: dict | None = None):
+    """Write results as JSON to out (stdout when None) and a readable table to stderr."""
+    document = {"suite": suite, "meta": metadata(), "config": config, "results": results, **(extra or {})}
+    text = json.dumps(document, indent=2, default=str)
+    if out:
+        os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+        with open(out, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    print(f"\n{'operation':<28}{'count':>8}{'err':>6}{'ops/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}",
+          file=sys.stderr)
+    for name, r in results.items():
+        print(f"{name:<28}{r['count']:>8}{r['errors']:>6}{r['throughput_per_s']:>10}"
+              f"{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}{r['p99_ms']:>10.2f}", file=sys.stderr)
@@ -1,7 +1,11 @@
 # reset_db.py
 # docker-compose exec backend python reset_db.py
 from app.database import Base, engine
-from app import models
+from app import models, search
 
+with engine.begin() as conn:
+    search.drop_search_index(conn)
 Base.metadata.drop_all(bind=engine)
 Base.metadata.create_all(bind=engine)
+with engine.begin() as conn:
+    search.create_search_index(conn)
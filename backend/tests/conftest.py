@@ -0,0 +1,61 @@
+# tests/conftest.py
+import itertools
+import os
+import tempfile
+
+# app.database reads DATABASE_URL on import, so point it at a scratch SQLite file first
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "test.db")
+# The lowest bcrypt cost keeps password tests fast
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+
+import pytest
+from app import models
+from app.database import Base, SessionLocal, engine, init_db
+
+init_db()
+_users = itertools.count(1)
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+        with engine.begin() as conn:
+            for table in reversed(Base.metadata.sorted_tables):
+                conn.execute(table.delete())
+
+
+@pytest.fixture
+def make_user(db):
+    def make() -> models.User:
+        n = next(_users)
+        user = models.User(
+            email=f"user{n}@example.com", username=f"user{n}", hashed_password="x", openai_api_key=f"sk-user{n}"
+        )
+        db.add(user)
+        db.commit()
+        return user
+    return make
+
+
+@pytest.fixture
+def user(make_user) -> models.User:
+    return make_user()
+
+
+@pytest.fixture
+def client(user):
+    """API client authenticated as user."""
+    from fastapi.testclient import TestClient
+    from app import auth, main, schemas
+
+    main.app.dependency_overrides[auth.get_current_user] = lambda: schemas.UserOut(
+        id=user.id, email=user.email, username=user.username
+    )
+    try:
+        yield TestClient(main.app, raise_server_exceptions=False)
+    finally:
+        main.app.dependency_overrides.clear()
@@ -0,0 +1,42 @@
+# tests/test_admission.py
+import asyncio
+
+import pytest
+from app import main
+from app.limits import limiter
+from app.parse import UploadTooLarge
+
+
+def in_flight(user_id: int) -> int:
+    return limiter.backend.in_flight(f"user:{user_id}")
+
+
+@pytest.mark.parametrize("path", ["/upload/", "/upload/stream"])
+@pytest.mark.parametrize("error, status", [(UploadTooLarge("too large"), 413), (OSError("disk full"), 500)])
+def test_failed_ingest_gives_the_slot_back(client, user, monkeypatch, path, error, status):
+    async def ingest_upload(file):
+        raise error
+
+    monkeypatch.setattr(main, "ingest_upload", ingest_upload)
+    response = client.post(path, files={"file": ("a.txt", b"text")}, data={"title": "a"})
+
+    assert response.status_code == status
+    assert in_flight(user.id) == 0
+
+
+def test_stream_permit_is_released_when_the_body_is_never_sent(user):
+    started = []
+
+    async def events():
+        started.append(True)
+        yield "data: {}\n\n"
+
+    async def run():
+        permit = await limiter.admit(user.id)
+        response = main.permit_stream(permit, events())
+        assert in_flight(user.id) == 1
+        await response.background()
+
+    asyncio.run(run())
+    assert in_flight(user.id) == 0
+    assert started == []
@@ -0,0 +1,85 @@
+# tests/test_extractor.py
+import time
+
+import pytest
+import requests
+from app import parse
+from app.parse import CircuitBreaker, Extractor, ExtractorUnavailable
+
+
+def test_breaker_opens_after_the_threshold():
+    breaker = CircuitBreaker(threshold=3, reset_seconds=60)
+    for _ in range(2):
+        breaker.record_failure()
+    assert (breaker.state, breaker.allow()) == ("closed", True)
+
+    breaker.record_failure()
+    assert (breaker.state, breaker.allow()) == ("open", False)
+
+
+def test_half_open_breaker_lets_one_probe_through():
+    breaker = CircuitBreaker(threshold=1, reset_seconds=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+
+    assert breaker.state == "half-open"
+    assert breaker.allow() is True
+    assert breaker.allow() is False
+
+
+def test_probe_result_closes_or_reopens_the_breaker():
+    breaker = CircuitBreaker(threshold=1, reset_seconds=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+    time.sleep(0.06)
+    breaker.allow()
+    breaker.record_success()
+    assert (breaker.state, breaker.failures) == ("closed", 0)
+
+
+def test_open_breaker_fails_fast_without_calling_tika(monkeypatch):
+    extractor = Extractor(tika_url="http://tika.invalid")
+    calls = []
+    monkeypatch.setattr(extractor._session, "put", lambda *args, **kwargs: calls.append(args))
+    for _ in range(extractor.breaker.threshold):
+        extractor.breaker.record_failure()
+
+    with pytest.raises(ExtractorUnavailable):
+        extractor.extract(None, "application/pdf")
+    assert calls == []
+
+
+def test_mime_is_sniffed_from_the_head():
+    assert parse.get_extractor().detect_mime(b"%PDF-1.4\n") == "application/pdf"
+    assert parse.get_extractor().detect_mime(b"plain words\n") == "text/plain"
+
+
+class Response:
+    def __init__(self, status_code: int, text: str = ""):
+        self.status_code = status_code
+        self.text = text
+
+
+def test_tika_outages_trip_the_breaker_but_unparseable_files_do_not(monkeypatch):
+    extractor = Extractor(tika_url="http://tika.invalid")
+    extractor.breaker.threshold = 2
+    responses = iter([Response(415), Response(503), requests.ConnectionError("refused")])
+
+    def put(*args, **kwargs):
+        response = next(responses)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    monkeypatch.setattr(extractor._session, "put", put)
+    with pytest.raises(RuntimeError, match="could not parse"):
+        extractor.extract(b"", "application/msword")
+    assert extractor.breaker.failures == 0
+    for _ in range(2):
+        with pytest.raises(ExtractorUnavailable):
+            extractor.extract(b"", "application/msword")
+    assert extractor.breaker.state == "open"
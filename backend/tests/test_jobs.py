@@ -0,0 +1,109 @@
+# tests/test_jobs.py
+import asyncio
+
+import pytest
+from app.jobs import JobError, JobManager
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_workers_bound_concurrency_and_run_every_job():
+    running, peak = 0, 0
+
+    async def work(job):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+
+    async def main():
+        manager = JobManager(concurrency=2)
+        await manager.start()
+        jobs = [manager.submit(1, (), work) for _ in range(6)]
+        await manager.stop(timeout=5)
+        return jobs
+
+    jobs = run(main())
+    assert peak == 2
+    assert [job.status for job in jobs] == ["completed"] * 6
+
+
+def test_failures_are_recorded_with_status_codes():
+    async def rejected(job):
+        raise JobError(400, "bad file")
+
+    async def broken(job):
+        raise RuntimeError("boom")
+
+    async def staged(job):
+        with job.stage("extract"):
+            pass
+        with job.stage("summarize"):
+            raise JobError(502, "OpenAI failed")
+
+    async def main():
+        manager = JobManager(concurrency=1)
+        await manager.start()
+        jobs = [manager.submit(1, ("extract", "summarize"), fn) for fn in (rejected, broken, staged)]
+        await manager.stop(timeout=5)
+        return jobs
+
+    first, second, third = run(main())
+    assert (first.status, first.status_code, first.error) == ("failed", 400, "bad file")
+    assert (second.status, second.status_code, second.error) == ("failed", 500, "boom")
+    assert [s.status for s in third.stages] == ["done", "failed"]
+    assert third.progress == 0.5
+    assert all(job.finished_at for job in (first, second, third))
+
+
+def test_stop_fails_jobs_that_outlive_the_drain_timeout():
+    discarded = []
+
+    async def slow(job):
+        await asyncio.sleep(10)
+
+    def discard_for(name):
+        async def discard():
+            discarded.append(name)
+        return discard
+
+    async def main():
+        manager = JobManager(concurrency=1)
+        await manager.start()
+        running = manager.submit(1, (), slow, discard_for("running"))
+        queued = manager.submit(1, (), slow, discard_for("queued"))
+        await asyncio.sleep(0)
+        await manager.stop(timeout=0.05)
+        with pytest.raises(JobError) as exc:
+            manager.submit(1, (), slow)
+        assert exc.value.status_code == 503
+        return running, queued
+
+    running, queued = run(main())
+    for job in (running, queued):
+        assert (job.status, job.status_code) == ("failed", 503)
+        assert job.finished_at is not None
+    assert sorted(discarded) == ["queued", "running"]
+
+
+def test_jobs_are_only_visible_to_their_owner_and_expire():
+    async def work(job):
+        pass
+
+    async def main():
+        manager = JobManager(concurrency=1, retention=0)
+        await manager.start()
+        job = manager.submit(1, (), work)
+        assert manager.get(job.id, 1) is job
+        assert manager.get(job.id, 2) is None
+        await manager._queue.join()
+        job.finished_at -= 1
+        # Finished jobs past their retention are pruned on the next submit
+        manager.submit(1, (), work)
+        await manager.stop(timeout=5)
+        return manager.get(job.id, 1)
+
+    assert run(main()) is None
@@ -0,0 +1,120 @@
+# tests/test_limits.py
+import asyncio
+import time
+
+import pytest
+from app import limits
+from app.limits import LimitExceeded, Limiter, MemoryBackend, Scope
+
+
+def acquire(backend: MemoryBackend, scopes: list[Scope], cost: float = 1, slots: int = 1):
+    return asyncio.run(backend.acquire(scopes, cost, slots))
+
+
+def test_rate_bucket_allows_a_burst_then_rejects():
+    backend, scope = MemoryBackend(), Scope("user:1", rate=0.5, burst=3, concurrency=0)
+
+    assert [acquire(backend, [scope]) for _ in range(3)] == [None, None, None]
+    rejected, reason, wait = acquire(backend, [scope])
+    assert (rejected, reason) == (scope, "rate")
+    assert wait == pytest.approx(2, abs=0.01)
+
+
+def test_concurrency_slots_are_given_back_on_release():
+    backend, scope = MemoryBackend(), Scope("user:1", rate=0, burst=0, concurrency=2)
+
+    assert acquire(backend, [scope], slots=2) is None
+    assert acquire(backend, [scope]) == (scope, "concurrency", 0.0)
+    asyncio.run(backend.release([scope], 1))
+    assert acquire(backend, [scope]) is None
+    assert backend.in_flight("user:1") == 2
+
+
+def test_rejection_takes_nothing_from_other_scopes():
+    backend = MemoryBackend()
+    user = Scope("user:1", rate=0, burst=0, concurrency=5)
+    full = Scope("global", rate=0, burst=0, concurrency=1)
+    acquire(backend, [full])
+
+    assert acquire(backend, [user, full]) == (full, "concurrency", 0.0)
+    assert backend.in_flight("user:1") == 0
+
+
+def test_release_never_goes_below_zero():
+    backend, scope = MemoryBackend(), Scope("user:1", rate=0, burst=0, concurrency=1)
+    acquire(backend, [scope])
+    asyncio.run(backend.release([scope], 1))
+    asyncio.run(backend.release([scope], 1))
+
+    assert backend.in_flight("user:1") == 0
+    assert acquire(backend, [scope]) is None
+    assert acquire(backend, [scope]) == (scope, "concurrency", 0.0)
+
+
+def test_refilled_buckets_are_pruned(monkeypatch):
+    backend = MemoryBackend()
+    monkeypatch.setattr(backend, "PRUNE_INTERVAL", 0)
+    acquire(backend, [Scope("user:1", rate=1000, burst=2, concurrency=0)])
+    time.sleep(0.01)
+    acquire(backend, [Scope("user:2", rate=0.001, burst=2, concurrency=0)])
+
+    assert list(backend._buckets) == ["user:2"]
+
+
+@pytest.fixture
+def limiter(monkeypatch):
+    monkeypatch.setattr(limits, "LIMIT_USER_RATE", 0.0)
+    monkeypatch.setattr(limits, "LIMIT_USER_CONCURRENCY", 2)
+    monkeypatch.setattr(limits, "LIMIT_GLOBAL_RATE", 0.0)
+    monkeypatch.setattr(limits, "LIMIT_GLOBAL_CONCURRENCY", 3)
+    return Limiter(MemoryBackend())
+
+
+def test_admit_rejects_then_accepts_after_release(limiter):
+    async def run():
+        first = await limiter.admit(1)
+        await limiter.admit(1)
+        with pytest.raises(LimitExceeded) as exc:
+            await limiter.admit(1)
+        assert (exc.value.scope, exc.value.reason) == ("user", "concurrency")
+        # Another user only hits the global limit
+        await limiter.admit(2)
+        with pytest.raises(LimitExceeded) as exc:
+            await limiter.admit(3)
+        assert exc.value.scope == "global"
+
+        await first.release()
+        await first.release()
+        await limiter.admit(3)
+
+    asyncio.run(run())
+    stats = limiter.stats()
+    assert stats["admitted"] == 4
+    assert stats["in_flight"] == 3
+    assert stats["rejected"]["user"]["concurrency"] == 1
+    assert stats["rejected"]["global"]["concurrency"] == 1
+
+
+def test_admit_caps_slots_at_the_limit(limiter):
+    async def run():
+        async with await limiter.admit(1, slots=10):
+            assert limiter.backend.in_flight("user:1") == 2
+        assert limiter.backend.in_flight("user:1") == 0
+
+    asyncio.run(run())
+
+
+def test_admit_rate_limit_reports_retry_after(monkeypatch, limiter):
+    monkeypatch.setattr(limits, "LIMIT_USER_RATE", 1.0)
+    monkeypatch.setattr(limits, "LIMIT_USER_BURST", 1.0)
+
+    async def run():
+        await limiter.admit(1)
+        with pytest.raises(LimitExceeded) as exc:
+            await limiter.admit(1)
+        return exc.value
+
+    error = asyncio.run(run())
+    assert error.reason == "rate"
+    assert 0 < error.retry_after <= 1
+    assert limits.retry_after(error.retry_after) == "1"
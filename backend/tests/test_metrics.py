@@ -0,0 +1,70 @@
+# tests/test_metrics.py
+from app import metrics
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = metrics.Histogram("test_seconds", "Test", ("stage",), buckets=(0.1, 1.0))
+    try:
+        histogram.observe(0.05, stage="a")
+        histogram.observe(0.5, stage="a")
+        histogram.observe(5.0, stage="a")
+        lines = histogram.render()
+    finally:
+        metrics._registry.remove(histogram)
+
+    assert 'note_summarizer_test_seconds_bucket{stage="a",le="0.1"} 1' in lines
+    assert 'note_summarizer_test_seconds_bucket{stage="a",le="1.0"} 2' in lines
+    assert 'note_summarizer_test_seconds_bucket{stage="a",le="+Inf"} 3' in lines
+    assert 'note_summarizer_test_seconds_count{stage="a"} 3' in lines
+
+
+def test_label_values_are_escaped():
+    counter = metrics.Counter("test_total", "Test", ("route",))
+    try:
+        counter.inc(route='a"b\nc')
+        assert 'note_summarizer_test_total{route="a\\"b\\nc"} 1' in counter.render()
+    finally:
+        metrics._registry.remove(counter)
+
+
+def test_server_timing_reports_repeated_stages():
+    header = metrics.server_timing({"db": (0.0123, 3), "extract": (0.5, 1)}, 0.75)
+    assert header == 'db;dur=12.3;desc="3x", extract;dur=500.0, total;dur=750.0'
+
+
+def test_add_timing_outside_a_request_is_ignored():
+    metrics.add_timing("db", 1.0)
+    with metrics.timed("outside"):
+        pass
+
+
+def test_responses_carry_server_timing_and_are_counted(client):
+    response = client.get("/notes/")
+    assert response.status_code == 200
+    stages = [entry.split(";")[0] for entry in response.headers["Server-Timing"].split(", ")]
+    assert "db" in stages
+    assert stages[-1] == "total"
+
+    text = client.get("/metrics").text
+    assert 'note_summarizer_http_request_duration_seconds_count{method="GET",route="/notes/",status="200"}' in text
+    assert "note_summarizer_db_query_duration_seconds_count" in text
+    # Registered stats are exported as gauges
+    assert "# TYPE note_summarizer_jobs_queue_depth gauge" in text
+
+
+def test_server_timing_can_be_turned_off(client, monkeypatch):
+    monkeypatch.setattr(metrics, "SERVER_TIMING", False)
+    response = client.get("/notes/")
+    assert response.status_code == 200
+    assert "Server-Timing" not in response.headers
+
+
+def test_failing_collector_is_skipped():
+    def broken():
+        raise RuntimeError("down")
+
+    metrics.register_stats("broken", broken)
+    try:
+        assert "note_summarizer_broken" not in metrics.render()
+    finally:
+        del metrics._collectors["broken"]
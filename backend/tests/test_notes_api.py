@@ -0,0 +1,25 @@
+# tests/test_notes_api.py
+import pytest
+from app import crud, main, schemas, usage_log
+
+
+@pytest.fixture
+def summarize(monkeypatch):
+    async def summarize_cached(db, user_id, text, api_key, include_action_items=True):
+        return f"summary of {text}", "- item", 100, 20, False
+
+    monkeypatch.setattr(main, "summarize_cached", summarize_cached)
+
+
+@pytest.mark.parametrize("mode", ["buffered", "same_transaction", "inline"])
+def test_update_note_returns_the_saved_note_with_tags(db, client, user, summarize, monkeypatch, mode):
+    monkeypatch.setattr(usage_log, "USAGE_LOG_MODE", mode)
+    crud.create_tag(db, schemas.TagCreate(name="work", color="#000000"), user.id)
+    note = crud.create_note(db, "Title", "old", "old summary", "", None, ["work"], user.id)
+
+    response = client.put(f"/notes/{note.id}", json={"content": "new text"})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["id"], body["content"], body["summary"]) == (note.id, "new text", "summary of new text")
+    assert [tag["name"] for tag in body["tags"]] == ["work"]
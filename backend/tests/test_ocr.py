@@ -0,0 +1,95 @@
+# tests/test_ocr.py
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+from PIL import Image
+from app import ocr
+
+
+def test_prepare_scales_pages_toward_the_target_dpi(monkeypatch):
+    monkeypatch.setattr(ocr, "OCR_TARGET_DPI", 300)
+    monkeypatch.setattr(ocr, "OCR_MAX_DIMENSION", 2500)
+    monkeypatch.setattr(ocr, "OCR_MIN_DIMENSION", 1000)
+
+    assert ocr.prepare(Image.new("RGB", (1200, 900)), dpi=150)[0] == (2400, 1800)
+    # Capped at the longest side, and small images grown to the minimum
+    assert ocr.prepare(Image.new("RGB", (5000, 2500)))[0] == (2500, 1250)
+    assert ocr.prepare(Image.new("RGB", (400, 200)))[0] == (1000, 500)
+    size, raw = ocr.prepare(Image.new("RGB", (1500, 1000)))
+    assert size == (1500, 1000) and len(raw) == 1500 * 1000
+
+
+def test_camera_dpi_is_ignored():
+    assert ocr._image_dpi(Image.new("L", (10, 10))) is None
+    photo, scan = Image.new("L", (10, 10)), Image.new("L", (10, 10))
+    photo.info["dpi"], scan.info["dpi"] = (72, 72), (200, 200)
+    assert ocr._image_dpi(photo) is None
+    assert ocr._image_dpi(scan) == 200
+
+
+def test_otsu_threshold_separates_ink_from_paper():
+    img = Image.new("L", (100, 10), 230)
+    img.paste(40, (0, 0, 30, 10))
+    assert 40 <= ocr._otsu_threshold(img) < 230
+
+
+class FakePool:
+    def __init__(self, fail: Exception | None = None, broken: bool = False, **kwargs):
+        self.fail, self.broken, self.shut_down = fail, broken, False
+
+    def submit(self, fn, *args):
+        future = Future()
+        if self.fail:
+            future.set_exception(self.fail)
+        elif self.broken and fn is not ocr._ping:
+            future.set_exception(BrokenProcessPool("worker died"))
+        else:
+            future.set_result("page text" if fn is ocr._recognize else 1)
+        return future
+
+    def shutdown(self, **kwargs):
+        self.shut_down = True
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    """Replace the process pool; set pool.next to the FakePool the next start() creates."""
+    class Factory:
+        next = FakePool()
+        created = []
+
+        def __call__(self, **kwargs):
+            self.created.append(self.next)
+            return self.next
+
+    factory = Factory()
+    monkeypatch.setattr(ocr, "ProcessPoolExecutor", factory)
+    monkeypatch.setattr(ocr, "_pool", None)
+    monkeypatch.setattr(ocr, "_pool_error", None)
+    return factory
+
+
+def test_failed_warm_up_is_reported_and_retried(pool):
+    pool.next = FakePool(fail=OSError("cannot spawn"))
+    ocr.warm_up()
+    assert ocr.health()["running"] is False
+    assert ocr.health()["error"] == "OSError: cannot spawn"
+    assert pool.created[0].shut_down
+
+    pool.next = FakePool()
+    assert ocr._run([((1, 1), b"\0")]) == "page text"
+    assert ocr.health()["running"] is True
+    assert ocr.health()["error"] is None
+
+
+def test_broken_pool_is_replaced_on_the_next_call(pool):
+    pool.next = FakePool(broken=True)
+    with pytest.raises(BrokenProcessPool):
+        ocr._run([((1, 1), b"\0")])
+    assert ocr.health()["running"] is False
+    assert "worker died" in ocr.health()["error"]
+
+    pool.next = FakePool()
+    assert ocr._run([((1, 1), b"\0"), ((1, 1), b"\0")]) == "page text\n\npage text"
+    assert len(pool.created) == 2
@@ -0,0 +1,86 @@
+# tests/test_pagination.py
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from app import crud, models
+
+START = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def add_notes(db, user_id: int, offsets: list[int]) -> list[int]:
+    return [
+        crud.create_note(db, f"note {i}", "content", "summary", "", START + timedelta(minutes=m), [], user_id).id
+        for i, m in enumerate(offsets)
+    ]
+
+
+def walk(db, user_id: int, limit: int, **kwargs) -> list[int]:
+    ids, cursor = [], None
+    while True:
+        notes, cursor = crud.get_notes_page(db, None, user_id, limit, cursor, **kwargs)
+        ids += [note.id for note in notes]
+        if cursor is None:
+            return ids
+
+
+@pytest.mark.parametrize("sort", ["desc", "asc"])
+@pytest.mark.parametrize("limit", [1, 3, 10])
+def test_pages_cover_every_note_once_in_order(db, make_user, sort, limit):
+    user, other = make_user(), make_user()
+    # Repeated timestamps must be split across pages by id without skipping or repeating notes
+    offsets = [5, 1, 3, 3, 3, 0, 8, 1]
+    ids = add_notes(db, user.id, offsets)
+    add_notes(db, other.id, [2, 4])
+
+    expected = [i for _, i in sorted(zip(offsets, ids), reverse=sort == "desc")]
+    assert walk(db, user.id, limit, sort=sort) == expected
+
+
+def test_pages_by_updated_at(db, make_user):
+    user = make_user()
+    ids = add_notes(db, user.id, [0, 1, 2, 3])
+    first = db.get(models.Note, ids[0])
+    first.updated_at = START + timedelta(days=1)
+    db.commit()
+
+    assert walk(db, user.id, 2, order_by="updated_at") == [ids[0], ids[3], ids[2], ids[1]]
+
+
+def test_last_page_has_no_cursor(db, make_user):
+    user = make_user()
+    add_notes(db, user.id, [0, 1])
+
+    notes, cursor = crud.get_notes_page(db, None, user.id, 2)
+    assert len(notes) == 2
+    assert cursor is None
+
+
+def test_cursor_round_trips():
+    value = START + timedelta(microseconds=123)
+    assert crud.decode_cursor(crud.encode_cursor(value, 42)) == (value, 42)
+
+
+@pytest.mark.parametrize("cursor", ["not-base64!", "bm90IGpzb24=", "WzEsIDJd"])
+def test_invalid_cursor_is_rejected(cursor):
+    with pytest.raises(ValueError):
+        crud.decode_cursor(cursor)
+
+
+def test_range_includes_since_and_excludes_until(db, make_user):
+    user = make_user()
+    ids = add_notes(db, user.id, [0, 10, 20, 30])
+    since, until = START + timedelta(minutes=10), START + timedelta(minutes=30)
+
+    notes = crud.get_notes(db, None, user.id, since=since, until=until, sort="asc")
+    assert [note.id for note in notes] == [ids[1], ids[2]]
+    assert walk(db, user.id, 1, since=since, until=until) == [ids[2], ids[1]]
+
+
+def test_range_query_params_treat_naive_times_as_utc(db, client, user):
+    ids = add_notes(db, user.id, [0, 10, 20, 30])
+
+    naive = client.get("/notes/", params={"since": "2026-01-01T00:10:00", "sort": "asc"})
+    assert [note["id"] for note in naive.json()] == ids[1:]
+    # 01:20+01:00 is 00:20 UTC
+    offset = client.get("/notes/", params={"until": "2026-01-01T01:20:00+01:00", "limit": 10})
+    assert [note["id"] for note in offset.json()] == [ids[1], ids[0]]
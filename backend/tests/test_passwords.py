@@ -0,0 +1,66 @@
+# tests/test_passwords.py
+import asyncio
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+from passlib.hash import bcrypt
+from app import main, models, passwords
+from app.passwords import HasherBusy, PasswordHasher
+
+
+def rounds(hashed: str) -> int:
+    return int(hashed.split("$")[2])
+
+
+def test_hashes_with_another_cost_are_upgraded_on_verify():
+    old = bcrypt.using(rounds=passwords.BCRYPT_ROUNDS + 1).hash("secret")
+
+    assert passwords.verify_and_update("wrong", old) == (False, None)
+    valid, new_hash = passwords.verify_and_update("secret", old)
+    assert valid
+    assert rounds(new_hash) == passwords.BCRYPT_ROUNDS
+    assert passwords.verify_and_update("secret", new_hash) == (True, None)
+
+
+def test_login_stores_the_upgraded_hash(db, user):
+    user.hashed_password = bcrypt.using(rounds=passwords.BCRYPT_ROUNDS + 1).hash("secret")
+    db.commit()
+
+    response = TestClient(main.app).post("/token", data={"username": user.username, "password": "secret"})
+    assert response.status_code == 200
+    db.expire_all()
+    assert rounds(db.get(models.User, user.id).hashed_password) == passwords.BCRYPT_ROUNDS
+
+
+def test_hasher_rejects_work_past_max_pending():
+    hasher = PasswordHasher(workers=1, max_pending=1, kind="thread")
+    release = threading.Event()
+
+    async def run():
+        waiting = [asyncio.create_task(hasher.run(release.wait)) for _ in range(2)]
+        await asyncio.sleep(0.05)
+        with pytest.raises(HasherBusy) as exc:
+            await hasher.run(release.wait)
+        release.set()
+        await asyncio.gather(*waiting)
+        return exc.value
+
+    try:
+        error = asyncio.run(run())
+    finally:
+        hasher.shutdown()
+    assert error.retry_after > 0
+    stats = hasher.stats()
+    assert (stats["rejected"], stats["completed"], stats["in_flight"]) == (1, 2, 0)
+
+
+def test_busy_hasher_turns_logins_into_503(db, user, monkeypatch):
+    async def busy(*args):
+        raise HasherBusy(2.4)
+
+    monkeypatch.setattr(main, "verify_and_update_async", busy)
+    response = TestClient(main.app).post("/token", data={"username": user.username, "password": "secret"})
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "2"
@@ -0,0 +1,91 @@
+# tests/test_pipeline.py
+import asyncio
+
+import pytest
+from app import crud, models, pipeline, schemas
+from app.jobs import JobError
+from app.parse import SpooledUpload
+
+
+class FakeExtractor:
+    def __init__(self):
+        self.calls = 0
+
+    def extract(self, stream, mime):
+        self.calls += 1
+        return stream.read().decode()
+
+
+def spooled(data: bytes) -> SpooledUpload:
+    upload = SpooledUpload("a.txt")
+    upload.write(data)
+    upload.mime = "text/plain"
+    upload.sha256 = upload._hash.hexdigest()
+    return upload
+
+
+@pytest.fixture
+def extractor(monkeypatch):
+    fake = FakeExtractor()
+    monkeypatch.setattr(pipeline, "get_extractor", lambda: fake)
+    return fake
+
+
+def test_identical_uploads_reuse_the_extracted_text(db, extractor):
+    with spooled(b"same text") as upload:
+        assert pipeline.extract_cached(upload) == ("same text", False)
+    with spooled(b"same text") as upload:
+        assert pipeline.extract_cached(upload) == ("same text", True)
+    with spooled(b"other text") as upload:
+        assert pipeline.extract_cached(upload) == ("other text", False)
+    assert extractor.calls == 2
+
+
+def test_empty_extractions_are_not_cached(db, extractor):
+    for _ in range(2):
+        with spooled(b"  ") as upload:
+            assert pipeline.extract_cached(upload) == ("  ", False)
+    assert extractor.calls == 2
+
+
+@pytest.fixture
+def summarize(monkeypatch, extractor):
+    async def summarize_with_cache(user_id, text, api_key, include_action_items):
+        if text == "bad":
+            raise ValueError("cannot summarize")
+        return f"summary of {text}", "", 10, 5, False
+
+    monkeypatch.setattr(pipeline, "summarize_with_cache", summarize_with_cache)
+
+
+def entry(text: str, tags=()) -> dict:
+    return {"filename": f"{text}.txt", "title": text, "tags": list(tags), "upload": spooled(text.encode())}
+
+
+def test_batch_saves_successes_and_reports_failures_in_order(db, user, summarize):
+    crud.create_tag(db, schemas.TagCreate(name="work", color="#000000"), user.id)
+    entries = [entry("one", ["work"]), entry("bad"), {"filename": "big.txt", "error": JobError(413, "too large")}, entry("two")]
+
+    results = asyncio.run(pipeline.run_batch_upload(entries, user.id, False, None, "sk-test"))
+
+    assert [(r["index"], r["status"], r["status_code"]) for r in results] == [
+        (0, "created", 201), (1, "failed", 400), (2, "failed", 413), (3, "created", 201)
+    ]
+    assert results[1]["error"] == "cannot summarize"
+    assert [tag.name for tag in results[0]["note"].tags] == ["work"]
+    saved = db.query(models.Note).filter_by(user_id=user.id).order_by(models.Note.id).all()
+    assert [(note.name, note.summary) for note in saved] == [("one", "summary of one"), ("two", "summary of two")]
+    assert db.query(models.ApiUsage).filter_by(user_id=user.id).count() == 2
+
+
+def test_batch_save_failure_fails_every_prepared_item(db, user, summarize, monkeypatch):
+    def broken(*args, **kwargs):
+        raise RuntimeError("disk full")
+
+    monkeypatch.setattr(crud, "create_notes_bulk", broken)
+    results = asyncio.run(pipeline.run_batch_upload([entry("one"), entry("two")], user.id, False, None, "sk-test"))
+
+    assert {(r["status"], r["status_code"], r["error"]) for r in results} == {
+        ("failed", 500, "Failed to save notes: disk full")
+    }
+    assert db.query(models.Note).filter_by(user_id=user.id).count() == 0
@@ -0,0 +1,110 @@
+# tests/test_profiling.py
+import pstats
+import time
+
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from app import main, profiling
+
+TOKEN = "secret-token"
+
+
+@pytest.fixture
+def token(monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_TOKEN", TOKEN)
+    store = profiling.ProfileStore()
+    monkeypatch.setattr(profiling, "profile_store", store)
+    # main imports the store by name
+    monkeypatch.setattr(main, "profile_store", store)
+    return TOKEN
+
+
+@pytest.fixture
+def profiled():
+    """A small app behind ProfilingMiddleware."""
+    def slow(request):
+        time.sleep(0.05)
+        return PlainTextResponse("ok")
+
+    app = Starlette(routes=[Route("/slow", slow)])
+    app.add_middleware(profiling.ProfilingMiddleware)
+    return TestClient(app)
+
+
+def test_authorized_needs_the_configured_token(token):
+    assert profiling.authorized(TOKEN)
+    assert not profiling.authorized(None)
+    assert not profiling.authorized("wrong")
+    assert not profiling.authorized("sécret\udcff")
+
+
+def test_nothing_is_authorized_without_a_token(monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_TOKEN", None)
+    assert not profiling.authorized("")
+    assert not profiling.authorized("anything")
+
+
+def test_requests_without_the_token_are_not_profiled(token, profiled):
+    assert "x-profile-id" not in profiled.get("/slow").headers
+    assert "x-profile-id" not in profiled.get("/slow", headers={"X-Profile-Token": "wrong"}).headers
+    assert "x-profile-id" not in profiled.get("/slow", headers={"X-Profile-Token": "s\xe9cret".encode()}).headers
+    assert profiling.profile_store.list() == []
+
+
+def test_requests_with_the_token_are_profiled(token, profiled):
+    response = profiled.get("/slow", headers={"X-Profile-Token": TOKEN})
+    assert response.text == "ok"
+    profile_id = int(response.headers["x-profile-id"])
+
+    [summary] = profiling.profile_store.list()
+    assert summary["id"] == profile_id
+    assert (summary["method"], summary["path"], summary["status"]) == ("GET", "/slow", 200)
+    assert summary["duration_ms"] >= 50
+    profile = profiling.profile_store.get(profile_id)
+    assert profile.samples > 0
+    assert "sleep" in profile.collapsed() or "slow (" in profile.collapsed()
+
+
+def test_store_keeps_the_most_recent_profiles():
+    store = profiling.ProfileStore(keep=2)
+    for i in range(3):
+        store.add(profiling.Profile(i, "GET", f"/{i}", "sample", time.time()))
+    assert [p["id"] for p in store.list()] == [2, 1]
+    assert store.get(0) is None
+
+
+def test_sampled_stats_load_with_pstats(tmp_path):
+    profile = profiling.Profile(1, "GET", "/", "sample", time.time())
+    profile.frames[(("a.py", 1, "outer"), ("a.py", 5, "inner"))] += 3
+    path = tmp_path / "profile.pstats"
+    path.write_bytes(profile.pstats())
+
+    stats = pstats.Stats(str(path)).stats
+    assert stats[("a.py", 1, "outer")][:2] == (3, 3)
+    assert stats[("a.py", 5, "inner")][2] == pytest.approx(3 * profiling.PROFILE_INTERVAL_MS / 1000)
+
+
+def test_profile_endpoints_are_hidden_without_the_token(client, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_TOKEN", None)
+    assert client.get("/debug/profiles", headers={"X-Profile-Token": ""}).status_code == 404
+
+    monkeypatch.setattr(profiling, "PROFILE_TOKEN", TOKEN)
+    assert client.get("/debug/profiles").status_code == 404
+    assert client.get("/debug/profiles", headers={"X-Profile-Token": "wrong"}).status_code == 404
+    assert client.get("/debug/profiles/1.pstats", headers={"X-Profile-Token": "wrong"}).status_code == 404
+
+
+def test_profile_endpoints_serve_stored_profiles(client, token):
+    profile = profiling.Profile(7, "GET", "/notes/", "sample", time.time())
+    profile.stacks["MainThread;run (a.py:1)"] += 2
+    profiling.profile_store.add(profile)
+    headers = {"X-Profile-Token": TOKEN}
+
+    assert [p["id"] for p in client.get("/debug/profiles", headers=headers).json()] == [7]
+    assert client.get("/debug/profiles/7.collapsed", headers=headers).text == "MainThread;run (a.py:1) 2\n"
+    assert client.get("/debug/profiles/7.pstats", headers=headers).status_code == 200
+    assert client.get("/debug/profiles/8.pstats", headers=headers).status_code == 404
@@ -0,0 +1,101 @@
+# tests/test_related.py
+from collections import Counter
+
+from app import crud
+from app.related import RelatedIndex, UserIndex, tokenize
+
+NOTES = {
+    "budget": "Quarterly budget review: the budget for marketing grew and the finance team approved it.",
+    "finance": "Finance sync about the marketing budget and hiring costs.",
+    "garden": "Planting tomatoes and basil in the garden this spring.",
+    "hiring": "Hiring plan for engineers and designers.",
+}
+
+
+def add_notes(db, user_id: int) -> dict[str, int]:
+    return {name: crud.create_note(db, name, text, "", "", None, [], user_id).id for name, text in NOTES.items()}
+
+
+def ids(results: list[tuple[int, float]]) -> list[int]:
+    return [note_id for note_id, _ in results]
+
+
+def test_tokenize_drops_stopwords_and_short_tokens():
+    assert tokenize("The Budget is 2x, a Q3 plan!") == ["budget", "2x", "q3", "plan"]
+
+
+def test_related_notes_share_distinctive_terms(db, user, make_user):
+    notes = add_notes(db, user.id)
+    add_notes(db, make_user().id)
+    index = RelatedIndex()
+
+    related = ids(index.related(db, user.id, notes["budget"], 10))
+    assert related[0] == notes["finance"]
+    assert notes["budget"] not in related
+    assert notes["garden"] not in related
+    assert set(related) <= set(notes.values())
+
+
+def test_query_ranks_by_bm25(db, user):
+    notes = add_notes(db, user.id)
+    index = RelatedIndex()
+
+    assert ids(index.query(db, user.id, "budget", 10)) == [notes["budget"], notes["finance"]]
+    assert ids(index.query(db, user.id, "budget", 1)) == [notes["budget"]]
+    assert index.query(db, user.id, "unknown words", 10) == []
+
+
+def test_loaded_index_follows_saves_and_deletes(db, user):
+    notes = add_notes(db, user.id)
+    index = RelatedIndex()
+    index.get(db, user.id)
+    note = crud.create_note(db, "tomatoes", "More tomatoes for the garden", "", "", None, [], user.id)
+    index.note_saved(note)
+    index.note_deleted(user.id, notes["garden"])
+
+    assert ids(index.query(db, user.id, "tomatoes", 10)) == [note.id]
+
+
+def test_removing_pending_and_compacted_rows_keeps_the_index_consistent():
+    index = UserIndex()
+    for note_id in range(1, 9):
+        index.add(note_id, Counter(tokenize(f"common word{note_id}")))
+    index.remove(2)
+    index._merge()
+    for note_id in (3, 4, 5):
+        index.remove(note_id)
+    # More than a quarter of the rows are dead, so this query compacts the arrays
+    assert ids(index.query("common", 10)) == [1, 6, 7, 8]
+    assert len(index.note_ids) == 4
+    assert ids(index.query("word7", 10)) == [7]
+
+
+def test_stale_indexes_are_rebuilt_from_the_database(db, user):
+    index = RelatedIndex(ttl=0)
+    assert index.query(db, user.id, "budget", 10) == []
+    notes = add_notes(db, user.id)
+
+    assert ids(index.query(db, user.id, "budget", 10)) == [notes["budget"], notes["finance"]]
+
+
+def test_least_recently_used_users_are_evicted(db, make_user):
+    users = [make_user() for _ in range(3)]
+    for user in users:
+        add_notes(db, user.id)
+    index = RelatedIndex()
+    for user in users:
+        index.get(db, user.id)
+    index.get(db, users[0].id)
+    index.max_bytes = sum(i.nbytes for i in index._users.values()) - 1
+    index._evict()
+
+    assert list(index._users) == [users[2].id, users[0].id]
+    assert index.stats()["users"] == 2
+
+
+def test_the_most_recent_index_is_kept_even_over_budget(db, user):
+    add_notes(db, user.id)
+    index = RelatedIndex(max_bytes=0)
+    index.get(db, user.id)
+
+    assert list(index._users) == [user.id]
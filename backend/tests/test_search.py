@@ -0,0 +1,84 @@
+# tests/test_search.py
+import pytest
+from app import crud, search
+
+
+def add_note(db, user_id: int, name: str, content: str = "", summary: str = "") -> int:
+    return crud.create_note(db, name, content, summary, "", None, [], user_id).id
+
+
+def ids(results: list[dict]) -> list[int]:
+    return [r["id"] for r in results]
+
+
+def test_ranks_name_matches_above_content_matches(db, make_user):
+    user = make_user()
+    in_content = add_note(db, user.id, "Weekly sync", content="we discussed the budget at length")
+    in_name = add_note(db, user.id, "Budget review", content="numbers")
+    add_note(db, user.id, "Unrelated", content="nothing here")
+
+    assert ids(search.search_notes(db, "budget", user.id)) == [in_name, in_content]
+
+
+def test_only_searches_the_users_own_notes(db, make_user):
+    user, other = make_user(), make_user()
+    mine = add_note(db, user.id, "Roadmap")
+    add_note(db, other.id, "Roadmap")
+
+    assert ids(search.search_notes(db, "roadmap", user.id)) == [mine]
+
+
+def test_last_term_matches_as_prefix_and_words_are_stemmed(db, make_user):
+    user = make_user()
+    note = add_note(db, user.id, "Planning", content="the team is hiring engineers")
+
+    assert ids(search.search_notes(db, "hire engin", user.id)) == [note]
+
+
+def test_index_follows_updates_and_deletes(db, make_user):
+    user = make_user()
+    note_id = add_note(db, user.id, "Draft", content="apples")
+    note = crud.get_note_by_id(db, note_id, user.id)
+    note.content = "oranges"
+    db.commit()
+
+    assert search.search_notes(db, "apples", user.id) == []
+    assert ids(search.search_notes(db, "oranges", user.id)) == [note_id]
+
+    crud.delete_note(db, note_id, user.id)
+    assert search.search_notes(db, "oranges", user.id) == []
+
+
+@pytest.mark.parametrize("query", ['"unbalanced', "NEAR(a b", "a OR", "*", "col:value", "-x", "^start"])
+def test_fts_syntax_in_queries_is_treated_as_text(db, make_user, query):
+    user = make_user()
+    add_note(db, user.id, "Note", content="plain words")
+
+    assert search.search_notes(db, query, user.id) == []
+
+
+def test_blank_query_returns_nothing(db, make_user):
+    user = make_user()
+    add_note(db, user.id, "Note", content="plain words")
+
+    assert search.search_notes(db, "   ", user.id) == []
+
+
+def test_snippet_escapes_note_html_and_marks_matches(db, make_user):
+    user = make_user()
+    add_note(db, user.id, "Note", content='<script>alert("x")</script> secret plan')
+
+    [result] = search.search_notes(db, "secret", user.id)
+    assert "<script>" not in result["snippet"]
+    assert "&lt;script&gt;" in result["snippet"]
+    assert f"{search.SNIPPET_START}secret{search.SNIPPET_STOP}" in result["snippet"]
+
+
+def test_like_fallback_matches_substrings(db, make_user):
+    user, other = make_user(), make_user()
+    older = add_note(db, user.id, "Quarterly", content="revenue grew")
+    newer = add_note(db, user.id, "Notes", summary="REVENUE flat")
+    add_note(db, other.id, "Revenue")
+
+    hits = search._search_like(db, "revenue", user.id, 10)
+    assert [h[0] for h in hits] == [newer, older]
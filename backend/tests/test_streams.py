@@ -0,0 +1,65 @@
+# tests/test_streams.py
+import asyncio
+import json
+
+import pytest
+from app import crud, pipeline
+from app.parse import SpooledUpload
+
+
+def events(stream) -> list[tuple[str, dict]]:
+    async def collect():
+        return [message async for message in stream]
+
+    parsed = []
+    for message in asyncio.run(collect()):
+        event, data = message.strip().split("\n")
+        parsed.append((event.removeprefix("event: "), json.loads(data.removeprefix("data: "))))
+    return parsed
+
+
+@pytest.fixture
+def summarize(monkeypatch):
+    async def stream_summary_cached(db, user_id, text, api_key, include_action_items=True):
+        yield "summary", f"summary of {text}"
+        yield "action_item", "- item"
+        yield "result", (f"summary of {text}", "- item", 100, 20, False)
+
+    async def extract_upload(upload):
+        return "uploaded text", False
+
+    monkeypatch.setattr(pipeline, "stream_summary_cached", stream_summary_cached)
+    monkeypatch.setattr(pipeline, "extract_upload", extract_upload)
+
+
+def upload(user_id: int, title: str = "Upload"):
+    return pipeline.stream_upload(SpooledUpload("a.txt"), user_id, title, True, None, [], "sk-test")
+
+
+def test_upload_stream_ends_with_the_saved_note(db, user, summarize):
+    received = events(upload(user.id))
+
+    assert [event for event, _ in received] == ["stage", "stage", "stage", "summary", "action_item", "done"]
+    note = received[-1][1]
+    assert (note["name"], note["summary"]) == ("Upload", "summary of uploaded text")
+
+
+def test_upload_stream_reports_a_failed_insert(db, user, summarize, monkeypatch):
+    monkeypatch.setattr(crud, "create_note", lambda *args, **kwargs: None)
+
+    assert events(upload(user.id))[-1] == ("error", {"status_code": 400, "detail": "Failed to create note"})
+
+
+def test_unexpected_errors_end_the_stream_with_an_error_event(db, user, summarize, monkeypatch):
+    note = crud.create_note(db, "Title", "old", "old summary", "", None, [], user.id)
+
+    def broken(*args, **kwargs):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(crud, "update_note", broken)
+    monkeypatch.setattr(crud, "create_note", broken)
+    resummarize = pipeline.stream_resummarize(note.id, user.id, "new", True, None, "sk-test")
+
+    error = ("error", {"status_code": 500, "detail": "Unexpected server error"})
+    assert events(resummarize)[-1] == error
+    assert events(upload(user.id))[-1] == error
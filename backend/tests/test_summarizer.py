@@ -0,0 +1,230 @@
+# tests/test_summarizer.py
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import openai as openai_errors
+import pytest
+from app import summarizer
+from app.summarizer import SectionParser
+
+COMPLETION = (
+    "Summary:\nThe team reviewed the Q3 budget - spending is on track.\n\n"
+    "Action Items:\n- Send the report to finance - by Friday\n-   Book the follow-up\n\n- Update the plan\n"
+)
+
+
+def stream(deltas: list[str]) -> list[tuple[str, str]]:
+    parser = SectionParser()
+    events = [event for delta in deltas for event in parser.feed(delta)]
+    return events + parser.finish()
+
+
+def split_every(text: str, size: int) -> list[str]:
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+def collapse(events: list[tuple[str, str]]) -> tuple[str, list[str]]:
+    summary = "".join(text for event, text in events if event == "summary")
+    return summary, [text for event, text in events if event == "action_item"]
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 13, len(COMPLETION)])
+def test_streamed_sections_match_the_parsed_completion(size):
+    summary, items = collapse(stream(split_every(COMPLETION, size)))
+
+    assert summary.strip() == summarizer._parse(COMPLETION)[0]
+    assert "\n".join(items) == summarizer._parse(COMPLETION)[1]
+    assert items == ["Send the report to finance - by Friday", "Book the follow-up", "Update the plan"]
+
+
+@pytest.mark.parametrize("split", [3, 8, 14, 20])
+def test_marker_split_across_deltas_is_not_emitted_as_summary(split):
+    text = "Summary: Short. Action Items:\n- One"
+    cut = text.index("Action Items:") + split % len("Action Items:")
+
+    assert collapse(stream([text[:cut], text[cut:]])) == ("Short. ", ["One"])
+
+
+def test_bullet_split_across_deltas():
+    assert collapse(stream(["Summary: S\nAction Items:\n-", " Fi", "rst\n- Sec", "ond"])) == (
+        "S\n", ["First", "Second"]
+    )
+
+
+def test_summary_marker_split_across_deltas():
+    assert collapse(stream(["Sum", "mary", ":", " Body"])) == ("Body", [])
+
+
+def test_completion_without_markers_is_all_summary():
+    assert collapse(stream(["Just a", " summary."])) == ("Just a summary.", [])
+    assert summarizer._parse("Just a summary.") == ("Just a summary.", "")
+
+
+def completion(content: str, prompt_tokens: int = 10, completion_tokens: int = 5):
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+        usage=SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens),
+    )
+
+
+class FakeClient:
+    """Stands in for AsyncOpenAI: replies with respond(system_prompt, text) and records every call."""
+
+    def __init__(self):
+        self.calls = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+        self.respond = None
+
+    async def create(self, model, messages, **kwargs):
+        system, user = messages[0]["content"], messages[1]["content"]
+        self.calls.append((system, user))
+        reply = self.respond(system, user)
+        if isinstance(reply, Exception):
+            raise reply
+        return completion(reply)
+
+
+@pytest.fixture
+def openai(monkeypatch):
+    """Install a FakeClient; tests set openai.respond."""
+    fake = FakeClient()
+    monkeypatch.setattr(summarizer, "get_client", lambda api_key: fake)
+    monkeypatch.setattr(summarizer, "OPENAI_BACKOFF_BASE", 0.0)
+    monkeypatch.setattr(summarizer, "OPENAI_MAX_RETRIES", 2)
+    return fake
+
+
+def paragraphs(count: int, words: int = 30) -> str:
+    return "\n\n".join(" ".join(f"p{i}w{j}" for j in range(words)) + "." for i in range(count))
+
+
+def test_split_text_keeps_paragraphs_whole_within_the_budget():
+    text = paragraphs(10)
+    chunks = summarizer.split_text(text, budget=200)
+
+    assert len(chunks) > 1
+    assert all(summarizer.estimate_tokens(chunk) <= 200 for chunk in chunks)
+    assert "\n\n".join(chunks) == text
+
+
+def test_split_text_starts_sections_at_headings():
+    body = " ".join(["word"] * 60)
+    text = f"INTRODUCTION\n\n{body}\n\n{body}\n\n## Results\n\n{body}"
+
+    chunks = summarizer.split_text(text, budget=100)
+    assert chunks[-1].startswith("## Results")
+
+
+def test_split_text_breaks_oversized_paragraphs_on_sentences():
+    sentence = " ".join(["word"] * 20) + "."
+    text = " ".join([sentence] * 20)
+
+    chunks = summarizer.split_text(text, budget=50)
+    assert all(len(chunk) <= 200 for chunk in chunks)
+    assert all(chunk.endswith(".") for chunk in chunks)
+    assert " ".join(chunks) == text
+
+
+def test_short_text_is_summarized_in_one_call(openai):
+    openai.respond = lambda system, user: "Summary: Short.\n\nAction Items:\n- Do it"
+
+    result = asyncio.run(summarizer.summarize_text("short note", "sk-test"))
+    assert result == ("Short.", "Do it", 10, 5)
+    assert len(openai.calls) == 1
+
+
+def test_long_text_is_mapped_per_chunk_then_reduced(openai, monkeypatch):
+    monkeypatch.setattr(summarizer, "SUMMARY_CHUNK_TOKENS", 200)
+
+    def respond(system, user):
+        if system == summarizer.REDUCE_PROMPT:
+            return "Summary: Whole document."
+        section = user.split("w")[0]
+        # Every chunk repeats one action item, which must be merged into a single entry
+        return f"Summary: About {section}.\n\nAction Items:\n- Item {section}\n- Follow up"
+
+    openai.respond = respond
+    text = paragraphs(10)
+    chunks = summarizer.split_text(text, 200)
+
+    summary, action_items, prompt_tokens, completion_tokens = asyncio.run(summarizer.summarize_text(text, "sk-test"))
+    assert summary == "Whole document."
+    items = action_items.splitlines()
+    assert items.count("Follow up") == 1
+    assert items[0] == "Item p0"
+    assert len(openai.calls) == len(chunks) + 1
+    reduce_input = openai.calls[-1][1]
+    assert reduce_input.startswith("About p0.")
+    assert (prompt_tokens, completion_tokens) == (10 * len(openai.calls), 5 * len(openai.calls))
+
+
+REQUEST = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+
+
+def status_error(cls, status: int, code: str | None = None, message: str = "details", headers: dict | None = None):
+    body = {"message": message, "code": code}
+    response = httpx.Response(status, request=REQUEST, headers=headers)
+    return cls(f"Error code: {status} - {body}", response=response, body=body)
+
+
+def fail_then_succeed(*errors):
+    replies = iter([*errors, "Summary: Done."])
+    return lambda system, user: next(replies)
+
+
+@pytest.mark.parametrize("error", [
+    status_error(openai_errors.RateLimitError, 429),
+    status_error(openai_errors.InternalServerError, 500),
+    openai_errors.APITimeoutError(request=REQUEST),
+    openai_errors.APIConnectionError(request=REQUEST),
+])
+def test_transient_errors_are_retried(openai, error):
+    openai.respond = fail_then_succeed(error, error)
+
+    assert asyncio.run(summarizer.summarize_text("note", "sk-test", False))[0] == "Done."
+    assert len(openai.calls) == 3
+
+
+@pytest.mark.parametrize("error, status, retry_after", [
+    (status_error(openai_errors.RateLimitError, 429, headers={"retry-after": "0.01"}), 429, 0.01),
+    (openai_errors.APITimeoutError(request=REQUEST), 504, None),
+    (openai_errors.APIConnectionError(request=REQUEST), 503, None),
+])
+def test_exhausted_retries_report_the_service_as_unavailable(openai, error, status, retry_after):
+    openai.respond = lambda system, user: error
+
+    with pytest.raises(summarizer.SummarizerUnavailable) as exc:
+        asyncio.run(summarizer.summarize_text("note", "sk-test"))
+    assert (exc.value.status_code, exc.value.retry_after) == (status, retry_after)
+    assert len(openai.calls) == 3
+
+
+@pytest.mark.parametrize("error, message", [
+    (status_error(openai_errors.AuthenticationError, 401), "Invalid or missing OpenAI API key."),
+    (status_error(openai_errors.PermissionDeniedError, 403, message="no access"), "not allowed to use"),
+    (status_error(openai_errors.RateLimitError, 429, code="insufficient_quota"), "run out of credits"),
+    (status_error(openai_errors.BadRequestError, 400, code="context_length_exceeded"), "note is too long"),
+    (status_error(openai_errors.BadRequestError, 400, message="bad input"), "OpenAI rejected the request: bad input"),
+    (status_error(openai_errors.NotFoundError, 404), "is not available: details"),
+])
+def test_client_errors_are_reported_to_the_user_without_retrying(openai, error, message):
+    openai.respond = lambda system, user: error
+
+    with pytest.raises(ValueError, match=message):
+        asyncio.run(summarizer.summarize_text("note", "sk-test"))
+    assert len(openai.calls) == 1
+
+
+def test_other_status_errors_are_a_bad_gateway(openai):
+    openai.respond = lambda system, user: status_error(openai_errors.ConflictError, 409, message="conflict")
+
+    with pytest.raises(summarizer.SummarizerUnavailable) as exc:
+        asyncio.run(summarizer.summarize_text("note", "sk-test"))
+    assert (exc.value.status_code, exc.value.detail) == (502, "OpenAI request failed: conflict")
+
+
+def test_missing_api_key_is_rejected_before_calling_openai(openai):
+    with pytest.raises(ValueError, match="No OpenAI API key"):
+        asyncio.run(summarizer.summarize_text("note", " "))
+    assert openai.calls == []
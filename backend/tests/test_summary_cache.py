@@ -0,0 +1,93 @@
+# tests/test_summary_cache.py
+import asyncio
+
+import pytest
+from app import cache, crud, models
+
+
+@pytest.fixture
+def summarize(monkeypatch):
+    """Stand-in for the OpenAI calls; records the texts it was asked to summarize."""
+    calls = []
+
+    async def summarize_text(text, api_key, include_action_items=True):
+        calls.append(text)
+        return f"summary of {text}", "- item" if include_action_items else "", 100, 20
+
+    async def stream_summary(text, api_key, include_action_items=True):
+        calls.append(text)
+        yield "summary", f"summary of {text}"
+        yield "result", (f"summary of {text}", "- item", 100, 20)
+
+    monkeypatch.setattr(cache, "summarize_text", summarize_text)
+    monkeypatch.setattr(cache, "stream_summary", stream_summary)
+    return calls
+
+
+def summarize_cached(db, user_id: int, text: str, include_action_items: bool = True):
+    return asyncio.run(cache.summarize_cached(db, user_id, text, "sk-test", include_action_items))
+
+
+def test_hit_returns_the_stored_summary_without_tokens(db, make_user, summarize):
+    user = make_user()
+
+    assert summarize_cached(db, user.id, "text") == ("summary of text", "- item", 100, 20, False)
+    assert summarize_cached(db, user.id, "text") == ("summary of text", "- item", 0, 0, True)
+    assert summarize == ["text"]
+    assert db.query(models.SummaryCache).one().hits == 1
+
+
+def test_entries_are_not_shared_between_users(db, make_user, summarize):
+    first, second = make_user(), make_user()
+    summarize_cached(db, first.id, "text")
+
+    assert summarize_cached(db, second.id, "text")[4] is False
+    assert summarize == ["text", "text"]
+    assert db.query(models.SummaryCache).count() == 2
+
+
+def test_action_item_setting_is_part_of_the_key(db, make_user, summarize):
+    user = make_user()
+    summarize_cached(db, user.id, "text", include_action_items=True)
+
+    assert summarize_cached(db, user.id, "text", include_action_items=False) == (
+        "summary of text", "", 100, 20, False
+    )
+
+
+def test_stream_hit_replays_the_cached_result(db, make_user, summarize):
+    user = make_user()
+
+    async def stream():
+        return [event async for event in cache.stream_summary_cached(db, user.id, "text", "sk-test")]
+
+    assert asyncio.run(stream())[-1] == ("result", ("summary of text", "- item", 100, 20, False))
+    assert asyncio.run(stream()) == [
+        ("summary", "summary of text"),
+        ("action_item", "- item"),
+        ("result", ("summary of text", "- item", 0, 0, True)),
+    ]
+    assert summarize == ["text"]
+
+
+def test_least_recently_used_entries_are_evicted(db, make_user, summarize, monkeypatch):
+    user = make_user()
+    entry_size = len("summary of a") + len("- item")
+    monkeypatch.setattr(cache, "SUMMARY_CACHE_MAX_BYTES", 2 * entry_size)
+    summarize_cached(db, user.id, "a")
+    summarize_cached(db, user.id, "b")
+    summarize_cached(db, user.id, "a")
+    summarize_cached(db, user.id, "c")
+
+    db.expire_all()
+    assert sorted(entry.summary for entry in db.query(models.SummaryCache)) == ["summary of a", "summary of c"]
+    assert summarize_cached(db, user.id, "b")[4] is False
+
+
+def test_getter_returns_values_that_need_no_session(db, make_user, summarize):
+    user = make_user()
+    summarize_cached(db, user.id, "text")
+    key = (user.id, cache.content_hash("text"), True, cache.MODEL, cache.PROMPT_VERSION)
+
+    assert crud.get_summary_cache(db, *key) == ("summary of text", "- item")
+    assert crud.get_summary_cache(db, user.id, cache.content_hash("other"), *key[2:]) is None
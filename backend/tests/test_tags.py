@@ -0,0 +1,63 @@
+# tests/test_tags.py
+import pytest
+from sqlalchemy.exc import IntegrityError
+from app import crud, schemas
+
+
+def add_tags(db, user_id: int, *names: str):
+    for name in names:
+        crud.create_tag(db, schemas.TagCreate(name=name, color="#000000"), user_id)
+
+
+@pytest.fixture
+def notes(db, user, make_user) -> dict[str, int]:
+    add_tags(db, user.id, "work", "urgent", "home", "unused")
+    tagged = {
+        "work": ["work"],
+        "work+urgent": ["work", "urgent"],
+        "urgent+home": ["urgent", "home"],
+        "untagged": [],
+    }
+    ids = {name: crud.create_note(db, name, "c", "s", "", None, tags, user.id).id for name, tags in tagged.items()}
+    # Another user's tag of the same name must not count
+    other = make_user()
+    add_tags(db, other.id, "work")
+    crud.create_note(db, "theirs", "c", "s", "", None, ["work"], other.id)
+    return ids
+
+
+def tagged(db, user_id: int, tags: list[str], match: str) -> set[int]:
+    return set(db.scalars(crud.tagged_note_ids(tags, user_id, match)))
+
+
+def test_tagged_note_ids_match_all_or_any(db, user, notes):
+    assert tagged(db, user.id, ["work", "urgent"], "all") == {notes["work+urgent"]}
+    assert tagged(db, user.id, ["work", "urgent"], "any") == {notes["work"], notes["work+urgent"], notes["urgent+home"]}
+    # Repeating a name must not make "all" unsatisfiable
+    assert tagged(db, user.id, ["work", "work"], "all") == {notes["work"], notes["work+urgent"]}
+    assert tagged(db, user.id, ["missing"], "any") == set()
+
+
+def test_facets_count_notes_per_tag(db, user, notes):
+    facets = crud.get_tag_facets(db, user.id)
+
+    assert [(f["name"], f["note_count"]) for f in facets] == [("urgent", 2), ("work", 2), ("home", 1), ("unused", 0)]
+
+
+@pytest.mark.parametrize("tags, match, expected", [
+    (["work"], "all", [("work", 2), ("urgent", 1), ("home", 0), ("unused", 0)]),
+    (["urgent", "home"], "all", [("home", 1), ("urgent", 1), ("unused", 0), ("work", 0)]),
+    (["work", "home"], "any", [("urgent", 2), ("work", 2), ("home", 1), ("unused", 0)]),
+])
+def test_facets_are_restricted_to_notes_matching_the_filter(db, user, notes, tags, match, expected):
+    facets = crud.get_tag_facets(db, user.id, tags, match)
+
+    assert [(f["name"], f["note_count"]) for f in facets] == expected
+
+
+def test_tag_names_are_unique_per_user(db, user, make_user):
+    add_tags(db, user.id, "work")
+    add_tags(db, make_user().id, "work")
+
+    with pytest.raises(IntegrityError):
+        add_tags(db, user.id, "work")
@@ -0,0 +1,16 @@
+# tests/test_tags_api.py
+from app import crud, schemas
+
+
+def test_tag_lookup_and_tag_filter_are_separate_routes(db, client, user):
+    crud.create_tag(db, schemas.TagCreate(name="work", color="#000000"), user.id)
+    tagged = crud.create_note(db, "Tagged", "c", "s", "", None, ["work"], user.id).id
+    untagged = crud.create_note(db, "Untagged", "c", "s", "", None, [], user.id).id
+
+    lookup = client.get("/notes/tags/lookup", params={"ids": f"{tagged},{untagged}"})
+    assert lookup.status_code == 200
+    assert [tag["name"] for tag in lookup.json()[str(tagged)]] == ["work"]
+    assert lookup.json().get(str(untagged), []) == []
+
+    filtered = client.get("/notes/tags/", params={"tags": "work"})
+    assert [note["id"] for note in filtered.json()] == [tagged]
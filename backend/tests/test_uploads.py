@@ -0,0 +1,60 @@
+# tests/test_uploads.py
+import asyncio
+import hashlib
+import io
+
+import pytest
+from starlette.datastructures import UploadFile
+from app import parse
+from app.parse import SpooledUpload, UploadTooLarge, ingest_upload
+
+PDF = b"%PDF-1.4\n" + b"x" * 10_000
+
+
+def ingest(data: bytes, **kwargs) -> SpooledUpload:
+    return asyncio.run(ingest_upload(UploadFile(io.BytesIO(data), filename="a.pdf"), **kwargs))
+
+
+def test_small_uploads_stay_in_memory():
+    with ingest(PDF) as upload:
+        assert not upload._spilled
+        assert upload.stream().read() == PDF
+        assert (upload.size, upload.sha256) == (len(PDF), hashlib.sha256(PDF).hexdigest())
+        assert upload.mime == "application/pdf"
+
+
+def test_large_uploads_spill_to_a_temp_file(monkeypatch):
+    monkeypatch.setattr(parse, "SPOOL_MEMORY_BYTES", 1000)
+    monkeypatch.setattr(parse, "CHUNK_SIZE", 512)
+
+    with ingest(PDF) as upload:
+        assert upload._spilled
+        assert not isinstance(upload._file, io.BytesIO)
+        assert upload.stream().read() == PDF
+        assert upload.sha256 == hashlib.sha256(PDF).hexdigest()
+        # The type is sniffed from the first bytes, however the file was chunked
+        assert upload._head == PDF[:parse.SNIFF_BYTES]
+        assert upload.mime == "application/pdf"
+
+
+def test_oversized_uploads_are_rejected():
+    with pytest.raises(UploadTooLarge):
+        ingest(PDF, max_bytes=len(PDF) - 1)
+
+
+def test_buffer_is_closed_when_sniffing_fails(monkeypatch):
+    created = []
+
+    class Recording(SpooledUpload):
+        def __init__(self, *args):
+            super().__init__(*args)
+            created.append(self)
+
+    def broken(head):
+        raise OSError("libmagic failed")
+
+    monkeypatch.setattr(parse, "SpooledUpload", Recording)
+    monkeypatch.setattr(parse.get_extractor(), "detect_mime", broken)
+    with pytest.raises(OSError):
+        ingest(PDF)
+    assert created[0]._file.closed
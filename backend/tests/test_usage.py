@@ -0,0 +1,78 @@
+# tests/test_usage.py
+from datetime import date, datetime, timezone
+
+import pytest
+from sqlalchemy import select
+from app import crud, models, usage
+from app.database import engine
+from app.usage import UsageEvent
+
+
+def at(day: int, hour: int = 12) -> datetime:
+    return datetime(2026, 3, day, hour, tzinfo=timezone.utc)
+
+
+def rollup(db) -> list[tuple]:
+    db.expire_all()
+    table = models.ApiUsageDaily
+    return db.execute(
+        select(table.user_id, table.day, table.requests, table.input_tokens, table.output_tokens, table.cache_hits)
+        .order_by(table.user_id, table.day)
+    ).all()
+
+
+@pytest.fixture(params=["upsert", "update"])
+def upsert(request, monkeypatch):
+    """Run with the dialect's native upsert and with the update-in-place fallback."""
+    if request.param == "update":
+        monkeypatch.setattr(usage, "_upsert", lambda bind, rows: None)
+
+
+def test_usage_is_added_to_the_days_totals(db, user, make_user, upsert):
+    other = make_user()
+    usage.insert_usage(db, [
+        UsageEvent(user.id, None, at(2, 0), 10, 5),
+        UsageEvent(user.id, None, at(2, 23), 20, 0, cache_hit=True),
+        UsageEvent(other.id, None, at(2), 1, 1),
+    ])
+    db.commit()
+    usage.insert_usage(db, [UsageEvent(user.id, None, at(2), 100, 50), UsageEvent(user.id, None, at(3), 7, 3)])
+    db.commit()
+
+    assert rollup(db) == [
+        (user.id, date(2026, 3, 2), 3, 130, 55, 1),
+        (user.id, date(2026, 3, 3), 1, 7, 3, 0),
+        (other.id, date(2026, 3, 2), 1, 1, 1, 0),
+    ]
+
+
+def test_inline_usage_rows_update_the_rollup(db, user):
+    crud.create_api_usage(db, user.id, None, at(4), 10, 5, False)
+    crud.create_api_usage(db, user.id, None, at(4), 1, 1, True)
+
+    assert rollup(db) == [(user.id, date(2026, 3, 4), 2, 11, 6, 1)]
+
+
+def test_rebuild_matches_the_incremental_rollup(db, user):
+    usage.insert_usage(db, [UsageEvent(user.id, None, at(day), day, 1) for day in (1, 1, 5, 9)])
+    db.commit()
+    incremental = rollup(db)
+    with engine.begin() as conn:
+        conn.execute(models.ApiUsageDaily.__table__.delete())
+        usage.rebuild_rollup(conn, batch_size=1)
+
+    assert rollup(db) == incremental
+
+
+def test_summary_buckets_by_week_and_month(db, user):
+    # 2026-03-01 is a Sunday, so it belongs to the week starting Monday 2026-02-23
+    usage.insert_usage(db, [UsageEvent(user.id, None, at(day), 10, 1) for day in (1, 2, 8, 9)])
+    db.commit()
+
+    weekly = usage.usage_summary(db, user.id, "week")
+    assert [(b["period_start"], b["requests"]) for b in weekly["buckets"]] == [
+        (date(2026, 2, 23), 1), (date(2026, 3, 2), 2), (date(2026, 3, 9), 1)
+    ]
+    monthly = usage.usage_summary(db, user.id, "month", start=date(2026, 3, 2), end=date(2026, 3, 8))
+    assert [(b["period_start"], b["input_tokens"]) for b in monthly["buckets"]] == [(date(2026, 3, 1), 20)]
+    assert monthly["totals"]["requests"] == 2
@@ -0,0 +1,110 @@
+# tests/test_usage_log.py
+from sqlalchemy import select
+from sqlalchemy.exc import OperationalError
+from app import crud, models, usage_log
+from app.usage import UsageEvent
+from app.usage_log import UsageBuffer
+
+
+def usage_rows(db) -> list[tuple]:
+    db.expire_all()
+    return db.execute(
+        select(models.ApiUsage.user_id, models.ApiUsage.note_id, models.ApiUsage.input_tokens)
+        .order_by(models.ApiUsage.id)
+    ).all()
+
+
+def test_flush_bulk_inserts_and_updates_the_rollup(db, make_user):
+    user = make_user()
+    buffer = UsageBuffer(flush_size=10, interval=60)
+    for tokens in (10, 20, 30):
+        buffer.add(UsageEvent(user.id, None, None, tokens, 1))
+
+    assert buffer.flush() == 3
+    assert usage_rows(db) == [(user.id, None, 10), (user.id, None, 20), (user.id, None, 30)]
+    assert db.scalar(select(models.ApiUsageDaily.input_tokens)) == 60
+    assert buffer.stats() | {"mode": None} == {
+        "mode": None, "pending": 0, "flushed": 3, "flushes": 1, "failures": 0, "dropped": 0, "rejected": 0,
+    }
+    assert buffer.flush() == 0
+
+
+def test_failed_flush_is_retried_in_order(db, make_user, monkeypatch):
+    user = make_user()
+    buffer = UsageBuffer(flush_size=10, interval=60, max_retries=3)
+    buffer.add(UsageEvent(user.id, None, None, 1))
+
+    def unavailable(db, events):
+        raise OperationalError("INSERT", {}, Exception("database is locked"))
+
+    insert_usage = usage_log.insert_usage
+    monkeypatch.setattr(usage_log, "insert_usage", unavailable)
+    assert buffer.flush() == 0
+    buffer.add(UsageEvent(user.id, None, None, 2))
+    assert buffer.stats()["pending"] == 2
+
+    monkeypatch.setattr(usage_log, "insert_usage", insert_usage)
+    assert buffer.flush() == 2
+    assert [row.input_tokens for row in usage_rows(db)] == [1, 2]
+    assert buffer.failures == 1
+
+
+def test_rows_the_database_rejects_are_dropped_after_the_retries(db, make_user):
+    user = make_user()
+    buffer = UsageBuffer(flush_size=10, interval=60, max_retries=2)
+    buffer.add(UsageEvent(user.id, None, None, 1))
+    buffer.add(UsageEvent(None, None, None, 2))
+    buffer.add(UsageEvent(user.id, None, None, 3))
+
+    assert [buffer.flush() for _ in range(3)] == [0, 0, 2]
+    assert [row.input_tokens for row in usage_rows(db)] == [1, 3]
+    stats = buffer.stats()
+    assert (stats["pending"], stats["failures"], stats["rejected"]) == (0, 3, 1)
+
+
+def test_row_by_row_fallback_requeues_on_other_errors(db, make_user, monkeypatch):
+    user = make_user()
+    buffer = UsageBuffer(flush_size=10, interval=60, max_retries=0)
+    for tokens in (1, 2, 3):
+        buffer.add(UsageEvent(user.id, None, None, tokens))
+    calls = []
+
+    def flaky(db, events):
+        calls.append(len(events))
+        if len(events) > 1 or len(calls) == 3:
+            raise OperationalError("INSERT", {}, Exception("disk I/O error"))
+        insert_usage(db, events)
+
+    insert_usage = usage_log.insert_usage
+    monkeypatch.setattr(usage_log, "insert_usage", flaky)
+    assert buffer.flush() == 1
+    assert calls == [3, 1, 1]
+    assert buffer.stats()["pending"] == 2
+
+    monkeypatch.setattr(usage_log, "insert_usage", insert_usage)
+    assert buffer.flush() == 2
+    assert [row.input_tokens for row in usage_rows(db)] == [1, 2, 3]
+
+
+def test_usage_of_a_deleted_note_is_kept_without_the_note(db, make_user):
+    user = make_user()
+    kept = crud.create_note(db, "kept", "c", "s", "", None, [], user.id).id
+    deleted = crud.create_note(db, "deleted", "c", "s", "", None, [], user.id).id
+    buffer = UsageBuffer(flush_size=10, interval=60)
+    buffer.add(UsageEvent(user.id, kept, None, 1))
+    buffer.add(UsageEvent(user.id, deleted, None, 2))
+    crud.delete_note(db, deleted, user.id)
+
+    assert buffer.flush() == 2
+    assert usage_rows(db) == [(user.id, kept, 1), (user.id, None, 2)]
+
+
+def test_full_buffer_drops_the_oldest_events(db, make_user):
+    user = make_user()
+    buffer = UsageBuffer(flush_size=10, interval=60, max_pending=2)
+    for tokens in (1, 2, 3):
+        buffer.add(UsageEvent(user.id, None, None, tokens))
+
+    assert buffer.flush() == 2
+    assert [row.input_tokens for row in usage_rows(db)] == [2, 3]
+    assert buffer.dropped == 1
@@ -0,0 +1,122 @@
+# tests/test_user_cache.py
+import asyncio
+import json
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+from app import auth, crud, main, user_cache as user_cache_module
+from app.user_cache import MemoryBackend, RedisBackend, UserCache, user_cache
+
+
+@pytest.fixture
+def api(user, monkeypatch):
+    """Client that authenticates with a real token, so requests go through the user cache."""
+    # User ids are reused once the tables are emptied, so start from an empty cache
+    monkeypatch.setattr(user_cache, "backend", MemoryBackend(ttl=60, max_entries=100))
+    client = TestClient(main.app)
+    client.headers["Authorization"] = f"Bearer {auth.create_access_token({'sub': str(user.id)})}"
+    return client
+
+
+def test_cached_user_holds_no_secrets(api, user):
+    response = api.get("/users/me")
+
+    assert response.json()["openai_api_key"] == user.openai_api_key
+    assert asyncio.run(user_cache.backend.get(str(user.id))) == {
+        "id": user.id, "email": user.email, "username": user.username
+    }
+
+
+@pytest.mark.parametrize("update, field, value", [
+    (crud.update_user_username, "username", "renamed"),
+    (crud.update_user_email, "email", "renamed@example.com"),
+    (crud.update_user_api_key, "openai_api_key", "sk-new"),
+])
+def test_updates_are_seen_on_the_next_request(db, api, user, update, field, value):
+    api.get("/users/me")
+    update(db, user.id, value)
+
+    assert api.get("/users/me").json()[field] == value
+
+
+def test_lookup_that_raced_an_invalidation_is_not_cached():
+    cache = UserCache(MemoryBackend(ttl=60, max_entries=10))
+
+    async def run():
+        looked_up_at = time.monotonic()
+        cache.invalidate(1)
+        await cache.set("1", {"id": 1}, looked_up_at)
+        return await cache.get("1")
+
+    assert asyncio.run(run()) is None
+
+
+def test_memory_backend_expires_and_evicts_least_recently_used(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(user_cache_module.time, "monotonic", lambda: now[0])
+    backend = MemoryBackend(ttl=10, max_entries=2)
+
+    async def run():
+        await backend.set("1", {"id": 1})
+        await backend.set("2", {"id": 2})
+        await backend.get("1")
+        await backend.set("3", {"id": 3})
+        assert [await backend.get(key) for key in "123"] == [{"id": 1}, None, {"id": 3}]
+        now[0] = 11
+        assert await backend.get("1") is None
+
+    asyncio.run(run())
+    assert backend.evictions == 1
+
+
+class FakeRedis:
+    """In-memory stand-in for the parts of the redis clients RedisBackend uses."""
+
+    def __init__(self):
+        self.values = {}
+        self.expiry = {}
+
+    async def get(self, key):
+        return self.values.get(key)
+
+    async def set(self, key, value, px=None):
+        self.values[key] = value.encode()
+        self.expiry[key] = px
+
+    def delete(self, key):
+        self.values.pop(key, None)
+
+
+def test_redis_backend_stores_json_with_a_ttl_and_deletes_on_invalidate():
+    backend = RedisBackend.__new__(RedisBackend)
+    backend.ttl, backend.evictions = 60, 0
+    backend._async = backend._sync = redis = FakeRedis()
+    cache = UserCache(backend)
+
+    async def run():
+        await cache.set("7", {"id": 7, "username": "u"}, looked_up_at=float("inf"))
+        assert json.loads(redis.values["user:7"]) == {"id": 7, "username": "u"}
+        assert redis.expiry["user:7"] == 60_000
+        assert await cache.get("7") == {"id": 7, "username": "u"}
+        cache.invalidate(7)
+        return await cache.get("7")
+
+    assert asyncio.run(run()) is None
+    assert (cache.hits, cache.misses, cache.invalidations) == (1, 1, 1)
+
+
+def test_backend_errors_fall_back_to_the_database():
+    class Down:
+        evictions = 0
+
+        async def get(self, key):
+            raise ConnectionError
+
+        def delete(self, key):
+            raise ConnectionError
+
+    cache = UserCache(Down())
+    assert asyncio.run(cache.get("1")) is None
+    cache.invalidate(1)
+    assert cache.errors == 2
@@ -24,6 +24,10 @@ interface Props {
   summary: string;
   actionItems: string;
   tagsProp?: Tag[];
+  createdAt?: string;
+  updatedAt?: string;
+  // Username shown as the creator; pages fetch it once instead of every card asking /users/me
+  creator?: string | null;
   onDelete: (noteId: number) => void;
   expandLink?: string;
 }
@@ -34,6 +38,9 @@ const NoteCard: React.FC<Props> = ({
   summary,
   actionItems,
   tagsProp,
+  createdAt,
+  updatedAt,
+  creator,
   onDelete,
   expandLink,
 }) => {
@@ -41,12 +48,10 @@ const NoteCard: React.FC<Props> = ({
   const [isRenaming, setIsRenaming] = useState(false);
   const [editedName, setEditedName] = useState(name);
   const [tags, setTags] = useState<Tag[]>([]);
-  const [lastModified, setLastModified] = useState<string | null>(null);
+  const [lastModified, setLastModified] = useState<string | null>(updatedAt ?? null);
   const [showTagSelector, setShowTagSelector] = useState(false);
   const [showProperties, setShowProperties] = useState(false);
-  const [noteMetadata, setNoteMetadata] = useState<any | null>(null);
   const [selectedTags, setSelectedTags] = useState<Tag[]>([]);
-  const [currentUser, setCurrentUser] = useState<string | null>(null);
   const [showMenu, setShowMenu] = useState(false);
   const [flipPopup, setFlipPopup] = useState<boolean>(false);
   useEffect(() => {
@@ -73,19 +78,6 @@ const NoteCard: React.FC<Props> = ({
     };
   }, []);
 
-  useEffect(() => {
-    fetch(`${API_URL}/users/me`, {
-      headers: {
-        Authorization: `Bearer ${localStorage.getItem("token")}`
-      }
-    })
-      .then(res => res.json())
-      .then(data => {
-        setCurrentUser(data.username || null);
-      })
-      .catch(err => console.error("Failed to fetch user info", err));
-  }, []);
-
   useEffect(() => {
     console.log("NoteCard useEffect triggered");
     if (tagsProp) {
@@ -105,20 +97,8 @@ const NoteCard: React.FC<Props> = ({
   }, [noteId, tagsProp]);
 
   useEffect(() => {
-    fetch(`${API_URL}/notes/${noteId}`, {
-      headers: {
-        Authorization: `Bearer ${localStorage.getItem("token")}`
-      }
-    })
-      .then(res => res.json())
-      .then(data => {
-        if (data.updated_at) {
-          setLastModified(new Date(data.updated_at).toLocaleString());
-          setNoteMetadata(data);
-        }
-      })
-      .catch(err => console.error("Failed to fetch note metadata", err));
-  }, [noteId]);
+    setLastModified(updatedAt ?? null);
+  }, [updatedAt]);
 
   const changeName = async (editedName: string) => {
     const res = await fetch(`${API_URL}/notes/${noteId}/name`, {
@@ -130,6 +110,8 @@ const NoteCard: React.FC<Props> = ({
       body: JSON.stringify({ name: editedName, updated_at: new Date().toISOString() }),
     });
     if (res.ok) {
+      const updated = await res.json();
+      if (updated.updated_at) setLastModified(updated.updated_at);
       setIsRenaming(false);
     } else {
       alert("Failed to rename note.");
@@ -291,13 +273,13 @@ const NoteCard: React.FC<Props> = ({
       >
         {cardContent}
       </div>
-      {showProperties && noteMetadata && (
+      {showProperties && createdAt && (
         <div className={`absolute top-0 ${flipPopup ? 'right-full mr-2' : 'left-full ml-2'} w-96 bg-white border border-gray-200 rounded-lg shadow-md z-[9999]`}>
           <div className="p-4 text-sm text-[#001f3f]">
-            <p><strong>Creator:</strong> {currentUser || "N/A"}</p>
-            <p><strong>Created At:</strong> {formatDateTime(noteMetadata.created_at)}</p>
-            <p><strong>Updated At:</strong> {formatDateTime(noteMetadata.updated_at)}</p>
-            <p><strong>Action Items Enabled:</strong> {noteMetadata.action_items?.trim() ? "Yes" : "No"}</p>
+            <p><strong>Creator:</strong> {creator || "N/A"}</p>
+            <p><strong>Created At:</strong> {formatDateTime(createdAt)}</p>
+            <p><strong>Updated At:</strong> {lastModified ? formatDateTime(lastModified) : "N/A"}</p>
+            <p><strong>Action Items Enabled:</strong> {actionItems?.trim() ? "Yes" : "No"}</p>
           </div>
         </div>
       )}
@@ -347,13 +329,13 @@ const NoteCard: React.FC<Props> = ({
       <div className="h-full flex flex-col">
         {cardContent}
       </div>
-      {showProperties && noteMetadata && (
+      {showProperties && createdAt && (
         <div className={`absolute top-0 ${flipPopup ? 'right-full mr-2' : 'left-full ml-2'} w-96 bg-white border border-gray-200 rounded-lg shadow-md z-[9999]`}>
           <div className="p-4 text-sm text-[#001f3f]">
-            <p><strong>Creator:</strong> {currentUser || "N/A"}</p>
-            <p><strong>Created At:</strong> {formatDateTime(noteMetadata.created_at)}</p>
-            <p><strong>Updated At:</strong> {formatDateTime(noteMetadata.updated_at)}</p>
-            <p><strong>Action Items Enabled:</strong> {noteMetadata.action_items?.trim() ? "Yes" : "No"}</p>
+            <p><strong>Creator:</strong> {creator || "N/A"}</p>
+            <p><strong>Created At:</strong> {formatDateTime(createdAt)}</p>
+            <p><strong>Updated At:</strong> {lastModified ? formatDateTime(lastModified) : "N/A"}</p>
+            <p><strong>Action Items Enabled:</strong> {actionItems?.trim() ? "Yes" : "No"}</p>
           </div>
         </div>
       )}
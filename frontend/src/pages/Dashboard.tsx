@@ -45,18 +45,22 @@ interface Note {
   name: string;
   summary: string;
   action_items: string;
+  created_at: string;
   updated_at: string;
   tags?: Tag[];
   content: string;
 }
 
-interface ApiUsageEntry {
-  id: number;
-  user_id: number;
-  note_id: number | null;
+interface UsageBucket {
+  period_start: string;
+  requests: number;
   input_tokens: number;
   output_tokens: number;
-  usage_date: string;
+}
+
+interface UsageSummary {
+  totals: { requests: number; input_tokens: number; output_tokens: number };
+  buckets: UsageBucket[];
 }
 
 // Fetcher for AI results using OpenAI and generateText
@@ -88,7 +92,7 @@ const Dashboard: React.FC = () => {
   const [recentNotes, setRecentNotes] = useState<Note[]>([]);
   const [userApiKey, setUserApiKey] = useState<string>("");
   const [weekNotes, setWeekNotes] = useState<Note[]>([]);
-  const [apiUsage, setApiUsage] = useState<ApiUsageEntry[]>([]);
+  const [usageSummary, setUsageSummary] = useState<UsageSummary | null>(null);
   // SWR for AI generated action items and keywords
   const { data: aiData, isValidating: aiLoading } = useSWR(
     weekNotes.length && userApiKey
@@ -176,51 +180,29 @@ const Dashboard: React.FC = () => {
   // Removed old activityData state/effect (now handled below)
   useEffect(() => {
     const token = localStorage.getItem("token") || "";
-    fetch(`${API_URL}/users/me/usage`, {
+    fetch(`${API_URL}/users/me/usage/summary?period=day`, {
       headers: { Authorization: `Bearer ${token}` }
     })
       .then(res => res.json())
-      .then((data: ApiUsageEntry[]) => setApiUsage(data))
+      .then((data: UsageSummary) => setUsageSummary(data))
       .catch(err => console.error("Failed to fetch API usage:", err));
   }, []);
 
   const uploadActivityData = useMemo(() => {
-    const counts: Record<string, number> = {};
-    apiUsage.forEach(u => {
-      const date = u.usage_date.slice(0, 10);
-      counts[date] = (counts[date] || 0) + 1;
-    });
-    return Object.entries(counts)
-      .map(([date, count]) => ({ date, count }))
-      .sort((a, b) => new Date(a.date).getTime() - new Date(b.date).getTime());
-  }, [apiUsage]);
+    return (usageSummary?.buckets ?? []).map(b => ({ date: b.period_start, count: b.requests }));
+  }, [usageSummary]);
 
   const tokenUsageData = useMemo(() => {
-    const sums: Record<string, { input: number; output: number }> = {};
-    apiUsage.forEach(u => {
-      const date = u.usage_date.slice(0, 10);
-      if (!sums[date]) sums[date] = { input: 0, output: 0 };
-      sums[date].input += u.input_tokens;
-      sums[date].output += u.output_tokens;
-    });
-    return Object.entries(sums)
-      .map(([date, vals]) => ({
-        date,
-        input: vals.input,
-        output: vals.output,
-        total: vals.input + vals.output
-      }))
-      .sort((a, b) => new Date(a.date).getTime() - new Date(b.date).getTime());
-  }, [apiUsage]);
-
-
-  const totalInputTokens = useMemo(() => {
-    return apiUsage.reduce((sum, u) => sum + u.input_tokens, 0);
-  }, [apiUsage]);
+    return (usageSummary?.buckets ?? []).map(b => ({
+      date: b.period_start,
+      input: b.input_tokens,
+      output: b.output_tokens,
+      total: b.input_tokens + b.output_tokens
+    }));
+  }, [usageSummary]);
 
-  const totalOutputTokens = useMemo(() => {
-    return apiUsage.reduce((sum, u) => sum + u.output_tokens, 0);
-  }, [apiUsage]);
+  const totalInputTokens = usageSummary?.totals.input_tokens ?? 0;
+  const totalOutputTokens = usageSummary?.totals.output_tokens ?? 0;
 
   // Heatmap date range: past 10 months
   const endDate = new Date();
@@ -340,6 +322,10 @@ const Dashboard: React.FC = () => {
                       name={note.name}
                       summary={note.summary}
                       actionItems={note.action_items}
+                      tagsProp={note.tags}
+                      createdAt={note.created_at}
+                      updatedAt={note.updated_at}
+                      creator={userName}
                     onDelete={async (id: number) => {
                       const res = await fetch(`${API_URL}/notes/${id}`, {
                         method: "DELETE",
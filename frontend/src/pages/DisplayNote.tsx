@@ -125,7 +125,7 @@ export default function DisplayNote() {
   }, [id]);
 
   useEffect(() => {
-    fetch(`${API_URL}/users/me/usage`, {
+    fetch(`${API_URL}/users/me/usage/notes?note_id=${id}`, {
       headers: {
         Authorization: `Bearer ${localStorage.getItem("token")}`
       }
@@ -135,12 +135,8 @@ export default function DisplayNote() {
         return res.json();
       })
       .then((data) => {
-        console.log("Fetched usage data:", data);
-
-        data = data.filter((item: any) => item.note_id === parseInt(id!));
-
-        const inputSum = data.reduce((acc: number, item: any) => acc + (item.input_tokens || 0), 0);
-        const outputSum = data.reduce((acc: number, item: any) => acc + (item.output_tokens || 0), 0);
+        const inputSum = data.length ? data[0].input_tokens : 0;
+        const outputSum = data.length ? data[0].output_tokens : 0;
         setInputTokens(inputSum);
         setOutputTokens(outputSum);
       })
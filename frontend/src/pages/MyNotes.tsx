@@ -20,6 +20,7 @@ interface Note {
   action_items: string;
   created_at: string;
   updated_at: string;
+  tags?: Tag[];
 }
 
 interface Tag {
@@ -30,6 +31,7 @@ interface Tag {
 
 export default function MyNotes() {
   const [notes, setNotes] = useState<Note[]>([]);
+  const [userName, setUserName] = useState<string | null>(null);
   const [selectedTags, setSelectedTags] = useState<Tag[]>([]);
   const [searchQuery, setSearchQuery] = useState<string>("");
   const [createdOn, setCreatedOn] = useState<string>("");
@@ -45,6 +47,15 @@ export default function MyNotes() {
   const [modifiedOpen, setModifiedOpen] = useState<boolean>(false);
   const [actionOpen, setActionOpen] = useState<boolean>(false);
 
+  useEffect(() => {
+    fetch(`${API_URL}/users/me`, {
+      headers: { Authorization: `Bearer ${localStorage.getItem("token")}` }
+    })
+      .then(res => res.json())
+      .then(data => setUserName(data.username || null))
+      .catch(err => console.error("Failed to fetch user info", err));
+  }, []);
+
   useEffect(() => {
     const token = localStorage.getItem("token") || "";
     if (searchQuery.trim() !== "") {
@@ -142,7 +153,25 @@ export default function MyNotes() {
         })
         .catch(() => console.error("Failed to fetch tagged notes"));
     } else {
-      fetch(`${API_URL}/notes/`, {
+      // Cards show only these fields, so skip the large content and summary columns here
+      const params = new URLSearchParams({ fields: "id,name,action_items,created_at,updated_at,tags" });
+      // Let the server apply the date filter and sort; the filters below then only trim what it returns
+      const dayRange = (day: string) => {
+        const start = new Date(`${day}T00:00:00`);
+        const end = new Date(start);
+        end.setDate(end.getDate() + 1);
+        return [start.toISOString(), end.toISOString()];
+      };
+      if (createdOn || modifiedOn) {
+        const [since, until] = dayRange(createdOn || modifiedOn);
+        params.set("order_by", createdOn ? "created_at" : "updated_at");
+        params.set("since", since);
+        params.set("until", until);
+      }
+      if (sortOption !== "alpha") {
+        params.set("sort", sortOption === "oldest" ? "asc" : "desc");
+      }
+      fetch(`${API_URL}/notes/?${params}`, {
         headers: { Authorization: `Bearer ${token}` }
       })
         .then(res => res.json())
@@ -364,6 +393,10 @@ export default function MyNotes() {
                 name={note.name}
                 summary={note.summary}
                 actionItems={note.action_items}
+                tagsProp={note.tags}
+                createdAt={note.created_at}
+                updatedAt={note.updated_at}
+                creator={userName}
                 onDelete={deleteNote}
                 expandLink={`/notes/${note.id}`}
               />
@@ -1,4 +1,4 @@
-import React, { useState } from "react";
+import React, { useEffect, useState } from "react";
 import { Link } from "react-router-dom";
 import ActionItemToggle from "../components/ActionItemsToggle";
 import TagSelector from "../components/TagSelector";
@@ -23,6 +23,8 @@ interface Result {
   id: number;
   summary: string;
   action_items: string;
+  created_at: string;
+  updated_at: string;
   tags: Tag[];
 }
 
@@ -36,12 +38,22 @@ export default function UploadPage() {
   const [file, setFile] = useState<File | null>(null);
   const [loading, setLoading] = useState(false);
   const [result, setResult] = useState<Result | null>(null);
+  const [userName, setUserName] = useState<string | null>(null);
   const [error, setError] = useState<string | null>(null);
   const [showModal, setShowModal] = useState(false);
   const [noteTitle, setNoteTitle] = useState("Untitled Note");
   const [includeActionItems, setIncludeActionItems] = useState(true);
   const [selectedTags, setSelectedTags] = useState<Tag[]>([]);
 
+  useEffect(() => {
+    fetch(`${API_URL}/users/me`, {
+      headers: { Authorization: `Bearer ${localStorage.getItem("token")}` }
+    })
+      .then(res => res.json())
+      .then(data => setUserName(data.username || null))
+      .catch(err => console.error("Failed to fetch user info", err));
+  }, []);
+
   const handleUpload = () => {
     if (!file) return;
     setResult(null);
@@ -89,7 +101,25 @@ export default function UploadPage() {
         }
       }
 
-      const data = await res.json();
+      let job = await res.json();
+      while (job.status === "queued" || job.status === "running") {
+        await new Promise(resolve => setTimeout(resolve, 1000));
+        const jobRes = await fetch(`${API_URL}/jobs/${job.id}`, {
+          headers: {
+            Authorization: `Bearer ${localStorage.getItem("token")}`
+          }
+        });
+        if (!jobRes.ok) {
+          throw new Error("Lost track of the upload job");
+        }
+        job = await jobRes.json();
+      }
+
+      if (job.status === "failed") {
+        throw new Error(job.error || "Upload failed");
+      }
+
+      const data = job.note;
       setResult(data);
 
       const noteId = data.id;
@@ -223,6 +253,9 @@ export default function UploadPage() {
                 summary={result.summary}
                 actionItems={result.action_items}
                 tagsProp={selectedTags}
+                createdAt={result.created_at}
+                updatedAt={result.updated_at}
+                creator={userName}
                 onDelete={async (id: number) => {
                   const res = await fetch(`${API_URL}/notes/${id}`, {
                     method: 'DELETE',